@@ -0,0 +1,211 @@
+import os
+import sys
+import copy
+import time
+
+"""
+Selenia City – Mode portefeuille
+================================
+
+Fait jouer les bots existants comme des planificateurs concurrents :
+- v3 (candidats scorés), v2 (pods scorés), v1 et Tino/1 (liaison gloutonne par
+  type), Tino/2 (plan multi-pods par type) reçoivent chacun les mêmes entrées ;
+- chaque ensemble d'actions proposé est appliqué à une copie du mois et simulé
+  (arbitre local, tools/referee.py) ; on émet celui qui rapporte le plus de
+  points, à égalité celui qui dépense le moins ; une proposition dont la
+  simulation relève une action invalide est écartée, et celle de v3 n'est
+  remplacée que si une autre rapporte nettement plus (WIN_MARGIN) ;
+- budget de temps commun par tour, planificateurs ET simulations : un
+  planificateur n'est interrogé que si sa durée habituelle tient dans ce qui
+  reste (le premier est toujours interrogé) ; les autres attendent un tour
+  suivant, les moins récemment interrogés passant en premier (rotation) ;
+- un planificateur qui dépasse son délai (sauf v3) ou lève une exception est
+  abandonné pour le reste de la partie, sauf le dernier encore actif, et on arrête de
+  simuler les propositions quand le budget est épuisé.
+
+Chaque planificateur garde son propre état (CityState) : il reçoit les
+entrées même quand ce sont les actions d'un autre qui ont été jouées, et
+reconstruit tubes et pods à partir de ce que le jeu renvoie. Un planificateur
+laissé de côté reçoit au tour suivant où il joue les bâtiments apparus entre-temps.
+
+Ce fichier charge ses voisins et tools/ : il sert en local (arbitre, tournoi,
+replay), pas comme soumission CodinGame mono-fichier.
+"""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "tools"))
+
+from referee import Game      # noqa: E402
+from replay import load_bot   # noqa: E402
+
+# ====================================================================================
+# 1. Planificateurs et état persistant
+# ====================================================================================
+
+# Ordre = priorité : si le budget ne permet pas de tout simuler, les premiers passent
+PLANNERS = [
+    ("v3", os.path.join(HERE, "v3.py")),
+    ("tino2", os.path.join(HERE, "..", "Tino", "2.py")),
+    ("v2", os.path.join(HERE, "v2.py")),
+    ("tino1", os.path.join(HERE, "..", "Tino", "1.py")),
+    ("v1", os.path.join(HERE, "v1.py")),
+]
+
+TURN_BUDGET = 0.35          # secondes par tour, planificateurs + simulations
+PLANNER_TIMEOUT = 0.12      # au-delà, le planificateur est abandonné
+FIRST_TURN_FACTOR = 3       # le premier tour dispose de plus de temps
+SIMULATION_RESERVE = 0.05   # secondes du budget gardées pour simuler les propositions
+TIME_SMOOTHING = 0.5        # poids du dernier tour dans la durée habituelle
+WIN_MARGIN = 0.25           # avance relative exigée pour préférer un autre planificateur à v3
+WIN_MIN_POINTS = 5000       # ... et avance absolue (points du mois simulé)
+
+modules = {name: load_bot(path) for name, path in PLANNERS}
+
+class PortfolioState:
+    """État persistant du portefeuille (bâtiments vus, planificateurs actifs)."""
+    __slots__ = ("known_buildings", "active", "dropped", "wins", "turn_number",
+                 "planner_time", "last_asked", "missed_buildings")
+
+    def __init__(self) -> None:
+        self.known_buildings: dict[int, dict] = {}    # voir Game.from_turn
+        self.active: list[str] = [name for name, _ in PLANNERS]
+        self.dropped: dict[str, str] = {}             # nom -> raison
+        self.wins: dict[str, int] = {name: 0 for name, _ in PLANNERS}
+        self.turn_number = 0
+        self.planner_time: dict[str, float] = {}      # nom -> durée habituelle (lissée)
+        self.last_asked: dict[str, int] = {name: 0 for name, _ in PLANNERS}
+        self.missed_buildings: dict[str, list[str]] = {name: [] for name, _ in PLANNERS}
+
+city = PortfolioState()
+
+def reset() -> None:
+    """Nouvelle partie : état vierge pour le portefeuille et chaque planificateur."""
+    global city
+    city = PortfolioState()
+    for module in modules.values():
+        module.reset()
+
+def drop_planner(name: str, reason: str) -> None:
+    city.active.remove(name)
+    city.dropped[name] = reason
+    print(f"portefeuille : {name} abandonné au tour {city.turn_number} ({reason})", file=sys.stderr)
+
+# ====================================================================================
+# 2. Tour de jeu (step) et boucle principale
+# ====================================================================================
+
+def split_buildings(turn_input: list[str]) -> tuple[list[str], list[str]]:
+    """Sépare un tour en (ressources, routes et pods) et lignes des nouveaux bâtiments."""
+    end = 1
+    for _ in range(2):
+        end += 1 + int(turn_input[end])
+    return turn_input[:end], turn_input[end + 1:]
+
+def planner_input(name: str, turn_input: list[str]) -> list[str]:
+    """Entrée du tour pour un planificateur, avec les bâtiments apparus pendant qu'il attendait."""
+    head, buildings = split_buildings(turn_input)
+    buildings = city.missed_buildings[name] + buildings
+    city.missed_buildings[name] = []
+    return head + [str(len(buildings))] + buildings
+
+def step(turn_input: list[str]) -> list[str]:
+    """Joue un tour : interroge les planificateurs, simule leurs propositions, renvoie la meilleure."""
+    start = time.perf_counter()
+    city.turn_number += 1
+    factor = FIRST_TURN_FACTOR if city.turn_number == 1 else 1
+    budget = TURN_BUDGET * factor
+
+    # 2.1. Propositions : le premier planificateur, puis les autres du moins
+    # récemment interrogé au plus récent, tant que leur durée habituelle tient
+    # dans le budget (moins la part des simulations)
+    first, *others = city.active
+    order = [first] + sorted(others, key=lambda n: city.last_asked[n])
+    planner_budget = budget - SIMULATION_RESERVE * factor
+    proposals = []
+    for name in order:
+        if name != first and \
+                time.perf_counter() - start + city.planner_time.get(name, 0.0) > planner_budget:
+            city.missed_buildings[name].extend(split_buildings(turn_input)[1])
+            continue
+        city.last_asked[name] = city.turn_number
+        t0 = time.perf_counter()
+        try:
+            actions = modules[name].step(planner_input(name, turn_input))
+        except Exception as exc:  # un planificateur défaillant ne doit pas faire perdre la partie
+            # Le dernier planificateur actif est gardé : ce tour-ci, on attend (WAIT)
+            if len(city.active) > 1:
+                drop_planner(name, f"{type(exc).__name__}: {exc}")
+            continue
+        elapsed = time.perf_counter() - t0
+        previous = city.planner_time.get(name)
+        city.planner_time[name] = elapsed if previous is None else previous + TIME_SMOOTHING * (elapsed - previous)
+        # Le dernier planificateur actif est gardé quoi qu'il arrive, et v3 (la
+        # référence de 2.2) n'est pas abandonné pour lenteur
+        if elapsed > PLANNER_TIMEOUT * factor and len(city.active) > 1 and name != PLANNERS[0][0]:
+            drop_planner(name, f"{elapsed * 1000:.0f} ms")
+            continue
+        proposals.append((name, actions))
+
+    # 2.2. Simulation du mois pour chaque proposition distincte, tant que le budget le permet.
+    # Une proposition avec une action invalide est écartée. Celle du premier
+    # planificateur (v3) est gardée, même à égalité, sauf si une autre rapporte
+    # plus de (1 + WIN_MARGIN) fois ses points ; sans elle, la meilleure l'emporte
+    # (à égalité, celle qui dépense le moins).
+    base = Game.from_turn(city.known_buildings, turn_input)
+    reference = None
+    best = None
+    seen = set()
+    for name, actions in proposals:
+        output = ";".join(actions) if actions else "WAIT"
+        if output in seen:
+            continue
+        seen.add(output)
+        if (reference or best) is not None and time.perf_counter() - start > budget:
+            break
+        game = copy.deepcopy(base)
+        game.apply_actions(output)
+        if game.invalid_actions > base.invalid_actions:
+            continue
+        value = (game.end_month(), game.resources)
+        if name == PLANNERS[0][0]:
+            reference = (value, name, actions)
+        elif best is None or value > best[0]:
+            best = (value, name, actions)
+    if reference is not None and (best is None or best[0][0] <= reference[0][0] * (1 + WIN_MARGIN) + WIN_MIN_POINTS):
+        best = reference
+
+    if best is None:
+        return []
+    city.wins[best[1]] += 1
+    return best[2]
+
+def read_turn_input(read=input) -> list[str]:
+    """Lit exactement les lignes d'un tour : ressources, routes, pods, nouveaux bâtiments."""
+    lines = [read()]
+    for _ in range(3):
+        count = read()
+        lines.append(count)
+        lines.extend(read() for _ in range(int(count)))
+    return lines
+
+def open_recorder():
+    """Journal des tours si SELENIA_RECORD est défini (chemin de fichier, ou "-" pour stderr)."""
+    target = os.environ.get("SELENIA_RECORD")
+    if not target:
+        return None
+    return sys.stderr if target == "-" else open(target, "w")
+
+def main() -> None:
+    # Enregistrement : lignes lues du tour puis "> actions" (voir tools/turnlog.py)
+    record = open_recorder()
+    while True:
+        turn_input = read_turn_input()
+        actions = step(turn_input)
+        output = ";".join(actions) if actions else "WAIT"
+        if record:
+            record.write("\n".join(turn_input) + "\n> " + output + "\n")
+            record.flush()
+        print(output)
+
+if __name__ == "__main__":
+    main()
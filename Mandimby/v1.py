@@ -1,3 +1,4 @@
+import os
 import sys
 import math
 
@@ -30,20 +31,50 @@ Contraintes pratiques :
 # 1. Structures de données PERSISTANTES (en dehors de la boucle de jeu)
 # ====================================================================================
 
-# Position de chaque bâtiment : building_id -> (x, y)
-building_positions: dict[int, tuple[int, int]] = {}
+class CityState:
+    """
+    État PERSISTANT d'une partie, conservé d'un tour à l'autre.
+    On le regroupe dans un objet (plutôt qu'en variables globales) pour pouvoir
+    piloter le bot depuis un autre programme, tour par tour, avec step().
+    """
+
+    __slots__ = (
+        "building_positions",
+        "building_type",
+        "module_type",
+        "landing_astronaut_types",
+        "all_buildings",
+        "blocked_pairs",
+    )
+
+    def __init__(self) -> None:
+        # Position de chaque bâtiment : building_id -> (x, y)
+        self.building_positions: dict[int, tuple[int, int]] = {}
+
+        # Type de chaque bâtiment : "landing" (aire d'atterrissage) ou "module"
+        self.building_type: dict[int, str] = {}
+
+        # Pour les modules : moduleType[building_id] = type du module (1..20)
+        self.module_type: dict[int, int] = {}
+
+        # Pour les aires d'atterrissage : liste des types d'astronautes qui arrivent chaque mois
+        self.landing_astronaut_types: dict[int, list[int]] = {}
 
-# Type de chaque bâtiment : "landing" (aire d'atterrissage) ou "module"
-building_type: dict[int, str] = {}
+        # On enregistre tous les bâtiments apparus (pour itérer dessus facilement)
+        self.all_buildings: set[int] = set()
 
-# Pour les modules : moduleType[building_id] = type du module (1..20)
-module_type: dict[int, int] = {}
+        # Paires (min, max) dont le segment passe par un autre bâtiment (voir block_pairs_through)
+        self.blocked_pairs: set[tuple[int, int]] = set()
 
-# Pour les aires d'atterrissage : liste des types d'astronautes qui arrivent chaque mois
-landing_astronaut_types: dict[int, list[int]] = {}
 
-# On enregistre tous les bâtiments apparus (pour itérer dessus facilement)
-all_buildings: set[int] = set()
+# État de la partie en cours (remplacé par reset() au début d'une nouvelle partie)
+city = CityState()
+
+
+def reset() -> None:
+    """Repart d'un état vierge (nouvelle partie)."""
+    global city
+    city = CityState()
 
 
 # ====================================================================================
@@ -125,11 +156,11 @@ def tube_is_geometrically_valid(u: int, v: int, existing_tubes: list[tuple[int,
     - Le segment [u,v] ne traverse aucun bâtiment (autre que u ou v)
     """
     # Positions connues ?
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return False
 
-    pu = building_positions[u]
-    pv = building_positions[v]
+    pu = city.building_positions[u]
+    pv = city.building_positions[v]
 
     # Degré max 5 par bâtiment
     if degree.get(u, 0) >= max_degree or degree.get(v, 0) >= max_degree:
@@ -140,26 +171,46 @@ def tube_is_geometrically_valid(u: int, v: int, existing_tubes: list[tuple[int,
         # Partage d'extrémité autorisé (on laisse un "noeud" commun)
         if a in (u, v) or b in (u, v):
             continue
-        pa = building_positions.get(a)
-        pb = building_positions.get(b)
+        pa = city.building_positions.get(a)
+        pb = city.building_positions.get(b)
         if pa is None or pb is None:
             continue
         if segments_intersect(pu, pv, pa, pb):
             return False
 
-    # 2) Ne traverse aucun autre bâtiment
-    for w in all_buildings:
-        if w in (u, v):
-            continue
-        pw = building_positions.get(w)
-        if pw is None:
-            continue
-        if point_on_segment(pw[0], pw[1], pu[0], pu[1], pv[0], pv[1]):
-            return False
+    # 2) Ne traverse aucun autre bâtiment (table tenue à l'arrivée des bâtiments)
+    if (min(u, v), max(u, v)) in city.blocked_pairs:
+        return False
 
     return True
 
 
+def block_pairs_through(w: int) -> None:
+    """
+    Bâtiment arrivé : ajoute à city.blocked_pairs les paires dont le segment passe
+    par un bâtiment. Les bâtiments alignés avec w partagent sa direction réduite
+    (pgcd) : on les trouve en O(B) attendu, sans parcourir toutes les paires.
+    """
+    wx, wy = city.building_positions[w]
+    rays: dict[tuple[int, int], list[tuple[int, int]]] = {}
+    for o, (ox, oy) in city.building_positions.items():
+        dx, dy = ox - wx, oy - wy
+        g = math.gcd(dx, dy)
+        if g == 0:
+            continue
+        rays.setdefault((dx // g, dy // g), []).append((g, o))
+    for (dx, dy), ray in rays.items():
+        ray.sort()
+        # Sur une même demi-droite, seul le plus proche est visible depuis w
+        for _, o in ray[1:]:
+            city.blocked_pairs.add((min(w, o), max(w, o)))
+        # w est entre deux bâtiments de demi-droites opposées
+        if (dx, dy) > (0, 0):
+            for _, u in ray:
+                for _, v in rays.get((-dx, -dy), ()):
+                    city.blocked_pairs.add((min(u, v), max(u, v)))
+
+
 # ====================================================================================
 # 2.b Heuristiques de connexion – choix du voisin "intéressant"
 # ====================================================================================
@@ -172,10 +223,10 @@ def tube_construction_cost(u: int, v: int) -> int:
     distance = sqrt((dx)^2 + (dy)^2)
     cost = floor(distance / 0.1) = floor(distance * 10)
     """
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return 10**9  # Très cher => on évitera
-    x1, y1 = building_positions[u]
-    x2, y2 = building_positions[v]
+    x1, y1 = city.building_positions[u]
+    x2, y2 = city.building_positions[v]
     dist = math.hypot(x2 - x1, y2 - y1)
     return int(dist * 10)
 
@@ -200,7 +251,7 @@ def find_best_neighbor_for_building(
             essayer d'abord les aires d'atterrissage qui attendent ce type.
       - Sinon / fallback : tester tous les bâtiments, en prenant le plus proche.
     """
-    if b not in building_positions:
+    if b not in city.building_positions:
         return (None, 0)
 
     # Petite fonction interne pour tester une liste de candidats
@@ -209,12 +260,12 @@ def find_best_neighbor_for_building(
         best_cost = 0
         best_dist2 = None
 
-        bx, by = building_positions[b]
+        bx, by = city.building_positions[b]
 
         for other in candidates:
             if other == b:
                 continue
-            if other not in building_positions:
+            if other not in city.building_positions:
                 continue
 
             # Limite de degré déjà atteinte pour l'autre extrémité ?
@@ -237,7 +288,7 @@ def find_best_neighbor_for_building(
                 continue
 
             # Distance euclidienne (pour favoriser les tubes courts)
-            ox, oy = building_positions[other]
+            ox, oy = city.building_positions[other]
             dx = ox - bx
             dy = oy - by
             dist2 = dx * dx + dy * dy
@@ -250,29 +301,29 @@ def find_best_neighbor_for_building(
         return best_neighbor, best_cost
 
     # Liste de tous les bâtiments éligibles connus
-    all_candidates = [x for x in all_buildings if x != b and x in building_positions]
+    all_candidates = [x for x in city.all_buildings if x != b and x in city.building_positions]
 
     # 1) Priorité basée sur le type de bâtiment
-    b_type = building_type.get(b)
+    b_type = city.building_type.get(b)
 
     # Candidats "prioritaires" (même type d'usage)
     preferred: list[int] = []
 
     if b_type == "landing":
         # On cherche d'abord des modules dont le type est compatible
-        wanted_types = landing_astronaut_types.get(b, [])
+        wanted_types = city.landing_astronaut_types.get(b, [])
         for other in all_candidates:
-            if building_type.get(other) == "module":
-                if module_type.get(other) in wanted_types:
+            if city.building_type.get(other) == "module":
+                if city.module_type.get(other) in wanted_types:
                     preferred.append(other)
 
     elif b_type == "module":
         # On cherche d'abord les aires d'atterrissage qui demandent ce type
-        mtype = module_type.get(b)
-        for landing_id, types in landing_astronaut_types.items():
+        mtype = city.module_type.get(b)
+        for landing_id, types in city.landing_astronaut_types.items():
             if landing_id == b:
                 continue
-            if mtype in types and landing_id in building_positions:
+            if mtype in types and landing_id in city.building_positions:
                 preferred.append(landing_id)
 
     # 2) On tente d'abord sur les candidats "préférés"
@@ -287,7 +338,7 @@ def find_best_neighbor_for_building(
 
 
 # ====================================================================================
-# 3. Boucle de jeu principale
+# 3. Tour de jeu : step() (la boucle principale est dans main())
 # ====================================================================================
 
 MAX_TUBES_PER_BUILDING = 5          # Règle du jeu
@@ -297,35 +348,42 @@ MAX_TUBES_PER_BUILDING = 5          # Règle du jeu
 MAX_NEW_TUBES_PER_TURN = 6
 MAX_NEW_PODS_PER_TURN = 2           # On pourra étendre si les ressources le permettent
 
-while True:
+
+def step(turn_input: list[str]) -> list[str]:
+    """
+    Joue un tour : turn_input contient les lignes d'entrée du tour (dans l'ordre
+    de l'énoncé), la fonction renvoie la liste des actions (vide = WAIT).
+    """
+    read = iter(turn_input).__next__
+
     # --------------------------------------------------------------------------
     # 3.1. Lecture des entrées du tour
     # --------------------------------------------------------------------------
-    resources = int(input())  # Ressources disponibles ce tour (on ne les simule pas précisément)
+    resources = int(read())  # Ressources disponibles ce tour (on ne les simule pas précisément)
 
     # ----- Tubes existants ----------------------------------------------------
-    num_travel_routes = int(input())
+    num_travel_routes = int(read())
     routes: list[tuple[int, int, int]] = []
     existing_tubes: list[tuple[int, int]] = []  # seulement (u,v) pour la géométrie
     degree: dict[int, int] = {}                # degré de chaque bâtiment (nb de tubes)
 
     for _ in range(num_travel_routes):
-        b1, b2, capacity = [int(j) for j in input().split()]
+        b1, b2, capacity = [int(j) for j in read().split()]
         routes.append((b1, b2, capacity))
         existing_tubes.append((b1, b2))
 
-        all_buildings.add(b1)
-        all_buildings.add(b2)
+        city.all_buildings.add(b1)
+        city.all_buildings.add(b2)
         degree[b1] = degree.get(b1, 0) + 1
         degree[b2] = degree.get(b2, 0) + 1
 
     # ----- PODs existants -----------------------------------------------------
-    num_pods = int(input())
+    num_pods = int(read())
     pods_serving: set[int] = set()     # bâtiments déjà desservis par au moins un POD
     existing_pod_ids: set[int] = set()
 
     for _ in range(num_pods):
-        parts = input().split()
+        parts = read().split()
         if len(parts) < 2:
             continue
         # ID du POD (premier entier)
@@ -351,11 +409,11 @@ while True:
         pod_id_counter += 1
 
     # ----- Nouveaux bâtiments (de ce mois) -----------------------------------
-    num_new_buildings = int(input())
+    num_new_buildings = int(read())
     new_buildings: list[int] = []
 
     for _ in range(num_new_buildings):
-        parts = input().split()
+        parts = read().split()
         # On extrait tous les entiers pour interpréter la ligne
         ints: list[int] = []
         for t in parts:
@@ -381,9 +439,9 @@ while True:
             num_astronauts = ints[4]
             astro_types = ints[5:5 + num_astronauts]
 
-            building_positions[building_id] = (x, y)
-            building_type[building_id] = "landing"
-            landing_astronaut_types[building_id] = astro_types
+            city.building_positions[building_id] = (x, y)
+            city.building_type[building_id] = "landing"
+            city.landing_astronaut_types[building_id] = astro_types
 
         elif first > 0 and len(ints) >= 4:
             # Module lunaire
@@ -392,15 +450,16 @@ while True:
             x = ints[2]
             y = ints[3]
 
-            building_positions[building_id] = (x, y)
-            building_type[building_id] = "module"
-            module_type[building_id] = mtype
+            city.building_positions[building_id] = (x, y)
+            city.building_type[building_id] = "module"
+            city.module_type[building_id] = mtype
         else:
             # Ligne inattendue, on l'ignore
             continue
 
         new_buildings.append(building_id)
-        all_buildings.add(building_id)
+        city.all_buildings.add(building_id)
+        block_pairs_through(building_id)
 
     # --------------------------------------------------------------------------
     # 3.2. Construction des actions
@@ -426,7 +485,7 @@ while True:
         if remaining_resources <= 0:
             break
 
-        if b not in building_positions:
+        if b not in city.building_positions:
             # On n'a pas de coordonnées fiables, mieux vaut ne rien faire
             continue
 
@@ -454,10 +513,10 @@ while True:
     candidate_pod_pairs: list[tuple[int, int]] = []  # (landing, other)
     for b1, b2, _cap in routes:
         # Cas 1 : b1 est une aire d'atterrissage, b2 un autre bâtiment
-        if building_type.get(b1) == "landing" and b2 not in pods_serving:
+        if city.building_type.get(b1) == "landing" and b2 not in pods_serving:
             candidate_pod_pairs.append((b1, b2))
         # Cas 2 : b2 est une aire d'atterrissage, b1 un autre bâtiment
-        if building_type.get(b2) == "landing" and b1 not in pods_serving:
+        if city.building_type.get(b2) == "landing" and b1 not in pods_serving:
             candidate_pod_pairs.append((b2, b1))
 
     # Coût fixe d'un POD : 1000 ressources
@@ -481,12 +540,42 @@ while True:
         remaining_resources -= POD_COST
 
     # --------------------------------------------------------------------------
-    # 3.3. Sortie des actions
+    # 3.3. Sortie des actions (affichées par main(), "WAIT" si la liste est vide)
     # --------------------------------------------------------------------------
-    if not actions:
-        # Aucune action intéressante ce tour
-        print("WAIT")
-    else:
-        print(";".join(actions))
+    return actions
+
+
+def read_turn_input(read=input) -> list[str]:
+    """Lit exactement les lignes d'un tour : ressources, routes, pods, nouveaux bâtiments."""
+    lines = [read()]
+    for _ in range(3):
+        count = read()
+        lines.append(count)
+        lines.extend(read() for _ in range(int(count)))
+    return lines
+
+
+def open_recorder():
+    """Journal des tours si SELENIA_RECORD est défini (chemin de fichier, ou "-" pour stderr)."""
+    target = os.environ.get("SELENIA_RECORD")
+    if not target:
+        return None
+    return sys.stderr if target == "-" else open(target, "w")
+
+
+def main() -> None:
+    # Enregistrement : lignes lues du tour puis "> actions" (voir tools/turnlog.py)
+    record = open_recorder()
+    while True:
+        turn_input = read_turn_input()
+        actions = step(turn_input)
+        output = ";".join(actions) if actions else "WAIT"
+        if record:
+            record.write("\n".join(turn_input) + "\n> " + output + "\n")
+            record.flush()
+        print(output)
+
 
 
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,34 @@
+import os
 import sys
 import math
 from collections import deque
 
-building_positions = {}
-building_type = {}
-module_type = {}
-landing_astronaut_types = {}
-all_buildings = set()
-turn_number = 0
+class CityState:
+    """État persistant de la partie (remplace les anciennes variables globales)."""
+    __slots__ = (
+        "building_positions",
+        "building_type",
+        "module_type",
+        "landing_astronaut_types",
+        "all_buildings",
+        "blocked_pairs",
+        "turn_number",
+    )
+
+    def __init__(self):
+        self.building_positions = {}
+        self.building_type = {}
+        self.module_type = {}
+        self.landing_astronaut_types = {}
+        self.all_buildings = set()
+        self.blocked_pairs = set()  # (min, max) : un bâtiment sur le segment
+        self.turn_number = 0
+
+city = CityState()
+
+def reset():
+    global city
+    city = CityState()
 
 def orientation(ax, ay, bx, by, cx, cy):
     value = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
@@ -45,42 +66,58 @@ def segments_intersect(a, b, c, d):
     return False
 
 def tube_is_geometrically_valid(u, v, existing_tubes, degree, max_deg=5):
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return False
-    pu = building_positions[u]
-    pv = building_positions[v]
+    pu = city.building_positions[u]
+    pv = city.building_positions[v]
     if degree.get(u, 0) >= max_deg or degree.get(v, 0) >= max_deg:
         return False
     for a, b in existing_tubes:
         if a in (u, v) or b in (u, v):
             continue
-        pa = building_positions.get(a)
-        pb = building_positions.get(b)
+        pa = city.building_positions.get(a)
+        pb = city.building_positions.get(b)
         if pa is None or pb is None:
             continue
         if segments_intersect(pu, pv, pa, pb):
             return False
-    for w in all_buildings:
-        if w in (u, v):
-            continue
-        pw = building_positions.get(w)
-        if pw is None:
-            continue
-        if point_on_segment(pw[0], pw[1], pu[0], pu[1], pv[0], pv[1]):
-            return False
+    if (min(u, v), max(u, v)) in city.blocked_pairs:
+        return False
     return True
 
+def block_pairs_through(w):
+    """Bâtiment arrivé : ajoute à city.blocked_pairs les paires dont le segment passe par un bâtiment.
+    Les bâtiments alignés avec w partagent sa direction réduite (pgcd) : O(B) attendu."""
+    wx, wy = city.building_positions[w]
+    rays = {}
+    for o, (ox, oy) in city.building_positions.items():
+        dx, dy = ox - wx, oy - wy
+        g = math.gcd(dx, dy)
+        if g == 0:
+            continue
+        rays.setdefault((dx // g, dy // g), []).append((g, o))
+    for (dx, dy), ray in rays.items():
+        ray.sort()
+        # Sur une même demi-droite, seul le plus proche est visible depuis w
+        for _, o in ray[1:]:
+            city.blocked_pairs.add((min(w, o), max(w, o)))
+        # w est entre deux bâtiments de demi-droites opposées
+        if (dx, dy) > (0, 0):
+            for _, u in ray:
+                for _, v in rays.get((-dx, -dy), ()):
+                    city.blocked_pairs.add((min(u, v), max(u, v)))
+
 def tube_construction_cost(u, v):
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return 10**9
-    x1, y1 = building_positions[u]
-    x2, y2 = building_positions[v]
+    x1, y1 = city.building_positions[u]
+    x2, y2 = city.building_positions[v]
     dist = math.hypot(x2 - x1, y2 - y1)
     return int(dist * 10)
 
 def build_adjacency(routes, teleports):
     adj = {}
-    for b in all_buildings:
+    for b in city.all_buildings:
         adj[b] = []
     for b1, b2, cap in routes:
         if cap > 0:
@@ -108,9 +145,9 @@ def bfs_distances_from(start, adj):
 
 def get_modules_by_type():
     modules_by_type = {}
-    for bid, btype in building_type.items():
+    for bid, btype in city.building_type.items():
         if btype == "module":
-            mtype = module_type.get(bid)
+            mtype = city.module_type.get(bid)
             if mtype is not None:
                 if mtype not in modules_by_type:
                     modules_by_type[mtype] = []
@@ -125,14 +162,14 @@ def find_best_tube_candidate(remaining_resources, degree, existing_tubes):
     for a, b in existing_tubes:
         existing_set.add((a, b))
         existing_set.add((b, a))
-    landings = [b for b in all_buildings if building_type.get(b) == "landing"]
-    modules = [b for b in all_buildings if building_type.get(b) == "module"]
+    landings = [b for b in city.all_buildings if city.building_type.get(b) == "landing"]
+    modules = [b for b in city.all_buildings if city.building_type.get(b) == "module"]
     for landing in landings:
-        wanted_types = landing_astronaut_types.get(landing, [])
+        wanted_types = city.landing_astronaut_types.get(landing, [])
         for mod in modules:
             if (landing, mod) in existing_set:
                 continue
-            mtype = module_type.get(mod)
+            mtype = city.module_type.get(mod)
             if mtype not in wanted_types:
                 continue
             if not tube_is_geometrically_valid(landing, mod, existing_tubes, degree):
@@ -147,11 +184,11 @@ def find_best_tube_candidate(remaining_resources, degree, existing_tubes):
                 best_cost = cost
     if best:
         return best, best_cost
-    for b1 in all_buildings:
-        if b1 not in building_positions:
+    for b1 in city.all_buildings:
+        if b1 not in city.building_positions:
             continue
-        for b2 in all_buildings:
-            if b2 <= b1 or b2 not in building_positions:
+        for b2 in city.all_buildings:
+            if b2 <= b1 or b2 not in city.building_positions:
                 continue
             if (b1, b2) in existing_set:
                 continue
@@ -171,31 +208,33 @@ MAX_TUBES_PER_BUILDING = 5
 POD_COST = 1000
 TELEPORT_COST = 5000
 
-while True:
-    turn_number += 1
-    resources = int(input())
-    num_travel_routes = int(input())
+def step(turn_input):
+    """Joue un tour à partir de ses lignes d'entrée, renvoie la liste des actions."""
+    read = iter(turn_input).__next__
+    city.turn_number += 1
+    resources = int(read())
+    num_travel_routes = int(read())
     routes = []
     existing_tubes = []
     degree = {}
     teleports = set()
     for _ in range(num_travel_routes):
-        b1, b2, capacity = [int(j) for j in input().split()]
+        b1, b2, capacity = [int(j) for j in read().split()]
         routes.append((b1, b2, capacity))
         if capacity > 0:
             existing_tubes.append((b1, b2))
         else:
             teleports.add((b1, b2))
-        all_buildings.add(b1)
-        all_buildings.add(b2)
+        city.all_buildings.add(b1)
+        city.all_buildings.add(b2)
         degree[b1] = degree.get(b1, 0) + 1
         degree[b2] = degree.get(b2, 0) + 1
-    num_pods = int(input())
+    num_pods = int(read())
     pods_serving = set()
     existing_pod_ids = set()
     pod_routes = {}
     for _ in range(num_pods):
-        parts = input().split()
+        parts = read().split()
         if len(parts) < 3:
             continue
         pod_id = int(parts[0])
@@ -207,10 +246,10 @@ while True:
     pod_id_counter = 1
     while pod_id_counter in existing_pod_ids:
         pod_id_counter += 1
-    num_new_buildings = int(input())
+    num_new_buildings = int(read())
     new_buildings = []
     for _ in range(num_new_buildings):
-        parts = input().split()
+        parts = read().split()
         ints = [int(t) for t in parts if t.lstrip('-').isdigit()]
         if not ints:
             continue
@@ -220,20 +259,21 @@ while True:
             x, y = ints[2], ints[3]
             num_astronauts = ints[4]
             astro_types = ints[5:5 + num_astronauts]
-            building_positions[building_id] = (x, y)
-            building_type[building_id] = "landing"
-            landing_astronaut_types[building_id] = astro_types
+            city.building_positions[building_id] = (x, y)
+            city.building_type[building_id] = "landing"
+            city.landing_astronaut_types[building_id] = astro_types
         elif first > 0 and len(ints) >= 4:
             mtype = ints[0]
             building_id = ints[1]
             x, y = ints[2], ints[3]
-            building_positions[building_id] = (x, y)
-            building_type[building_id] = "module"
-            module_type[building_id] = mtype
+            city.building_positions[building_id] = (x, y)
+            city.building_type[building_id] = "module"
+            city.module_type[building_id] = mtype
         else:
             continue
         new_buildings.append(building_id)
-        all_buildings.add(building_id)
+        city.all_buildings.add(building_id)
+        block_pairs_through(building_id)
     actions = []
     remaining_resources = resources
     MAX_TUBES_THIS_TURN = 10
@@ -243,30 +283,30 @@ while True:
             break
         if remaining_resources < 100:
             break
-        if b not in building_positions:
+        if b not in city.building_positions:
             continue
         best_neighbor = None
         best_cost = 0
         best_dist2 = None
-        bx, by = building_positions[b]
+        bx, by = city.building_positions[b]
         preferred = []
-        b_type = building_type.get(b)
+        b_type = city.building_type.get(b)
         if b_type == "landing":
-            wanted = landing_astronaut_types.get(b, [])
-            for other in all_buildings:
+            wanted = city.landing_astronaut_types.get(b, [])
+            for other in city.all_buildings:
                 if other == b:
                     continue
-                if building_type.get(other) == "module" and module_type.get(other) in wanted:
+                if city.building_type.get(other) == "module" and city.module_type.get(other) in wanted:
                     preferred.append(other)
         elif b_type == "module":
-            mtype = module_type.get(b)
-            for landing_id, types in landing_astronaut_types.items():
+            mtype = city.module_type.get(b)
+            for landing_id, types in city.landing_astronaut_types.items():
                 if mtype in types:
                     preferred.append(landing_id)
-        candidates = preferred if preferred else list(all_buildings)
+        candidates = preferred if preferred else list(city.all_buildings)
         existing_set = set((a, c) for a, c in existing_tubes) | set((c, a) for a, c in existing_tubes)
         for other in candidates:
-            if other == b or other not in building_positions:
+            if other == b or other not in city.building_positions:
                 continue
             if (b, other) in existing_set:
                 continue
@@ -275,7 +315,7 @@ while True:
             cost = tube_construction_cost(b, other)
             if cost > remaining_resources:
                 continue
-            ox, oy = building_positions[other]
+            ox, oy = city.building_positions[other]
             dist2 = (ox - bx)**2 + (oy - by)**2
             if best_neighbor is None or dist2 < best_dist2:
                 best_neighbor = other
@@ -299,7 +339,7 @@ while True:
             key = (min(b1, b2), max(b1, b2))
             if key not in tubes_with_pods:
                 priority = 0
-                if building_type.get(b1) == "landing" or building_type.get(b2) == "landing":
+                if city.building_type.get(b1) == "landing" or city.building_type.get(b2) == "landing":
                     priority = 10
                 tubes_needing_pods.append((priority, b1, b2))
     tubes_needing_pods.sort(reverse=True)
@@ -318,19 +358,19 @@ while True:
         pods_created += 1
         remaining_resources -= POD_COST
         tubes_with_pods.add((min(b1, b2), max(b1, b2)))
-    if remaining_resources > 3000 and turn_number > 3:
+    if remaining_resources > 3000 and city.turn_number > 3:
         for b1, b2, cap in routes:
             if cap > 0 and cap < 3:
-                is_important = (building_type.get(b1) == "landing" or building_type.get(b2) == "landing")
+                is_important = (city.building_type.get(b1) == "landing" or city.building_type.get(b2) == "landing")
                 if is_important:
                     upgrade_cost = tube_construction_cost(b1, b2) * (cap + 1)
                     if upgrade_cost <= remaining_resources:
                         actions.append(f"UPGRADE {b1} {b2}")
                         remaining_resources -= upgrade_cost
                         break
-    if remaining_resources > TELEPORT_COST and turn_number > 10:
-        landings = [b for b in all_buildings if building_type.get(b) == "landing"]
-        modules_list = [b for b in all_buildings if building_type.get(b) == "module"]
+    if remaining_resources > TELEPORT_COST and city.turn_number > 10:
+        landings = [b for b in city.all_buildings if city.building_type.get(b) == "landing"]
+        modules_list = [b for b in city.all_buildings if city.building_type.get(b) == "module"]
         buildings_with_teleport = set()
         for a, b in teleports:
             buildings_with_teleport.add(a)
@@ -343,10 +383,10 @@ while True:
             for mod in modules_list:
                 if mod in buildings_with_teleport:
                     continue
-                if landing not in building_positions or mod not in building_positions:
+                if landing not in city.building_positions or mod not in city.building_positions:
                     continue
-                lx, ly = building_positions[landing]
-                mx, my = building_positions[mod]
+                lx, ly = city.building_positions[landing]
+                mx, my = city.building_positions[mod]
                 dist = math.hypot(mx - lx, my - ly)
                 if dist > best_dist:
                     best_dist = dist
@@ -354,7 +394,35 @@ while True:
         if best_teleport and best_dist > 50:
             actions.append(f"TELEPORT {best_teleport[0]} {best_teleport[1]}")
             remaining_resources -= TELEPORT_COST
-    if not actions:
-        print("WAIT")
-    else:
-        print(";".join(actions))
+    return actions
+
+def read_turn_input(read=input):
+    """Lit les lignes d'un tour : ressources, routes, pods, nouveaux bâtiments."""
+    lines = [read()]
+    for _ in range(3):
+        count = read()
+        lines.append(count)
+        lines.extend(read() for _ in range(int(count)))
+    return lines
+
+def open_recorder():
+    """Journal des tours si SELENIA_RECORD est défini (chemin de fichier, ou "-" pour stderr)."""
+    target = os.environ.get("SELENIA_RECORD")
+    if not target:
+        return None
+    return sys.stderr if target == "-" else open(target, "w")
+
+def main():
+    # Enregistrement : lignes lues du tour puis "> actions" (voir tools/turnlog.py)
+    record = open_recorder()
+    while True:
+        turn_input = read_turn_input()
+        actions = step(turn_input)
+        output = ";".join(actions) if actions else "WAIT"
+        if record:
+            record.write("\n".join(turn_input) + "\n> " + output + "\n")
+            record.flush()
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,323 @@
+import os
 import sys
+import json
 import math
+import heapq
+import time
+import tracemalloc
 from collections import deque, defaultdict
 
+try:
+    import numpy as np
+except ImportError:  # numpy absent : les calculs matriciels passent en Python pur
+    np = None
+
 """
 Selenia City – Version Avancée avec Simulation + Scoring
 =========================================================
 
 Méthodes implémentées :
-1. BFS pour distances dans le graphe (tubes=1, téléporteurs=0)
-2. Simulation naïve du flux d'astronautes
-3. Détection des goulots d'étranglement
+1. BFS pour distances dans le graphe (tubes=1, téléporteurs=0) et Dijkstra
+   sur les temps de trajet (longueur, capacité) avec cache par source
+2. Flux d'astronautes : flot de coût minimum sur les capacités des tubes
+   (plus courts chemins successifs, un type après l'autre)
+3. Détection des goulots d'étranglement : charge des tubes (centralité
+   d'intermédiarité pondérée par la demande, mise à jour incrémentale),
+   débit offert par les pods et coupe minimale par type (flot de Dinic)
 4. Génération de candidats d'actions avec scoring
 5. Pods multi-directions sur tous les tubes importants
-6. Upgrades intelligents des tubes saturés
-7. Téléporteurs stratégiques en fin de partie
+6. Upgrades et pods dimensionnés par la demande (débit marginal par ressource)
+7. Téléporteurs placés par économie de distance sur toute la demande,
+   sorties limitées aux pôles des groupes spatiaux (k-moyennes par type)
+8. Tournées de pods multi-arrêts (recherche locale type Clarke-Wright)
+9. Recyclage des pods inactifs ou doublons (DESTROY + POD)
+10. Anticipation sur 2-3 mois : beam search sur des politiques de dépense
+    (désactivée par défaut, config.beam_width)
+11. Tubes proposés par arbres de Steiner approchés, un par type de module
+12. Calendrier de dépense : épargne pour un téléporteur quand son gain
+    l'emporte sur les achats qu'il remplace (intérêts compris)
+
+Les poids et seuils de l'heuristique sont regroupés dans Config (1.b) et
+peuvent être surchargés par SELENIA_CONFIG (voir tools/tune.py).
+SELENIA_TRACEMALLOC active un profil mémoire par tour et par étape (1.c).
 """
 
 # ====================================================================================
 # 1. Structures de données PERSISTANTES
 # ====================================================================================
 
-building_positions: dict[int, tuple[int, int]] = {}
-building_type: dict[int, str] = {}  # "landing" ou "module"
-module_type: dict[int, int] = {}
-landing_astronaut_types: dict[int, list[int]] = {}
-all_buildings: set[int] = set()
-turn_number = 0
+class CityState:
+    """
+    État persistant d'une partie. Regroupé dans un objet pour que le bot
+    puisse être piloté en mémoire (step()) par un banc de test.
+    """
+    __slots__ = (
+        "building_positions", "building_type", "module_type", "landing_astronaut_types",
+        "all_buildings", "turn_number", "pod_utilization", "pod_age", "recycled_routes",
+        "routing_adjacency", "routing_signature", "routing_cache",
+        "new_astronauts_by_type", "income_estimate", "last_remaining", "savings",
+        "tube_pool", "tube_pool_tubes", "teleport_cache", "itinerary_cache",
+        "tube_degree", "known_tubes", "saturated", "open_landings", "open_modules_by_type",
+        "tube_pool_by_building", "flow_cache", "min_cut_cache",
+        "steiner_edges", "steiner_crossings", "steiner_tubes",
+        "betweenness_links", "betweenness_adjacency", "teleport_exits", "betweenness_sources",
+        "edge_betweenness", "cluster_cache", "phase_start", "phase_times", "effort",
+        "indexed_buildings", "pair_costs", "blocked_pairs", "modules_by_type",
+    )
+
+    def __init__(self) -> None:
+        self.building_positions: dict[int, tuple[int, int]] = {}
+        self.building_type: dict[int, str] = {}  # "landing" ou "module"
+        self.module_type: dict[int, int] = {}
+        self.landing_astronaut_types: dict[int, list[int]] = {}
+        self.all_buildings: set[int] = set()
+        # Tables des paires, remplies au tour 1 puis par deltas (2.d)
+        self.indexed_buildings: dict[int, None] = {}                 # ordre d'arrivée
+        self.pair_costs: dict[tuple[int, int], int] = {}             # (min, max) -> coût du tube
+        self.blocked_pairs: set[tuple[int, int]] = set()             # un bâtiment sur le segment
+        self.modules_by_type: dict[int, list[int]] = {}
+        self.turn_number = 0
+        self.pod_utilization: dict[int, float] = {}  # pod_id -> utilisation lissée (0..1)
+        self.pod_age: dict[int, int] = {}            # pod_id -> nb de tours observés
+        self.recycled_routes: dict[frozenset, int] = {}  # tubes d'un pod détruit -> tour (5.c)
+        # Cache du moteur de routage (3.b)
+        self.routing_adjacency: dict[int, list[tuple[int, float]]] = {}
+        self.routing_signature = None
+        self.routing_cache: dict[int, tuple[dict, dict]] = {}
+        self.flow_cache = None                              # (signature réseau, acheminés par type) (4)
+        self.min_cut_cache = None                           # (signature réseau, débit perdu par tube) (4.c)
+        # Centralité des tubes, mise à jour lien par lien (4.d)
+        self.betweenness_links: set[tuple[int, int, bool]] = set()          # (a, b, est un tube)
+        self.betweenness_adjacency: dict[int, list[tuple[int, int]]] = {}   # tube = 1, téléporteur = 0
+        self.teleport_exits: set[int] = set()
+        self.betweenness_sources: dict[int, tuple[dict, dict]] = {}         # aire -> (distances, charge)
+        self.edge_betweenness: dict[tuple[int, int], float] = {}            # tube -> astronautes/mois
+        # Prévisions pour l'anticipation (5.e)
+        self.new_astronauts_by_type: dict[int, int] = {}  # arrivés après le premier tour
+        self.income_estimate = 0                           # revenu mensuel hors intérêts
+        self.last_remaining = None                         # ressources laissées au tour précédent
+        self.savings = 0                                   # épargne pour un téléporteur au tour précédent (5.g)
+        # Candidats conservés d'un tour à l'autre (5)
+        self.tube_pool: dict[tuple[int, int], tuple[int, float]] = {}  # (landing, module) -> (coût, score)
+        self.tube_pool_tubes: set[tuple[int, int]] = set()             # tubes connus du pool
+        self.teleport_cache = None                                      # (signature réseau, résultat)
+        self.cluster_cache = None                                       # (nb de bâtiments, pôles) (2.c)
+        # Temps des étapes du tour et effort accordé à chacune (1.d)
+        self.phase_start = 0.0
+        self.phase_times: dict[str, float] = {}
+        self.effort: dict[str, float] = {}
+        self.itinerary_cache = None                                     # (demande, tournées)
+        # Degré tenu à jour tour après tour, tubes émis compris (2.b)
+        self.tube_degree: dict[int, int] = {}                  # bâtiment -> nb de tubes
+        self.known_tubes: set[tuple[int, int]] = set()         # tubes confirmés ou émis
+        self.saturated: set[int] = set()                       # bâtiments à MAX_TUBES_PER_BUILDING
+        self.open_landings: dict[int, None] = {}               # aires non saturées, ordre d'arrivée
+        self.open_modules_by_type: dict[int, dict[int, None]] = {}  # type -> modules non saturés
+        self.tube_pool_by_building: dict[int, set[tuple[int, int]]] = {}  # bâtiment -> paires du pool
+        # Arêtes candidates des arbres de Steiner (5.f)
+        self.steiner_edges: dict[tuple[int, int], int] = {}                # clé -> coût
+        self.steiner_crossings: dict[tuple[int, int], set[tuple[int, int]]] = {}
+        self.steiner_tubes: set[tuple[int, int]] = set()                   # tubes connus des arêtes
+
+city = CityState()
+
+def reset() -> None:
+    """Nouvelle partie : repart d'un état vierge."""
+    global city
+    city = CityState()
+
+# ====================================================================================
+# 1.b Paramètres de l'heuristique
+# ====================================================================================
+#
+# Valeurs choisies à la main ; SELENIA_CONFIG (objet JSON, ou chemin d'un fichier
+# JSON) en surcharge tout ou partie. Un nom inconnu est une erreur : une faute de
+# frappe ne doit pas passer inaperçue pendant un réglage.
+
+class Config:
+    """Poids, seuils et limites de l'heuristique (voir DEFAULTS)."""
+    DEFAULTS = {
+        # Sélection (6.4)
+        "max_actions": 15,
+        "max_tubes": 8,
+        "max_upgrades": 2,
+        "max_pods": 6,
+        "max_teleports": 1,
+        # Scores des candidats (5)
+        "tube_demand_weight": 1000.0,    # nb_astros * poids / distance ...
+        "tube_cost_weight": 0.1,         # ... - coût * poids
+        "upgrade_score_weight": 10000.0,
+        "pod_score_weight": 10.0,
+        "teleport_score_weight": 10000.0,
+        # Téléporteurs : à partir de quel tour ; mois de rendement pris en compte pour épargner (5.g)
+        "teleport_min_turn": 9,
+        "spend_horizon": 10,
+        # Anticipation (5.e) : largeur 0 = sélection gloutonne seule (défaut : le simulateur
+        # compact classe moins bien que l'arbitre, voir tools/tune.py pour l'activer)
+        "beam_width": 0,
+        "beam_depth": 3,
+        "beam_budget": 0.05,             # secondes
+        # Régulation (1.d) : temps visé pour les étapes 6.2 à 6.4
+        "turn_budget": 0.25,             # secondes ; <= 0 ou infini : pas de régulation
+        # Routage (3.b) et capacité (4.b)
+        "reference_tube_km": 15.0,
+        "wait_penalty": 0.5,
+        "bottleneck_ratio": 1.0,         # tube saturé si flux > débit des pods * ratio
+        # Tournées et flotte (5.b, 5.c)
+        "route_pod_penalty": 15.0,
+        "idle_utilization": 0.1,
+        "utilization_smoothing": 0.5,
+        "max_recycled_per_turn": 3,
+        # Arbres de Steiner (5.f) : coût ajouté par tube neuf d'un chemin (il faudra aussi un pod)
+        "steiner_hop_cost": 1000.0,
+    }
+    __slots__ = tuple(DEFAULTS)
+
+    def __init__(self, **overrides) -> None:
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"paramètre(s) inconnu(s) : {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, type(default)(overrides.get(name, default)))
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+
+def load_config() -> Config:
+    """Config par défaut, surchargée par SELENIA_CONFIG s'il est défini."""
+    text = os.environ.get("SELENIA_CONFIG", "").strip()
+    if not text:
+        return Config()
+    if not text.startswith("{"):
+        with open(text) as f:
+            text = f.read()
+    return Config(**json.loads(text))
+
+config = load_config()
+
+# ====================================================================================
+# 1.c Profil mémoire par tour (SELENIA_TRACEMALLOC)
+# ====================================================================================
+#
+# SELENIA_TRACEMALLOC=1 (ou N > 1 : nb de sites affichés, MEMORY_TOP_SITES sinon)
+# active tracemalloc. À la fin de chaque étape du tour (6.1 à 6.6) on relève la
+# mémoire encore allouée depuis le début du tour et le pic atteint pendant
+# l'étape ; en fin de tour, stderr reçoit ces chiffres et, pour l'étape au plus
+# haut pic, les N lignes du code qui ont le plus alloué pendant l'étape. Les
+# instantanés du profil sont retirés des chiffres. Le coût (plusieurs fois le
+# temps d'un tour) réserve ce mode aux parties locales et à tools/replay.py.
+
+MEMORY_TOP_SITES = 10
+
+class MemoryProfile:
+    """Relevés tracemalloc du tour en cours (voir plus haut)."""
+    __slots__ = ("top", "base", "overhead", "snapshot", "phases", "sites")
+
+    def __init__(self, top: int) -> None:
+        self.top = top
+        self.base = 0           # mémoire tracée au début du tour
+        self.overhead = 0       # mémoire occupée par le profil lui-même
+        self.snapshot = None    # instantané de la fin de l'étape précédente
+        self.phases: list[tuple[str, int, int]] = []   # (étape, courant, pic) relatifs à base
+        self.sites = None       # (pic, étape, statistiques des lignes)
+
+    def begin(self) -> None:
+        self.phases = []
+        self.sites = self.snapshot = None
+        self.base = tracemalloc.get_traced_memory()[0]
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_IGNORED)
+        self.overhead = tracemalloc.get_traced_memory()[0] - self.base
+        tracemalloc.reset_peak()
+
+    def phase(self, name: str) -> None:
+        traced, peak = tracemalloc.get_traced_memory()
+        current = traced - self.base - self.overhead
+        peak -= self.base + self.overhead
+        self.phases.append((name, current, peak))
+        snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_IGNORED)
+        if self.sites is None or peak > self.sites[0]:
+            stats = [stat for stat in snapshot.compare_to(self.snapshot, "lineno") if stat.size_diff > 0]
+            self.sites = (peak, name, stats[:self.top])
+        self.snapshot = snapshot
+        # Tout ce qui a été alloué depuis le relevé appartient au profil
+        self.overhead = tracemalloc.get_traced_memory()[0] - self.base - current
+        tracemalloc.reset_peak()
+
+    def report(self, turn: int) -> None:
+        kib = lambda size: f"{size / 1024:+.1f} Kio"
+        print(f"mémoire tour {turn} : " + " | ".join(f"{name} {kib(current)} (pic {kib(peak)})"
+                                                     for name, current, peak in self.phases), file=sys.stderr)
+        if self.sites is not None:
+            _, name, stats = self.sites
+            for rank, stat in enumerate(stats, start=1):
+                frame = stat.traceback[0]
+                print(f"  {name} #{rank} {frame.filename}:{frame.lineno} {kib(stat.size_diff)} "
+                      f"({stat.count_diff:+d} blocs)", file=sys.stderr)
+        self.sites = self.snapshot = None
+
+MEMORY_IGNORED = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+def open_memory_profile():
+    """Démarre tracemalloc si SELENIA_TRACEMALLOC est défini ; renvoie le profil ou None."""
+    text = os.environ.get("SELENIA_TRACEMALLOC")
+    if text is None:
+        return None
+    tracemalloc.start()
+    return MemoryProfile(int(text) if text.strip().isdigit() and int(text) > 1 else MEMORY_TOP_SITES)
+
+memory_profile = open_memory_profile()
+
+# ====================================================================================
+# 1.d Régulation du temps de calcul : effort par étape, d'après les temps mesurés
+# ====================================================================================
+#
+# Les étapes coûteuses du tour (6.2 analyse, 6.3 candidats, 6.4 sélection) ont
+# chacune un niveau d'effort entre THROTTLE_FLOOR et 1. Le temps mesuré d'une
+# étape est comparé à sa part de config.turn_budget (THROTTLE_SHARES) ; le
+# niveau du tour suivant est multiplié par (part / temps) ** 0.5, borné. Un tour
+# rapide fait remonter le niveau : tant que tout tient dans le budget, l'effort
+# reste à 1 et rien ne change. Ce que règle chaque niveau :
+# - analyse : coupe minimale (4.c) sautée sous 0.5 ;
+# - candidats : chemins de Steiner (5.f) et demandes des tournées (5.b) au
+#   prorata, plan des téléporteurs (5.d) sauté sous 0.5 ;
+# - sélection : budget du beam (5.e) au prorata. Le lot validé par balayage
+#   (6.4) n'est pas réduit : ce qui en sort passerait par la vérification
+#   complète, plus chère par candidat.
+# Les parties dépendent alors de la charge de la machine : config.turn_budget
+# <= 0 (ou infini) coupe la régulation, et les outils (tools/referee.py,
+# tournament.py, tune.py) le font par défaut pour des parties reproductibles.
+# Sous SELENIA_TRACEMALLOC, les temps mesurés comprennent le coût du profil :
+# régulation active, le profil ne décrit pas la même partie.
+
+THROTTLE_SHARES = {"6.2 analyse": 0.35, "6.3 candidats": 0.35, "6.4 sélection": 0.3}
+THROTTLE_FLOOR = 0.2
+
+def end_phase(name: str) -> None:
+    """Fin d'une étape du tour : temps mesuré (et mémoire sous SELENIA_TRACEMALLOC)."""
+    now = time.perf_counter()
+    city.phase_times[name] = now - city.phase_start
+    city.phase_start = now
+    if memory_profile is not None:
+        memory_profile.phase(name)
+
+def effort(name: str) -> float:
+    """Niveau d'effort de l'étape pour ce tour (1 = travail complet)."""
+    return city.effort.get(name, 1.0)
+
+def scaled(limit: int, name: str) -> int:
+    return max(1, round(limit * effort(name)))
+
+def update_throttle() -> None:
+    """Fin de tour : corrige l'effort de chaque étape pour le tour suivant."""
+    if not 0 < config.turn_budget < math.inf:
+        return
+    for name, share in THROTTLE_SHARES.items():
+        elapsed = city.phase_times.get(name)
+        if elapsed is None:
+            continue
+        target = share * config.turn_budget
+        level = effort(name) * math.sqrt(target / max(elapsed, 1e-6))
+        city.effort[name] = min(1.0, max(THROTTLE_FLOOR, level))
 
 # ====================================================================================
 # 2. Fonctions géométriques
@@ -63,32 +355,290 @@ def segments_intersect(a, b, c, d) -> bool:
     return False
 
 def tube_is_geometrically_valid(u: int, v: int, existing_tubes: list, degree: dict, max_deg: int = 5) -> bool:
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return False
-    pu, pv = building_positions[u], building_positions[v]
+    pu, pv = city.building_positions[u], city.building_positions[v]
     if degree.get(u, 0) >= max_deg or degree.get(v, 0) >= max_deg:
         return False
     for a, b in existing_tubes:
         if a in (u, v) or b in (u, v):
             continue
-        pa, pb = building_positions.get(a), building_positions.get(b)
+        pa, pb = city.building_positions.get(a), city.building_positions.get(b)
         if pa and pb and segments_intersect(pu, pv, pa, pb):
             return False
-    for w in all_buildings:
-        if w in (u, v):
-            continue
-        pw = building_positions.get(w)
-        if pw and point_on_segment(pw[0], pw[1], pu[0], pu[1], pv[0], pv[1]):
-            return False
-    return True
+    return not segment_hits_building(u, v)
+
+def segment_hits_building(u: int, v: int) -> bool:
+    """Un bâtiment autre que u et v se trouve-t-il sur le segment [u, v] ? (table 2.d)"""
+    return (min(u, v), max(u, v)) in city.blocked_pairs
+
+def sweep_crossings(segments: list, fixed: list = (), among_segments: bool = True) -> dict:
+    """
+    Validation groupée par balayage : on parcourt les segments par x minimal
+    croissant en gardant la liste des segments "actifs" (x maximal pas encore
+    dépassé, retirés via un tas) ; seuls les actifs dont l'intervalle en y
+    chevauche le nouveau segment passent le test exact de croisement.
+    segments, fixed : listes de (u, v). Renvoie {clé: set(clés croisées)} pour
+    les paires segment/fixe, et segment/segment si among_segments (les paires
+    fixe/fixe sont ignorées). Clé = (min(u, v), max(u, v)) ; deux tubes
+    partageant un bâtiment ne se croisent pas (comme tube_is_geometrically_valid).
+    Sans among_segments, seul compte le fait qu'un segment croise un fixe : on
+    ne cherche plus d'autre croisement pour lui après le premier trouvé.
+    Coût : O(n log n) pour le tri et le tas, plus une comparaison par paire dont
+    les intervalles en x se chevauchent, soit O(n²) au pire (tubes longs qui se
+    recouvrent tous en x) et non O((n + k) log n) comme Bentley-Ottmann. Ce
+    dernier demanderait un ordre des actifs en y et des événements
+    d'intersection exacts malgré les extrémités partagées et les colinéaires ;
+    sur quelques centaines de segments, le filtre en y suffit.
+    Vérifié contre le test de toutes les paires dans tests/test_v3.py.
+    """
+    items = []
+    for is_fixed, group in ((False, segments), (True, fixed)):
+        for u, v in group:
+            pu, pv = city.building_positions.get(u), city.building_positions.get(v)
+            if pu is None or pv is None:
+                continue
+            items.append((min(pu[0], pv[0]), max(pu[0], pv[0]), min(pu[1], pv[1]), max(pu[1], pv[1]),
+                          (min(u, v), max(u, v)), pu, pv, is_fixed))
+    items.sort(key=lambda item: item[0])
+
+    crossings = defaultdict(set)
+    active = ([], [])    # (segments, fixes) dont l'intervalle en x contient la position du balayage
+    expiry = []          # tas (x maximal, n°) pour retirer les items dépassés
+    removed = set()
+    for number, item in enumerate(items):
+        x_min, x_max, y_min, y_max, key, pu, pv, is_fixed = item
+        while expiry and expiry[0][0] < x_min:
+            removed.add(heapq.heappop(expiry)[1])
+        if removed:
+            active = tuple([(n, other) for n, other in group if n not in removed] for group in active)
+            removed.clear()
+        # Un fixe n'est comparé qu'aux segments ; un segment aux fixes (et aux segments si demandé)
+        others = active[0] if is_fixed else (active[1] + active[0] if among_segments else active[1])
+        blocked = False
+        for _, other in others:
+            if other[3] < y_min or other[2] > y_max:
+                continue
+            okey = other[4]
+            if key[0] in okey or key[1] in okey:
+                continue
+            if not among_segments and (okey if is_fixed else key) in crossings:
+                continue
+            if segments_intersect(pu, pv, other[5], other[6]):
+                crossings[key].add(okey)
+                crossings[okey].add(key)
+                if not among_segments and not is_fixed:
+                    blocked = True
+                    break
+        if blocked:
+            continue  # segment déjà invalide : inutile de le garder actif
+        active[is_fixed].append((number, item))
+        heapq.heappush(expiry, (x_max, number))
+    return crossings
 
 def tube_construction_cost(u: int, v: int) -> int:
-    if u not in building_positions or v not in building_positions:
+    cost = city.pair_costs.get((min(u, v), max(u, v)))
+    if cost is not None:
+        return cost
+    if u not in city.building_positions or v not in city.building_positions:
         return 10**9
-    x1, y1 = building_positions[u]
-    x2, y2 = building_positions[v]
+    x1, y1 = city.building_positions[u]
+    x2, y2 = city.building_positions[v]
     return int(math.hypot(x2 - x1, y2 - y1) * 10)
 
+# ====================================================================================
+# 2.b Degré des bâtiments : index des bâtiments encore ouverts
+# ====================================================================================
+# Un bâtiment à MAX_TUBES_PER_BUILDING tubes sort de open_landings /
+# open_modules_by_type et ses paires quittent le pool (5) dès le tube émis,
+# au lieu d'être filtré à chaque génération : les listes de candidats
+# rétrécissent au fil de la partie.
+
+def open_building(building_id: int) -> None:
+    """Ajoute un bâtiment qui vient d'arriver à l'index des bâtiments ouverts."""
+    if city.building_type.get(building_id) == "landing":
+        city.open_landings[building_id] = None
+    elif building_id in city.module_type:
+        city.open_modules_by_type.setdefault(city.module_type[building_id], {})[building_id] = None
+
+def saturate_building(building_id: int) -> None:
+    city.saturated.add(building_id)
+    city.open_landings.pop(building_id, None)
+    if building_id in city.module_type:
+        city.open_modules_by_type.get(city.module_type[building_id], {}).pop(building_id, None)
+    for pair in list(city.tube_pool_by_building.get(building_id, ())):
+        drop_pool_pair(pair)
+
+def reopen_building(building_id: int) -> None:
+    """Tube émis mais pas construit : le bâtiment redevient ouvert, à sa place d'arrivée."""
+    city.saturated.discard(building_id)
+    if city.building_type.get(building_id) == "landing":
+        city.open_landings = {b: None for b in city.landing_astronaut_types if b not in city.saturated}
+    elif building_id in city.module_type:
+        mtype = city.module_type[building_id]
+        city.open_modules_by_type[mtype] = {b: None for b, t in city.module_type.items()
+                                            if t == mtype and b not in city.saturated}
+
+def register_tube(b1: int, b2: int) -> None:
+    """Tube construit ou émis ce tour : degré à jour, saturation immédiate."""
+    city.known_tubes.add((min(b1, b2), max(b1, b2)))
+    for b in (b1, b2):
+        city.tube_degree[b] = city.tube_degree.get(b, 0) + 1
+        if city.tube_degree[b] >= MAX_TUBES_PER_BUILDING and b not in city.saturated:
+            saturate_building(b)
+
+def sync_tube_degrees(existing_tubes: list) -> list:
+    """
+    Recale les degrés sur les tubes renvoyés par le jeu : seuls les écarts
+    avec le tour précédent sont traités. Un tube émis que le jeu n'a pas
+    construit (action refusée, ou non jouée en mode portefeuille) est
+    retiré ; renvoie les bâtiments rouverts par ce retrait.
+    """
+    tube_keys = {(min(a, b), max(a, b)) for a, b in existing_tubes}
+    reopened = []
+    for key in city.known_tubes - tube_keys:
+        city.known_tubes.discard(key)
+        for b in key:
+            city.tube_degree[b] -= 1
+            if b in city.saturated and city.tube_degree[b] < MAX_TUBES_PER_BUILDING:
+                reopen_building(b)
+                reopened.append(b)
+    for key in tube_keys - city.known_tubes:
+        register_tube(*key)
+    return reopened
+
+# ====================================================================================
+# 2.c Regroupement spatial : k-moyennes par type de bâtiment
+# ====================================================================================
+# Les aires d'une part, les modules de chaque type d'autre part, sont regroupés
+# par k-moyennes sur building_positions (k ~ racine de n). Dans chaque groupe,
+# le bâtiment le plus proche du centre sert de pôle : les sorties de
+# téléporteurs (5.d) ne sont cherchées que parmi les pôles. Les positions ne
+# changent pas, on recalcule seulement quand des bâtiments arrivent.
+
+KMEANS_ITERATIONS = 10
+
+def kmeans(points: list, k: int) -> tuple[list, list]:
+    """
+    Lloyd sur points [(x, y)], départ déterministe par points les plus
+    éloignés. Renvoie (groupe de chaque point, centres).
+    """
+    centers = [points[0]]
+    nearest = [math.dist(p, centers[0]) for p in points]
+    while len(centers) < k:
+        far = max(range(len(points)), key=nearest.__getitem__)
+        centers.append(points[far])
+        nearest = [min(d, math.dist(p, points[far])) for d, p in zip(nearest, points)]
+    
+    if np is not None:
+        coords = np.asarray(points, dtype=np.float64)
+        center_arr = np.asarray(centers, dtype=np.float64)
+        for _ in range(KMEANS_ITERATIONS):
+            labels = ((coords[:, None, :] - center_arr[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            moved = center_arr.copy()
+            for axis in range(2):
+                sums = np.bincount(labels, weights=coords[:, axis], minlength=k)
+                moved[:, axis] = np.where(counts > 0, sums / np.maximum(counts, 1), center_arr[:, axis])
+            if np.allclose(moved, center_arr):
+                break
+            center_arr = moved
+        return labels.tolist(), [tuple(c) for c in center_arr.tolist()]
+    
+    for _ in range(KMEANS_ITERATIONS):
+        labels = [min(range(k), key=lambda c: math.dist(p, centers[c])) for p in points]
+        sums = [[0.0, 0.0, 0] for _ in range(k)]
+        for (x, y), c in zip(points, labels):
+            sums[c][0] += x
+            sums[c][1] += y
+            sums[c][2] += 1
+        moved = [(sx / n, sy / n) if n else centers[c] for c, (sx, sy, n) in enumerate(sums)]
+        if moved == centers:
+            break
+        centers = moved
+    return labels, centers
+
+def cluster_hubs() -> set:
+    """Pôles des groupes d'aires et de modules de chaque type (voir plus haut)."""
+    if city.cluster_cache is not None and city.cluster_cache[0] == len(city.building_positions):
+        return city.cluster_cache[1]
+    
+    groups = defaultdict(list)
+    for b in sorted(city.building_positions):
+        if city.building_type.get(b) == "landing":
+            groups["landing"].append(b)
+        elif b in city.module_type:
+            groups[city.module_type[b]].append(b)
+    hubs = set()
+    for members in groups.values():
+        points = [city.building_positions[b] for b in members]
+        k = max(1, round(math.sqrt(len(members))))
+        labels, centers = kmeans(points, k)
+        best = {}
+        for b, p, c in zip(members, points, labels):
+            d = math.dist(p, centers[c])
+            if c not in best or d < best[c][0]:
+                best[c] = (d, b)
+        hubs.update(b for _, b in best.values())
+    
+    city.cluster_cache = (len(city.building_positions), hubs)
+    return hubs
+
+# ====================================================================================
+# 2.d Tables des paires de bâtiments : démarrage au tour 1, puis deltas
+# ====================================================================================
+#
+# Le coût de construction de chaque paire, les paires bloquées (un autre
+# bâtiment sur le segment) et les modules par type ne dépendent que des
+# bâtiments. Le premier tour, au délai plus long, les remplit pour tous les
+# bâtiments présents ; ensuite chaque bâtiment arrivé n'ajoute que ses paires
+# et bloque celles dont il occupe le segment, en O(B) attendu grâce aux
+# directions réduites (pas de parcours de toutes les paires). tube_construction_cost,
+# segment_hits_building et get_modules_by_type deviennent de simples lectures.
+# Les croisements avec les tubes sont tenus par le pool (5) et les arêtes de
+# Steiner (5.f), remplis eux aussi dès le tour 1.
+
+def index_buildings(arrived: list) -> set:
+    """
+    Ajoute aux tables les bâtiments arrivés (au tour 1 : tous les bâtiments présents).
+    Renvoie les paires déjà indexées que ces arrivées viennent de bloquer : le pool
+    de tubes (5) et les arêtes de Steiner (5.f) n'ont à retirer que celles-là.
+    """
+    positions = city.building_positions
+    newly_blocked = set()
+    for w in arrived:
+        if w in city.indexed_buildings or w not in positions:
+            continue
+        wx, wy = positions[w]
+        # Directions réduites (pgcd) de w vers chaque bâtiment indexé : les
+        # bâtiments alignés avec w tombent dans la même case de la table.
+        rays: dict[tuple[int, int], list] = defaultdict(list)
+        for o in city.indexed_buildings:
+            ox, oy = positions[o]
+            dx, dy = ox - wx, oy - wy
+            g = math.gcd(dx, dy)
+            if g == 0:
+                continue
+            rays[(dx // g, dy // g)].append((g, o))
+            city.pair_costs[(min(w, o), max(w, o))] = int(math.hypot(dx, dy) * 10)
+        for (dx, dy), ray in rays.items():
+            ray.sort()
+            # Sur une même demi-droite, seul le plus proche est visible depuis w
+            for _, o in ray[1:]:
+                city.blocked_pairs.add((min(w, o), max(w, o)))
+            # w est entre deux bâtiments de demi-droites opposées
+            if (dx, dy) > (0, 0) and (-dx, -dy) in rays:
+                for _, u in ray:
+                    for _, v in rays[(-dx, -dy)]:
+                        key = (min(u, v), max(u, v))
+                        if key not in city.blocked_pairs:
+                            city.blocked_pairs.add(key)
+                            newly_blocked.add(key)
+        city.indexed_buildings[w] = None
+        if w in city.module_type:
+            city.modules_by_type.setdefault(city.module_type[w], []).append(w)
+    return newly_blocked
+
 # ====================================================================================
 # 3. BFS et calcul des distances
 # ====================================================================================
@@ -104,7 +654,7 @@ def build_adjacency(routes: list) -> dict:
 
 def bfs_distances_from(start: int, adj: dict) -> dict:
     """BFS depuis start, renvoie dist[b] = nb minimal de tubes."""
-    dist = {b: 10**9 for b in all_buildings}
+    dist = {b: 10**9 for b in city.all_buildings}
     dist[start] = 0
     q = deque([start])
     while q:
@@ -120,113 +670,623 @@ def bfs_distances_from(start: int, adj: dict) -> dict:
     return dist
 
 def get_modules_by_type() -> dict:
-    """Renvoie {type: [building_ids]}."""
-    result = defaultdict(list)
-    for bid, btype in building_type.items():
-        if btype == "module":
-            mtype = module_type.get(bid)
-            if mtype is not None:
-                result[mtype].append(bid)
-    return result
+    """Renvoie {type: [building_ids]}, dans l'ordre d'arrivée (index 2.d, à ne pas modifier)."""
+    return city.modules_by_type
 
-def compute_min_distance_to_module_type(landing_id: int, target_type: int, adj: dict) -> int:
-    """Distance minimale d'une aire d'atterrissage à un module du type voulu."""
-    modules_of_type = [b for b in all_buildings 
-                       if building_type.get(b) == "module" and module_type.get(b) == target_type]
-    if not modules_of_type:
-        return 10**9
-    dist = bfs_distances_from(landing_id, adj)
-    return min(dist.get(m, 10**9) for m in modules_of_type)
+# ====================================================================================
+# 3.b Moteur de routage pondéré (Dijkstra + cache par source)
+# ====================================================================================
+#
+# Le BFS compte un tube = 1. Ici le temps d'un tube dépend de sa longueur
+# (building_positions) et de sa capacité : un tube de capacité 1 fait davantage
+# attendre les astronautes qu'un tube amélioré. Les téléporteurs (entrée -> sortie)
+# sont instantanés. Les arbres de plus courts chemins sont mis en cache par
+# source et invalidés dès que le réseau (routes ou bâtiments) change.
+
+# config.reference_tube_km : longueur d'un tube "typique" parcouru en 1 unité de temps
+# config.wait_penalty : attente moyenne supplémentaire sur un tube de capacité 1
+
+def tube_travel_time(u: int, v: int, cap: int) -> float:
+    """Temps de trajet estimé sur un tube (0 pour un téléporteur)."""
+    if cap <= 0:
+        return 0.0
+    x1, y1 = city.building_positions[u]
+    x2, y2 = city.building_positions[v]
+    return math.hypot(x2 - x1, y2 - y1) / config.reference_tube_km + config.wait_penalty / cap
+
+def update_routing_network(routes: list) -> None:
+    """Reconstruit le graphe pondéré et vide le cache si le réseau a changé."""
+    signature = (len(city.all_buildings), tuple(routes))
+    if signature == city.routing_signature:
+        return
+    city.routing_signature = signature
+    city.routing_cache.clear()
+    city.routing_adjacency.clear()
+    for b1, b2, cap in routes:
+        if b1 not in city.building_positions or b2 not in city.building_positions:
+            continue
+        weight = tube_travel_time(b1, b2, cap)
+        city.routing_adjacency.setdefault(b1, []).append((b2, weight))
+        if cap > 0:
+            city.routing_adjacency.setdefault(b2, []).append((b1, weight))
+
+def dijkstra_from(start: int) -> tuple[dict, dict]:
+    """Renvoie (temps[b], parent[b] = (prédécesseur, poids)) depuis start, avec cache."""
+    cached = city.routing_cache.get(start)
+    if cached is not None:
+        return cached
+    dist = {start: 0.0}
+    parent = {start: None}
+    heap = [(0.0, start)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, w in city.routing_adjacency.get(u, []):
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                parent[v] = (u, w)
+                heapq.heappush(heap, (nd, v))
+    city.routing_cache[start] = (dist, parent)
+    return dist, parent
 
 # ====================================================================================
-# 4. Simulation naïve du flux d'astronautes
+# 4. Flux d'astronautes : flot de coût minimum sur le réseau capacitaire
 # ====================================================================================
+#
+# Chaque mois, les astronautes d'un type vont de leurs aires vers n'importe quel
+# module de ce type. Réseau orienté : un tube de capacité c donne deux arcs (un
+# par sens) de débit c * SHUTTLE_THROUGHPUT astronautes/mois et de coût
+# tube_travel_time (3.b) ; un téléporteur, un arc entrée -> sortie de débit
+# illimité et de coût nul. Pour chaque type (les plus demandés d'abord, sur la
+# capacité laissée par les précédents), flot de coût minimum par plus courts
+# chemins successifs : un Dijkstra inversé depuis les modules du type, sur les
+# coûts réduits par des potentiels, donne un arbre de plus courts chemins le long
+# duquel on pousse la demande de toutes les aires à la fois ; un nouveau Dijkstra
+# n'est nécessaire que lorsqu'un arc sature. On n'en garde que le total acheminé
+# par type, en cache tant que le réseau ne change pas (même signature que 3.b).
 
-def estimate_astronaut_flow(adj: dict, routes: list) -> dict:
+def build_flow_network(routes: list) -> tuple[dict, list, list, list]:
     """
-    Estime le flux d'astronautes sur chaque tube.
-    Renvoie tube_flow[(min(a,b), max(a,b))] = nb estimé d'astronautes/jour.
+    Arcs résiduels appariés (l'arc e et son inverse e ^ 1). Renvoie
+    (arcs entrants par bâtiment, cible, capacité résiduelle, coût).
     """
-    tube_flow = defaultdict(int)
-    modules_by_type = get_modules_by_type()
+    in_arcs = defaultdict(list)
+    head, capacity, cost = [], [], []
     
-    for landing_id, astro_types in landing_astronaut_types.items():
-        if landing_id not in building_positions:
+    def add_arc(u, v, cap, c):
+        for a, b, k, w in ((u, v, cap, c), (v, u, 0, -c)):
+            in_arcs[b].append(len(head))
+            head.append(b)
+            capacity.append(k)
+            cost.append(w)
+    
+    for b1, b2, cap in routes:
+        if b1 not in city.building_positions or b2 not in city.building_positions:
             continue
+        if cap > 0:
+            weight = tube_travel_time(b1, b2, cap)
+            add_arc(b1, b2, cap * SHUTTLE_THROUGHPUT, weight)
+            add_arc(b2, b1, cap * SHUTTLE_THROUGHPUT, weight)
+        else:
+            add_arc(b1, b2, math.inf, 0.0)
+    return in_arcs, head, capacity, cost
+
+def push_type_flow(supply: dict, modules: list, network: tuple) -> dict:
+    """
+    Flot de coût minimum d'un type, des aires (supply : aire -> astronautes)
+    vers ses modules. Modifie les capacités résiduelles de network ;
+    renvoie {aire: astronautes acheminés}.
+    """
+    in_arcs, head, residual, cost = network
+    supply = {landing: count for landing, count in supply.items() if count > 0}
+    potential = {}
+    sent = defaultdict(int)
+    while supply:
+        # Distance réduite de chaque bâtiment au module le plus proche, et arc suivant
+        dist = {m: 0.0 for m in modules}
+        next_arc = {m: None for m in modules}
+        heap = [(0.0, m) for m in modules]
+        heapq.heapify(heap)
+        while heap:
+            d, v = heapq.heappop(heap)
+            if d > dist[v]:
+                continue
+            pv = potential.get(v, 0.0)
+            for e in in_arcs.get(v, ()):
+                if residual[e] <= 0:
+                    continue
+                u = head[e ^ 1]
+                # Coût réduit >= 0 en exact ; on écarte le bruit d'arrondi (sinon l'arbre peut boucler)
+                nd = d + max(0.0, cost[e] + pv - potential.get(u, 0.0))
+                if nd < dist.get(u, math.inf):
+                    dist[u] = nd
+                    next_arc[u] = e
+                    heapq.heappush(heap, (nd, u))
+        for b, d in dist.items():
+            potential[b] = potential.get(b, 0.0) + d
         
-        # Compter les astronautes par type
-        type_counts = defaultdict(int)
-        for t in astro_types:
-            type_counts[t] += 1
+        # Aires hors d'atteinte : elles le restent (les arcs inverses ne naissent
+        # que sur des chemins déjà reliés aux modules)
+        for landing in [l for l in supply if l not in dist]:
+            del supply[landing]
         
-        # Pour chaque type, trouver le module le plus proche et tracer le chemin
-        for atype, count in type_counts.items():
-            targets = modules_by_type.get(atype, [])
-            if not targets:
+        # Tous les arcs de l'arbre ont un coût réduit nul : on pousse depuis chaque
+        # aire tant qu'il reste de la capacité sur son chemin
+        for landing in list(supply):
+            amount = supply[landing]
+            path = []
+            node = landing
+            while next_arc[node] is not None:
+                e = next_arc[node]
+                amount = min(amount, residual[e])
+                path.append(e)
+                node = head[e]
+            if amount <= 0:
                 continue
-            
-            dist = bfs_distances_from(landing_id, adj)
-            best_module = min(targets, key=lambda m: dist.get(m, 10**9))
-            best_dist = dist.get(best_module, 10**9)
-            
-            if best_dist < 10**9:
-                # Estimer le flux : astronautes répartis sur le chemin
-                # Simplification : on ajoute count au "flux" de tous les tubes du chemin
-                # (approximation grossière mais utile)
-                tube_flow[(min(landing_id, best_module), max(landing_id, best_module))] += count
+            for e in path:
+                residual[e] -= amount
+                residual[e ^ 1] += amount
+            sent[landing] += amount
+            supply[landing] -= amount
+            if not supply[landing]:
+                del supply[landing]
+    return sent
+
+def routed_astronauts_by_type(routes: list) -> dict:
+    """
+    Astronautes/mois acheminés pour chaque type par le flot de coût minimum
+    (les types les plus demandés d'abord). La coupe minimale (4.c) s'en sert
+    pour savoir quels types manquent de capacité ; la charge des tubes vient,
+    elle, de la centralité (4.d).
+    """
+    if city.flow_cache is not None and city.flow_cache[0] == city.routing_signature:
+        return city.flow_cache[1]
     
-    return tube_flow
+    network = build_flow_network(routes)
+    residual = network[2]
+    demand_by_type = defaultdict(dict)
+    for landing_id, astro_types in city.landing_astronaut_types.items():
+        if landing_id in city.building_positions:
+            for t in astro_types:
+                demand_by_type[t][landing_id] = demand_by_type[t].get(landing_id, 0) + 1
+    modules_by_type = get_modules_by_type()
+    
+    routed = {}
+    for atype in sorted(demand_by_type, key=lambda t: (-sum(demand_by_type[t].values()), t)):
+        modules = [m for m in modules_by_type.get(atype, []) if m in city.building_positions]
+        if not modules:
+            continue
+        routed[atype] = sum(push_type_flow(demand_by_type[atype], modules, network).values())
+        # Le flot du type occupe la capacité des arcs ; les arcs inverses sont remis
+        # à zéro pour que le type suivant ne puisse pas l'annuler
+        for e in range(1, len(residual), 2):
+            residual[e] = 0
+    
+    city.flow_cache = (city.routing_signature, routed)
+    return routed
+
+# ====================================================================================
+# 4.b Planification de capacité : nombre de pods et niveau des tubes
+# ====================================================================================
+#
+# Une navette sur un seul tube le traverse chaque jour, dans le bon sens un jour
+# sur deux : elle achemine POD_CAPACITY * DAYS_PER_MONTH / 2 astronautes par mois.
+# Un tube de capacité c accepte c pods simultanément. On en déduit, pour chaque
+# tube saturé, le niveau nécessaire (pods présents + navettes manquantes) ;
+# les candidats POD et UPGRADE (5) en découlent, classés par débit marginal par
+# ressource.
 
-def find_bottleneck_tubes(routes: list, tube_flow: dict) -> list:
-    """Trouve les tubes saturés (flux > capacité × 20 jours)."""
+POD_CAPACITY = 10          # astronautes transportés par pod et par trajet
+DAYS_PER_MONTH = 20
+SHUTTLE_THROUGHPUT = POD_CAPACITY * DAYS_PER_MONTH // 2
+
+def pod_supply_per_tube(existing_pod_routes: dict) -> tuple[dict, dict]:
+    """
+    Renvoie (débit offert par les pods sur chaque tube en astronautes/mois,
+    nombre de pods empruntant chaque tube).
+    """
+    supply = defaultdict(float)
+    pods_on_tube = defaultdict(int)
+    for route in existing_pod_routes.values():
+        legs = len(route) - 1
+        if legs <= 0:
+            continue
+        traversals = defaultdict(int)
+        for a, b in zip(route, route[1:]):
+            traversals[(min(a, b), max(a, b))] += 1
+        for key, n in traversals.items():
+            supply[key] += POD_CAPACITY * DAYS_PER_MONTH * n / (2 * legs)
+            pods_on_tube[key] += 1
+    return supply, pods_on_tube
+
+def find_bottleneck_tubes(routes: list, tube_load: dict, existing_pod_routes: dict, lost: dict) -> list:
+    """
+    Trouve les tubes dont la charge (4.d) dépasse le débit offert par leurs
+    pods. Le flux d'un tube de la coupe minimale (4.c) compte aussi le débit
+    qu'il empêche de livrer : c'est lui qu'il faut équiper (POD) ou améliorer.
+    """
+    supply, _ = pod_supply_per_tube(existing_pod_routes)
     bottlenecks = []
     for b1, b2, cap in routes:
         if cap <= 0:
             continue
         key = (min(b1, b2), max(b1, b2))
-        flow = tube_flow.get(key, 0)
-        # Capacité effective = cap pods × 10 passagers × 20 jours (simplifié)
-        effective_capacity = cap * 10 * 20
-        if flow > effective_capacity * 0.5:  # > 50% de saturation
+        flow = tube_load.get(key, 0) + lost.get(key, 0)
+        if flow > supply.get(key, 0) * config.bottleneck_ratio:
             bottlenecks.append((b1, b2, cap, flow))
     return bottlenecks
 
+def plan_capacity(bottlenecks: list, existing_pod_routes: dict) -> list:
+    """
+    Pour chaque tube saturé : débit manquant, pods déjà présents, capacité
+    actuelle et capacité requise (pods présents + navettes qui couvrent le
+    manque). Renvoie une liste de dicts triée par débit manquant.
+    """
+    supply, pods_on_tube = pod_supply_per_tube(existing_pod_routes)
+    plan = []
+    for b1, b2, cap, flow in bottlenecks:
+        key = (min(b1, b2), max(b1, b2))
+        unmet = flow - supply.get(key, 0)
+        if unmet <= 0:
+            continue
+        pods = pods_on_tube.get(key, 0)
+        plan.append({
+            "tube": (b1, b2),
+            "flow": flow,
+            "unmet": unmet,
+            "pods": pods,
+            "capacity": cap,
+            "required_capacity": pods + math.ceil(unmet / SHUTTLE_THROUGHPUT),
+        })
+    plan.sort(key=lambda p: p["unmet"], reverse=True)
+    return plan
+
+# ====================================================================================
+# 4.c Flot maximum / coupe minimale par type : les tubes qui plafonnent les livraisons
+# ====================================================================================
+#
+# Pour chaque type, flot maximum (Dinic) des aires demandeuses vers ses modules
+# sur le réseau de 4 (capacités pleines, chaque type pris isolément). Si la
+# demande reliée aux modules dépasse ce flot, les tubes de la coupe minimale
+# (arcs saturés du côté des aires vers le côté des modules) sont ceux qui
+# plafonnent les livraisons : le débit perdu leur est attribué au prorata de
+# leur capacité. La demande sans aucun chemin vers un module relève des TUBE,
+# pas de la coupe.
+
+SOURCE, SINK = -1, -2      # sommets virtuels (les id de bâtiments sont >= 0)
+
+def dinic_max_flow(out_arcs: dict, head: list, residual: list, source: int, sink: int) -> int:
+    """Flot maximum de source à sink ; modifie residual (arcs appariés e, e ^ 1)."""
+    total = 0
+    while True:
+        # Graphe de niveaux (BFS)
+        level = {source: 0}
+        q = deque([source])
+        while q:
+            u = q.popleft()
+            for e in out_arcs.get(u, ()):
+                if residual[e] > 0 and head[e] not in level:
+                    level[head[e]] = level[u] + 1
+                    q.append(head[e])
+        if sink not in level:
+            return total
+        
+        # Flot bloquant : DFS itératif, chaque arc essayé au plus une fois par phase
+        pointer = dict.fromkeys(level, 0)
+        while True:
+            path, u = [], source
+            while u != sink:
+                arcs = out_arcs.get(u, ())
+                i = pointer[u]
+                while i < len(arcs) and not (residual[arcs[i]] > 0 and level.get(head[arcs[i]]) == level[u] + 1):
+                    i += 1
+                pointer[u] = i
+                if i < len(arcs):
+                    path.append(arcs[i])
+                    u = head[arcs[i]]
+                elif path:          # impasse : on recule d'un arc
+                    u = head[path.pop() ^ 1]
+                    pointer[u] += 1
+                else:
+                    break
+            if u != sink:
+                break
+            amount = min(residual[e] for e in path)
+            for e in path:
+                residual[e] -= amount
+                residual[e ^ 1] += amount
+            total += amount
+
+def find_min_cut_tubes(routes: list) -> dict:
+    """
+    Renvoie lost[(min(a,b), max(a,b))] = astronautes/mois que la coupe
+    minimale empêche de livrer, sommés sur les types. En cache comme 4.
+    """
+    if city.min_cut_cache is not None and city.min_cut_cache[0] == city.routing_signature:
+        return city.min_cut_cache[1]
+    
+    routed = routed_astronauts_by_type(routes)
+    in_arcs, head, capacity, _ = build_flow_network(routes)
+    out_arcs = defaultdict(list)
+    for e in range(len(head)):
+        out_arcs[head[e ^ 1]].append(e)
+    demand_by_type = defaultdict(dict)
+    for landing_id, astro_types in city.landing_astronaut_types.items():
+        if landing_id in city.building_positions:
+            for t in astro_types:
+                demand_by_type[t][landing_id] = demand_by_type[t].get(landing_id, 0) + 1
+    
+    lost = defaultdict(float)
+    for atype, modules in get_modules_by_type().items():
+        supply = demand_by_type.get(atype)
+        if not supply:
+            continue
+        # Aires reliées aux modules, capacités ignorées
+        connected = set(modules)
+        q = deque(modules)
+        while q:
+            v = q.popleft()
+            for e in in_arcs.get(v, ()):
+                u = head[e ^ 1]
+                if capacity[e] > 0 and u not in connected:
+                    connected.add(u)
+                    q.append(u)
+        demand = sum(count for landing, count in supply.items() if landing in connected)
+        # Le flot de 4 achemine déjà tout sur moins de capacité : pas de coupe
+        if demand <= routed.get(atype, 0):
+            continue
+        
+        # Réseau du type : arcs de 4 + SOURCE -> aires et modules -> SINK
+        type_head, residual = list(head), list(capacity)
+        type_out = {u: list(arcs) for u, arcs in out_arcs.items()}
+        virtual = [(SOURCE, landing, count) for landing, count in supply.items() if landing in connected]
+        virtual += [(m, SINK, math.inf) for m in modules]
+        for u, v, cap in virtual:
+            type_out.setdefault(u, []).append(len(type_head))
+            type_head.append(v)
+            residual.append(cap)
+            type_out.setdefault(v, []).append(len(type_head))
+            type_head.append(u)
+            residual.append(0)
+        missing = demand - dinic_max_flow(type_out, type_head, residual, SOURCE, SINK)
+        if missing <= 0:
+            continue
+        
+        # Côté source de la coupe : sommets encore atteignables dans le résiduel
+        reached = {SOURCE}
+        q = deque([SOURCE])
+        while q:
+            u = q.popleft()
+            for e in type_out.get(u, ()):
+                if residual[e] > 0 and type_head[e] not in reached:
+                    reached.add(type_head[e])
+                    q.append(type_head[e])
+        cut = [e for e in range(0, len(head), 2)
+               if head[e ^ 1] in reached and head[e] not in reached and capacity[e] != math.inf]
+        cut_capacity = sum(capacity[e] for e in cut)
+        for e in cut:
+            lost[(min(head[e], head[e ^ 1]), max(head[e], head[e ^ 1]))] += missing * capacity[e] / cut_capacity
+    
+    city.min_cut_cache = (city.routing_signature, lost)
+    return lost
+
+# ====================================================================================
+# 4.d Centralité d'intermédiarité des tubes (Brandes pondéré par la demande)
+# ====================================================================================
+#
+# L'arbitre fait suivre aux astronautes un plus court chemin en nombre de tubes
+# (téléporteurs gratuits, de l'entrée vers la sortie) jusqu'au module le plus
+# proche de leur type. La centralité d'un tube est le nombre d'astronautes par
+# mois qui le traversent quand chaque couple (aire, type) se répartit également
+# entre ses plus courts chemins : accumulation des dépendances de Brandes depuis
+# chaque aire, avec pour seules cibles les modules visés. Contrairement au flot
+# de 4 (temps de trajet, capacités), c'est la charge telle que l'arbitre la voit :
+# elle dimensionne les POD et UPGRADE (4.b) et ordonne les pods de secours (6.6).
+#
+# La contribution de chaque aire est gardée d'un tour à l'autre. Quand des liens
+# arrivent, seules les aires dont le graphe des plus courts chemins change sont
+# recalculées : celles pour qui les deux extrémités d'un nouveau tube sont à des
+# distances différentes (inatteignable = infiniment loin), ou pour qui la sortie
+# d'un nouveau téléporteur n'est pas plus proche que son entrée.
+
+def landing_dependencies(landing_id: int, modules_by_type: dict) -> tuple[dict, dict]:
+    """Renvoie (distance en tubes, charge[(min(a,b), max(a,b))]) pour la demande de landing_id."""
+    adj = city.betweenness_adjacency
+    dist = {landing_id: 0}
+    q = deque([landing_id])
+    while q:
+        u = q.popleft()
+        for v, w in adj.get(u, ()):
+            if dist[u] + w < dist.get(v, 10**9):
+                dist[v] = dist[u] + w
+                if w == 0:
+                    q.appendleft(v)
+                else:
+                    q.append(v)
+    
+    # Nombre de plus courts chemins ; à distance égale l'entrée d'un téléporteur
+    # passe avant sa sortie (un bâtiment n'a qu'un téléporteur)
+    order = sorted(dist, key=lambda b: (dist[b], b in city.teleport_exits))
+    sigma = dict.fromkeys(order, 0)
+    sigma[landing_id] = 1
+    preds = defaultdict(list)
+    for u in order:
+        for v, w in adj.get(u, ()):
+            if dist[v] == dist[u] + w:
+                sigma[v] += sigma[u]
+                preds[v].append(u)
+    
+    # Astronautes déposés sur chaque module le plus proche de leur type
+    arriving = defaultdict(float)
+    type_counts = defaultdict(int)
+    for t in city.landing_astronaut_types.get(landing_id, ()):
+        type_counts[t] += 1
+    for atype, count in type_counts.items():
+        reached = [(dist[m], m) for m in modules_by_type.get(atype, ()) if m in dist]
+        if not reached:
+            continue
+        nearest = min(reached)[0]
+        targets = [m for d, m in reached if d == nearest]
+        for m in targets:
+            arriving[m] += count / len(targets)
+    
+    # Dépendances, des plus loin vers l'aire (les téléporteurs ne sont pas comptés)
+    carried = defaultdict(float)
+    load = defaultdict(float)
+    for w in reversed(order):
+        through = arriving.get(w, 0.0) + carried.get(w, 0.0)
+        if not through:
+            continue
+        share = through / sigma[w]
+        for v in preds[w]:
+            amount = sigma[v] * share
+            carried[v] += amount
+            if dist[w] != dist[v]:
+                load[(min(v, w), max(v, w))] += amount
+    return dist, load
+
+def update_edge_betweenness(routes: list) -> dict:
+    """
+    Met à jour et renvoie city.edge_betweenness[(min(a,b), max(a,b))] =
+    astronautes/mois sur le tube, en ne recalculant que les aires touchées.
+    """
+    new_links = []
+    for b1, b2, cap in routes:
+        if b1 not in city.building_positions or b2 not in city.building_positions:
+            continue
+        link = (min(b1, b2), max(b1, b2), True) if cap > 0 else (b1, b2, False)
+        if link in city.betweenness_links:
+            continue
+        city.betweenness_links.add(link)
+        new_links.append(link)
+        if cap > 0:
+            city.betweenness_adjacency.setdefault(b1, []).append((b2, 1))
+            city.betweenness_adjacency.setdefault(b2, []).append((b1, 1))
+        else:
+            city.betweenness_adjacency.setdefault(b1, []).append((b2, 0))
+            city.teleport_exits.add(b2)
+    
+    stale = [landing for landing in city.landing_astronaut_types
+             if landing in city.building_positions and landing not in city.betweenness_sources]
+    for landing, (dist, _) in city.betweenness_sources.items():
+        for b1, b2, is_tube in new_links:
+            d1, d2 = dist.get(b1), dist.get(b2)
+            if d1 != d2 if is_tube else d1 is not None and (d2 is None or d2 >= d1):
+                stale.append(landing)
+                break
+    if not stale:
+        return city.edge_betweenness
+    
+    modules_by_type = get_modules_by_type()
+    totals = city.edge_betweenness
+    for landing in stale:
+        if landing in city.betweenness_sources:
+            for key, amount in city.betweenness_sources[landing][1].items():
+                totals[key] -= amount
+                if totals[key] < 1e-9:
+                    del totals[key]
+        dist, load = landing_dependencies(landing, modules_by_type)
+        city.betweenness_sources[landing] = (dist, load)
+        for key, amount in load.items():
+            totals[key] = totals.get(key, 0.0) + amount
+    return totals
+
 # ====================================================================================
 # 5. Génération de candidats d'actions avec scoring
 # ====================================================================================
 
-def generate_tube_candidates(remaining_resources: int, degree: dict, existing_tubes: list, adj: dict) -> list:
-    """Génère des candidats TUBE avec score."""
+def tube_pair_score(landing_id: int, mod: int, wanted: int, cost: int) -> float:
+    """Score : nb astronautes de ce type × inverse de la distance."""
+    nb_astros = city.landing_astronaut_types[landing_id].count(wanted)
+    dist = math.hypot(
+        city.building_positions[landing_id][0] - city.building_positions[mod][0],
+        city.building_positions[landing_id][1] - city.building_positions[mod][1]
+    )
+    return nb_astros * config.tube_demand_weight / max(dist, 1) - cost * config.tube_cost_weight
+
+def add_pool_pair(pair: tuple[int, int], entry: tuple[int, float]) -> None:
+    city.tube_pool[pair] = entry
+    for b in pair:
+        city.tube_pool_by_building.setdefault(b, set()).add(pair)
+
+def drop_pool_pair(pair: tuple[int, int]) -> None:
+    del city.tube_pool[pair]
+    for b in pair:
+        city.tube_pool_by_building[b].discard(pair)
+
+def refresh_tube_pool(existing_tubes: list, new_buildings: list, reopened: list = (), blocked: set = ()) -> None:
+    """
+    Met à jour city.tube_pool, les paires aire -> module géométriquement
+    valides (aucun croisement avec un tube, aucun bâtiment sur le trajet)
+    entre bâtiments non saturés (2.b).
+    Seul ce qui a changé depuis le tour précédent est recalculé :
+    - paires croisant un tube apparu depuis, ou devenues des tubes : retirées ;
+    - paires sur le trajet desquelles un nouveau bâtiment est posé (blocked,
+      renvoyé par index_buildings) : retirées ;
+    - paires touchant un nouveau bâtiment ou un bâtiment rouvert : validées
+      contre tout le réseau.
+    Les tubes ne disparaissent jamais : une paire retirée ne redevient pas valide.
+    Le budget change chaque tour : il est filtré à la génération.
+    """
+    pool = city.tube_pool
+    tube_keys = {(min(a, b), max(a, b)) for a, b in existing_tubes}
+    new_tubes = [key for key in tube_keys if key not in city.tube_pool_tubes]
+    city.tube_pool_tubes = tube_keys
+
+    if new_tubes and pool:
+        for pair in [pair for pair in pool if (min(pair), max(pair)) in tube_keys]:
+            drop_pool_pair(pair)
+        crossings = sweep_crossings(list(pool), new_tubes, among_segments=False)
+        for pair in [pair for pair in pool if crossings.get((min(pair), max(pair)))]:
+            drop_pool_pair(pair)
+
+    for u, v in blocked:
+        for pair in ((u, v), (v, u)):
+            if pair in pool:
+                drop_pool_pair(pair)
+
+    arrived = [b for b in new_buildings if b in city.building_positions]
+
+    # Nouvelles paires : nouvelle aire × modules de ses types, aires existantes × nouveau module
+    touched = set(arrived) | set(reopened)
+    pairs = []
+    for landing_id in city.open_landings:
+        for wanted in set(city.landing_astronaut_types[landing_id]):
+            for mod in city.open_modules_by_type.get(wanted, ()):
+                if (landing_id in touched or mod in touched) and (landing_id, mod) not in pool \
+                        and (min(landing_id, mod), max(landing_id, mod)) not in tube_keys:
+                    pairs.append((landing_id, mod, wanted))
+    crossings = sweep_crossings([(l, m) for l, m, _ in pairs], existing_tubes, among_segments=False)
+    for landing_id, mod, wanted in pairs:
+        if crossings.get((min(landing_id, mod), max(landing_id, mod))) or segment_hits_building(landing_id, mod):
+            continue
+        cost = tube_construction_cost(landing_id, mod)
+        add_pool_pair((landing_id, mod), (cost, tube_pair_score(landing_id, mod, wanted, cost)))
+
+def generate_tube_candidates(remaining_resources: int, existing_tubes: list, adj: dict) -> list:
+    """
+    Génère des candidats TUBE avec score, à partir du pool tenu à jour par
+    refresh_tube_pool(). Seuls les bâtiments non saturés sont parcourus (2.b).
+    """
     candidates = []
     existing_set = set((a, b) for a, b in existing_tubes) | set((b, a) for a, b in existing_tubes)
-    modules_by_type = get_modules_by_type()
     
-    for landing_id, astro_types in landing_astronaut_types.items():
-        if landing_id not in building_positions:
-            continue
-        
+    # Même ordre de parcours qu'une génération complète (à score égal, le tri est stable)
+    for landing_id in city.open_landings:
         # Types uniques demandés par cette aire
-        wanted_types = set(astro_types)
+        wanted_types = set(city.landing_astronaut_types[landing_id])
         
         for wanted in wanted_types:
-            modules = modules_by_type.get(wanted, [])
-            for mod in modules:
-                if (landing_id, mod) in existing_set:
-                    continue
-                if not tube_is_geometrically_valid(landing_id, mod, existing_tubes, degree):
+            for mod in city.open_modules_by_type.get(wanted, ()):
+                entry = city.tube_pool.get((landing_id, mod))
+                if entry is None or (landing_id, mod) in existing_set:
                     continue
-                cost = tube_construction_cost(landing_id, mod)
+                cost, score = entry
                 if cost > remaining_resources:
                     continue
                 
-                # Score : nb astronautes de ce type × inverse de la distance
-                nb_astros = astro_types.count(wanted)
-                dist = math.hypot(
-                    building_positions[landing_id][0] - building_positions[mod][0],
-                    building_positions[landing_id][1] - building_positions[mod][1]
-                )
-                score = nb_astros * 1000 / max(dist, 1) - cost * 0.1
-                
                 candidates.append({
                     "type": "TUBE",
                     "action": f"TUBE {landing_id} {mod}",
@@ -237,163 +1297,939 @@ def generate_tube_candidates(remaining_resources: int, degree: dict, existing_tu
     
     return candidates
 
-def generate_upgrade_candidates(remaining_resources: int, routes: list, bottlenecks: list) -> list:
-    """Génère des candidats UPGRADE pour les tubes saturés."""
+def generate_upgrade_candidates(remaining_resources: int, routes: list, capacity_plan: list) -> list:
+    """
+    Génère des candidats POD (navettes) et UPGRADE à partir du plan de capacité (4.b) :
+    une navette tant que le tube a une place libre, une amélioration quand la
+    capacité requise dépasse la capacité actuelle (le pod suivant en dépend).
+    Score : astronautes/mois gagnés pour 1000 ressources.
+    """
     candidates = []
     
-    for b1, b2, cap, flow in bottlenecks:
-        upgrade_cost = tube_construction_cost(b1, b2) * (cap + 1)
-        if upgrade_cost > remaining_resources:
-            continue
+    for step in capacity_plan:
+        b1, b2 = step["tube"]
+        cap, unmet = step["capacity"], step["unmet"]
+        free = cap - step["pods"]
         
-        # Score basé sur le flux et la saturation
-        score = flow * 10 - upgrade_cost * 0.1
+        if free > 0 and POD_COST <= remaining_resources:
+            gain = min(unmet, SHUTTLE_THROUGHPUT)
+            candidates.append({
+                "type": "POD",
+                "action": f"POD {{pod_id}} {b1} {b2} {b1}",
+                "score": gain / POD_COST * config.upgrade_score_weight,
+                "cost": POD_COST,
+                "buildings": (b1, b2),
+                "route": [b1, b2, b1],
+                "tube": (min(b1, b2), max(b1, b2))
+            })
         
-        candidates.append({
-            "type": "UPGRADE",
-            "action": f"UPGRADE {b1} {b2}",
-            "score": score,
-            "cost": upgrade_cost,
-            "buildings": (b1, b2)
-        })
+        if step["required_capacity"] > cap:
+            cost = tube_construction_cost(b1, b2) * (cap + 1)
+            if cost > remaining_resources:
+                continue
+            # Débit que les places libres ne couvrent pas ; il faudra aussi le pod
+            gain = min(unmet - max(free, 0) * SHUTTLE_THROUGHPUT, SHUTTLE_THROUGHPUT)
+            candidates.append({
+                "type": "UPGRADE",
+                "action": f"UPGRADE {b1} {b2}",
+                "score": gain / (cost + POD_COST) * config.upgrade_score_weight,
+                "cost": cost,
+                "buildings": (b1, b2)
+            })
     
     return candidates
 
-def generate_pod_candidates(remaining_resources: int, routes: list, existing_pod_routes: dict, adj: dict) -> list:
-    """Génère des candidats POD avec différentes stratégies."""
+def generate_pod_candidates(remaining_resources: int, routes: list, existing_pod_routes: dict, adj: dict,
+                            demands: list | None = None) -> list:
+    """Génère des candidats POD sur des tournées multi-arrêts (voir 5.b)."""
     candidates = []
     POD_COST = 1000
     
     if remaining_resources < POD_COST:
         return []
     
-    # Tubes déjà couverts par des pods
-    covered_tubes = set()
-    for pid, route in existing_pod_routes.items():
-        for i in range(len(route) - 1):
-            a, b = route[i], route[i+1]
-            covered_tubes.add((min(a, b), max(a, b)))
+    # Demande landing -> module pas encore absorbée par les pods existants
+    if demands is None:
+        demands = residual_demands(collect_demand_paths(adj), existing_pod_routes)
     
-    # Candidats : tubes non couverts, priorité aux tubes touchant une landing
-    for b1, b2, cap in routes:
-        if cap <= 0:
-            continue
-        key = (min(b1, b2), max(b1, b2))
-        if key in covered_tubes:
-            continue
-        
-        # Score basé sur l'importance du tube
-        score = 100
-        if building_type.get(b1) == "landing":
-            score += 500
-            # Bonus si le landing a beaucoup d'astronautes
-            score += len(landing_astronaut_types.get(b1, [])) * 10
-        if building_type.get(b2) == "landing":
-            score += 500
-            score += len(landing_astronaut_types.get(b2, [])) * 10
-        
-        # Route aller-retour
-        route_str = f"{b1} {b2} {b1} {b2} {b1} {b2} {b1} {b2}"
+    for served, route in optimize_pod_itineraries(demands):
+        # Score : astronautes servis par ce pod (max 100 sur une navette d'un tube)
+        score = served * config.pod_score_weight
+        route_str = " ".join(map(str, route))
         
         candidates.append({
             "type": "POD",
             "action": f"POD {{pod_id}} {route_str}",
             "score": score,
             "cost": POD_COST,
-            "buildings": (b1, b2)
+            "buildings": (route[0], route[1]),
+            "route": route
         })
     
     return candidates
 
 def generate_teleport_candidates(remaining_resources: int, routes: list, adj: dict) -> list:
-    """Génère des candidats TELEPORT entre zones éloignées."""
+    """Génère des candidats TELEPORT classés par économie de distance (voir 5.d)."""
     candidates = []
     TELEPORT_COST = 5000
     
-    if remaining_resources < TELEPORT_COST:
-        return []
+    for saving, entrance, exit_id in plan_teleports(routes):
+        # Score : astronautes × temps de trajet économisé par mois, pour 1000 ressources
+        score = saving / TELEPORT_COST * config.teleport_score_weight
+        candidates.append({
+            "type": "TELEPORT",
+            "action": f"TELEPORT {entrance} {exit_id}",
+            "score": score,
+            "cost": TELEPORT_COST,
+            "buildings": (entrance, exit_id)
+        })
     
-    # Bâtiments déjà avec téléporteur
+    return candidates
+
+# ====================================================================================
+# 5.b Optimiseur d'itinéraires de pods (tournées multi-arrêts)
+# ====================================================================================
+#
+# Au lieu d'un pod par tube en aller-retour, on construit des boucles qui suivent
+# les chemins landing -> module les plus demandés, puis on fusionne les boucles
+# qui partagent un arrêt (recherche locale type "savings" de Clarke-Wright) tant
+# que cela augmente la demande servie par pod.
+
+MAX_ROUTE_STOPS = 30       # au-delà, un pod fait trop peu de tours par mois
+MAX_DEMAND_PATHS = 60      # on ne garde que les chemins les plus demandés
+MAX_MERGE_PASSES = 6
+# config.route_pod_penalty : "prix" d'un pod exprimé en astronautes servis
+
+def shortest_tube_path(start: int, targets: set, adj: dict) -> list | None:
+    """BFS sur les seuls tubes (les pods n'empruntent pas les téléporteurs)."""
+    parent = {start: None}
+    q = deque([start])
+    while q:
+        u = q.popleft()
+        if u in targets:
+            path = []
+            while u is not None:
+                path.append(u)
+                u = parent[u]
+            return path[::-1]
+        for v, w in adj.get(u, []):
+            if w > 0 and v not in parent:
+                parent[v] = u
+                q.append(v)
+    return None
+
+def collect_demand_paths(adj: dict) -> list:
+    """Renvoie [(nb_astronautes, chemin)] pour chaque couple (landing, type) relié par tubes."""
+    demands = []
+    modules_by_type = get_modules_by_type()
+    for landing_id, astro_types in city.landing_astronaut_types.items():
+        type_counts = defaultdict(int)
+        for t in astro_types:
+            type_counts[t] += 1
+        for atype, count in type_counts.items():
+            targets = set(modules_by_type.get(atype, []))
+            if not targets:
+                continue
+            path = shortest_tube_path(landing_id, targets, adj)
+            if path and len(path) >= 2:
+                demands.append((count, path))
+    demands.sort(key=lambda d: d[0], reverse=True)
+    return demands
+
+def route_capacity(route: list) -> int:
+    """Astronautes transportables par mois par un pod sur cette boucle."""
+    legs = max(len(route) - 1, 1)
+    return POD_CAPACITY * DAYS_PER_MONTH // legs
+
+def path_in_route(path: list, route: list) -> bool:
+    """Vrai si les arrêts de path apparaissent consécutivement dans la boucle route."""
+    cyclic = route + route[1:]
+    n = len(path)
+    for i in range(len(route) - 1):
+        if cyclic[i] == path[0] and cyclic[i:i + n] == path:
+            return True
+    return False
+
+def closed_route_for_path(path: list) -> list:
+    """Aller-retour le long du chemin : [l, a, m] -> [l, a, m, a, l]."""
+    return path + path[-2::-1]
+
+def merge_routes(r1: list, r2: list, shared: int) -> list:
+    """Concatène deux boucles fermées en les faisant pivoter sur l'arrêt commun."""
+    def rotate(route):
+        body = route[:-1]
+        idx = body.index(shared)
+        return body[idx:] + body[:idx] + [shared]
+    return rotate(r1) + rotate(r2)[1:]
+
+def allocate_demand_to_pods(demands: list, pod_routes: dict) -> tuple[dict, list]:
+    """
+    Répartit la demande entre les pods (les plus anciens d'abord) dans la
+    limite de leur capacité. Renvoie (pod_id -> astronautes, demande résiduelle).
+    """
+    remaining_capacity = {pid: route_capacity(r) for pid, r in pod_routes.items() if len(r) >= 2}
+    loads = defaultdict(int)
+    residual = []
+    for count, path in demands:
+        for pid in sorted(remaining_capacity):
+            if count <= 0:
+                break
+            if remaining_capacity[pid] <= 0 or not path_in_route(path, pod_routes[pid]):
+                continue
+            carried = min(count, remaining_capacity[pid])
+            remaining_capacity[pid] -= carried
+            loads[pid] += carried
+            count -= carried
+        if count > 0:
+            residual.append((count, path))
+    return loads, residual
+
+def residual_demands(demands: list, existing_pod_routes: dict) -> list:
+    """Retire de la demande ce que les pods existants transportent déjà."""
+    return allocate_demand_to_pods(demands, existing_pod_routes)[1]
+
+def optimize_pod_itineraries(demands: list) -> list:
+    """
+    Recherche locale sur les tournées. Chaque tournée possède un ensemble de
+    demandes ; valeur = min(demande, capacité) - config.route_pod_penalty.
+    Mouvements : fusion de deux tournées sur un arrêt commun (savings),
+    puis suppression des tournées qui ne rentabilisent pas leur pod.
+    Renvoie [(astronautes_servis, route)] triée par demande servie.
+    Le résultat est conservé tant que la demande ne change pas (même tour,
+    ou tours suivants sans nouveau bâtiment ni nouveau pod).
+    """
+    demands = demands[:scaled(MAX_DEMAND_PATHS, "6.3 candidats")]
+    key = tuple((count, tuple(path)) for count, path in demands)
+    if city.itinerary_cache is not None and city.itinerary_cache[0] == key:
+        return [(served, list(route)) for served, route in city.itinerary_cache[1]]
+    tours = [(closed_route_for_path(path), count) for count, path in demands]
+
+    def value(route, load):
+        return min(load, route_capacity(route)) - config.route_pod_penalty
+
+    for _ in range(MAX_MERGE_PASSES):
+        savings = []
+        stops = [set(route) for route, _ in tours]
+        for i in range(len(tours)):
+            ri, li = tours[i]
+            for j in range(i + 1, len(tours)):
+                rj, lj = tours[j]
+                if len(ri) + len(rj) - 1 > MAX_ROUTE_STOPS:
+                    continue
+                shared = stops[i] & stops[j]
+                if not shared:
+                    continue
+                merged = merge_routes(ri, rj, min(shared))
+                gain = value(merged, li + lj) - value(ri, li) - value(rj, lj)
+                if gain > 0:
+                    savings.append((gain, i, j, merged))
+        if not savings:
+            break
+        savings.sort(key=lambda s: s[0], reverse=True)
+        used = set()
+        merged_tours = []
+        for gain, i, j, merged in savings:
+            if i in used or j in used:
+                continue
+            used.add(i)
+            used.add(j)
+            merged_tours.append((merged, tours[i][1] + tours[j][1]))
+        tours = merged_tours + [t for k, t in enumerate(tours) if k not in used]
+
+    result = [(min(load, route_capacity(route)), route) for route, load in tours
+              if value(route, load) > 0]
+    result.sort(key=lambda r: r[0], reverse=True)
+    city.itinerary_cache = (key, [(served, list(route)) for served, route in result])
+    return result
+
+# ====================================================================================
+# 5.c Gestion de flotte : utilisation des pods et recyclage (DESTROY + POD)
+# ====================================================================================
+#
+# Le jeu ne donne que les itinéraires des pods : on estime leur charge en
+# répartissant la demande landing -> module (voir 5.b) et on lisse cette
+# utilisation d'un tour à l'autre. Un pod durablement vide ou doublon est
+# détruit (remboursement 750) et remplacé par un pod sur une tournée saturée.
+# La charge par chemins ne voit pas toujours celle que la centralité (4.d) met
+# sur un tube : un pod jugé vide peut y être aussitôt redemandé. Les tubes d'un
+# pod détruit ne reçoivent donc pas de pod identique pendant RECYCLE_COOLDOWN tours.
+
+DESTROY_REFUND = 750
+MIN_POD_AGE = 2                # tours d'observation avant de juger un pod
+RECYCLE_COOLDOWN = 6           # tours sans reconstruire un pod sur les mêmes tubes
+# config.idle_utilization : en dessous, le pod est considéré comme inactif
+# config.utilization_smoothing : poids de l'observation du tour dans la moyenne
+
+def update_pod_utilization(loads: dict, existing_pod_routes: dict) -> None:
+    """Met à jour l'utilisation lissée de chaque pod et oublie les pods disparus."""
+    for pid, route in existing_pod_routes.items():
+        util = loads.get(pid, 0) / max(route_capacity(route), 1)
+        prev = city.pod_utilization.get(pid)
+        city.pod_utilization[pid] = util if prev is None else prev + config.utilization_smoothing * (util - prev)
+        city.pod_age[pid] = city.pod_age.get(pid, 0) + 1
+    for pid in list(city.pod_utilization):
+        if pid not in existing_pod_routes:
+            del city.pod_utilization[pid]
+            city.pod_age.pop(pid, None)
+
+def route_legs(route: list) -> frozenset:
+    """Ensemble des tubes parcourus par un itinéraire."""
+    return frozenset((min(a, b), max(a, b)) for a, b in zip(route, route[1:]))
+
+def recently_recycled(route: list) -> bool:
+    """Un pod sur exactement ces tubes a-t-il été détruit il y a moins de RECYCLE_COOLDOWN tours ?"""
+    turn = city.recycled_routes.get(route_legs(route))
+    return turn is not None and city.turn_number - turn < RECYCLE_COOLDOWN
+
+def find_duplicate_pods(existing_pod_routes: dict) -> set:
+    """Pods dont l'ensemble de tubes parcourus est identique à celui d'un pod plus ancien."""
+    seen = set()
+    duplicates = set()
+    for pid in sorted(existing_pod_routes):
+        legs = route_legs(existing_pod_routes[pid])
+        if legs in seen:
+            duplicates.add(pid)
+        seen.add(legs)
+    return duplicates
+
+def plan_fleet_rebalancing(existing_pod_routes: dict, loads: dict, demands: list, remaining_resources: int) -> list:
+    """
+    Renvoie [(pod_id_détruit, route_remplaçante)].
+    Recycler coûte POD_COST - DESTROY_REFUND mais fait perdre la charge du pod
+    détruit. Au taux "astronautes par ressource" de la tournée remplaçante, c'est
+    rentable dès que cette charge vaut moins que le remboursement.
+    """
+    duplicates = find_duplicate_pods(existing_pod_routes)
+    idle = [pid for pid in existing_pod_routes
+            if city.pod_age.get(pid, 0) >= MIN_POD_AGE
+            and (city.pod_utilization.get(pid, 0) < config.idle_utilization or pid in duplicates)]
+    idle.sort(key=lambda pid: (city.pod_utilization.get(pid, 0), -pid))
+    if not idle:
+        return []
+
+    replacements = [(served, route) for served, route in optimize_pod_itineraries(demands)
+                    if not recently_recycled(route)]
+    net_cost = POD_COST - DESTROY_REFUND
+    plans = []
+    for pid, (served, route) in zip(idle, replacements):
+        if len(plans) >= config.max_recycled_per_turn or remaining_resources < net_cost:
+            break
+        lost = loads.get(pid, 0)
+        if served <= lost or lost * POD_COST >= served * DESTROY_REFUND:
+            continue
+        plans.append((pid, route))
+        remaining_resources -= net_cost
+    return plans
+
+# ====================================================================================
+# 5.d Placement des téléporteurs : économie de distance sur toute la demande
+# ====================================================================================
+#
+# Une seule matrice de temps de trajet D (voir 3.b) suffit : avec un téléporteur e -> x,
+# un astronaute (landing l, type t) passe de cur = min_m D[l][m] à
+# D[l][e] + min_m D[x][m]. On somme l'économie pondérée par les effectifs sur
+# les paires légales (aucune des deux extrémités n'a déjà de téléporteur) dont la
+# sortie est un pôle (2.c) ; l'entrée est un pôle ou une aire, car une aire encore
+# isolée gagne le plus à être téléportée directement.
+
+UNREACHABLE_TIME = 30.0        # temps attribué à un module inaccessible
+TELEPORT_CANDIDATES_KEPT = 3
+TELEPORT_DEMAND_CHUNK = 32     # demandes traitées par bloc (mémoire numpy bornée)
+
+def shortest_path_matrix(nodes: list) -> list:
+    """D[i][j] = temps de trajet de nodes[i] à nodes[j] (3.b), plafonné à UNREACHABLE_TIME."""
+    matrix = []
+    for b in nodes:
+        dist, _ = dijkstra_from(b)
+        matrix.append([min(dist.get(o, UNREACHABLE_TIME), UNREACHABLE_TIME) for o in nodes])
+    return matrix
+
+def teleport_savings(matrix: list, demands: list, entrances: list, exits: list) -> dict:
+    """
+    demands = [(idx_landing, nb, cur, to_target)] où to_target[x] = distance de x
+    au module du bon type le plus proche. Renvoie {(e, x): économie} sur les
+    indices d'entrances × exits.
+    """
+    savings = {}
+    if np is not None:
+        dist = np.asarray(matrix, dtype=np.float32)
+        entrance_idx, exit_idx = np.asarray(entrances), np.asarray(exits)
+        total = np.zeros((len(entrances), len(exits)), dtype=np.float32)
+        for k in range(0, len(demands), TELEPORT_DEMAND_CHUNK):
+            chunk = demands[k:k + TELEPORT_DEMAND_CHUNK]
+            landings = np.asarray([d[0] for d in chunk])
+            counts = np.asarray([d[1] for d in chunk], dtype=np.float32)
+            cur = np.asarray([d[2] for d in chunk], dtype=np.float32)
+            to_entrance = dist[np.ix_(landings, entrance_idx)]                         # (k, E)
+            from_exit = np.asarray([d[3] for d in chunk], dtype=np.float32)[:, exit_idx]  # (k, X)
+            gain = cur[:, None, None] - to_entrance[:, :, None] - from_exit[:, None, :]
+            np.maximum(gain, 0, out=gain)
+            total += np.tensordot(counts, gain, axes=1)
+        total[entrance_idx[:, None] == exit_idx[None, :]] = 0
+        for i, j in zip(*np.nonzero(total)):
+            savings[(entrances[i], exits[j])] = float(total[i, j])
+        return savings
+
+    for e in entrances:
+        for landing, count, cur, to_target in demands:
+            slack = cur - matrix[landing][e]
+            if slack <= 0:
+                continue
+            for x in exits:
+                gain = slack - to_target[x]
+                if gain > 0 and x != e:
+                    savings[(e, x)] = savings.get((e, x), 0) + count * gain
+    return savings
+
+def plan_teleports(routes: list, max_results: int = TELEPORT_CANDIDATES_KEPT) -> list:
+    """
+    Renvoie les meilleures [(économie, entrée, sortie)] sur toutes les paires
+    légales. Recalculé seulement si le réseau (signature 3.b) a changé.
+    """
+    key = (city.routing_signature, max_results)
+    if city.teleport_cache is None or city.teleport_cache[0] != key:
+        city.teleport_cache = (key, compute_teleport_plan(routes, max_results))
+    return list(city.teleport_cache[1])
+
+def compute_teleport_plan(routes: list, max_results: int) -> list:
+    """Calcul complet de plan_teleports() : matrice des temps et économies entre pôles (2.c)."""
     has_teleport = set()
     for b1, b2, cap in routes:
         if cap == 0:
             has_teleport.add(b1)
             has_teleport.add(b2)
     
-    landings = [b for b in all_buildings if building_type.get(b) == "landing" and b not in has_teleport]
-    modules = [b for b in all_buildings if building_type.get(b) == "module" and b not in has_teleport]
+    # Lignes de la matrice : aires (d'où part la demande et entrées possibles) et pôles
+    hubs = [b for b in cluster_hubs() if b not in has_teleport]
+    landings = [b for b in city.landing_astronaut_types if b in city.building_positions]
+    nodes = sorted(set(hubs) | set(landings))
+    if not hubs:
+        return []
+    index = {b: i for i, b in enumerate(nodes)}
+    matrix = shortest_path_matrix(nodes)
+    
+    # Distance de chaque ligne au module le plus proche de chaque type (tous les modules)
+    to_type = {mtype: [UNREACHABLE_TIME] * len(nodes) for mtype in get_modules_by_type()}
+    for i, b in enumerate(nodes):
+        for m, d in dijkstra_from(b)[0].items():
+            mtype = city.module_type.get(m)
+            if mtype is not None and d < to_type[mtype][i]:
+                to_type[mtype][i] = d
     
-    for landing in landings:
-        if landing not in building_positions:
+    demands = []
+    for landing_id, astro_types in city.landing_astronaut_types.items():
+        if landing_id not in index:
             continue
-        
-        # Trouver un module éloigné (distance BFS >= 3)
-        dist = bfs_distances_from(landing, adj)
-        
-        for mod in modules:
-            if mod not in building_positions:
+        l = index[landing_id]
+        type_counts = defaultdict(int)
+        for t in astro_types:
+            type_counts[t] += 1
+        for atype, count in type_counts.items():
+            if atype in to_type and to_type[atype][l] > 0:
+                demands.append((l, count, to_type[atype][l], to_type[atype]))
+    if not demands:
+        return []
+    
+    exits = sorted(index[b] for b in hubs)
+    entrances = sorted({index[b] for b in landings if b not in has_teleport} | set(exits))
+    savings = teleport_savings(matrix, demands, entrances, exits)
+    best = sorted(savings.items(), key=lambda kv: kv[1], reverse=True)[:max_results]
+    return [(saving, nodes[e], nodes[x]) for (e, x), saving in best]
+
+# ====================================================================================
+# 5.e Anticipation sur plusieurs mois (beam search sur des politiques de dépense)
+# ====================================================================================
+#
+# La sélection 6.4 est gloutonne : elle dépense tout ce qui est rentable ce mois-ci.
+# On compare ici quelques politiques (tout dépenser, garder la moitié, attendre,
+# téléporteurs d'abord) enchaînées sur config.beam_depth mois, en ne gardant que
+# les config.beam_width meilleurs plans à chaque mois. Les mois futurs piochent
+# dans la même liste de candidats (un candidat trop cher aujourd'hui peut être
+# acheté le mois suivant) ; chaque mois est évalué par un simulateur de flux
+# compact, avec une demande qui croît au rythme des arrivées observées par type.
+# Au-delà de config.beam_budget secondes, on garde le dernier mois complet.
+
+BEAM_POLICIES = ("greedy", "half", "save", "teleport")
+INTEREST_RATE = 0.1
+DAYS_PER_HOP = 2           # un tube parcouru + l'attente moyenne d'un pod
+BALANCE_POINTS = 25        # points d'équilibre moyens par astronaute arrivé
+
+class PlanState:
+    """Réseau hypothétique d'une branche de la recherche."""
+    __slots__ = ("resources", "tubes", "degree", "teleports", "pods", "used", "value", "first")
+
+    def __init__(self, resources, tubes, degree, teleports, pods, used, value, first) -> None:
+        self.resources = resources
+        self.tubes = tubes            # (min, max) -> capacité
+        self.degree = degree
+        self.teleports = teleports    # entrée -> sortie
+        self.pods = pods              # itinéraires
+        self.used = used              # indices des candidats déjà achetés
+        self.value = value
+        self.first = first            # politique du premier mois (celle qu'on jouera)
+
+    def copy(self) -> "PlanState":
+        return PlanState(self.resources, dict(self.tubes), dict(self.degree),
+                         dict(self.teleports), list(self.pods), set(self.used), self.value, self.first)
+
+def policy_reserve(policy: str, resources: int) -> int:
+    """Ressources que la politique s'interdit de dépenser ce mois-ci."""
+    if policy == "half":
+        return resources // 2
+    if policy == "save":
+        return resources
+    return 0
+
+def policy_order(policy: str, candidates: list) -> list:
+    """Ordre de parcours des candidats (déjà triés par score) pour la politique."""
+    if policy == "teleport":
+        return ([c for c in candidates if c["type"] == "TELEPORT"]
+                + [c for c in candidates if c["type"] != "TELEPORT"])
+    return candidates
+
+def forecast_demand_growth() -> dict:
+    """Astronautes supplémentaires attendus par mois et par type, relatifs à la demande actuelle."""
+    months = max(city.turn_number - 1, 1)
+    totals = defaultdict(int)
+    for astro_types in city.landing_astronaut_types.values():
+        for t in astro_types:
+            totals[t] += 1
+    return {t: city.new_astronauts_by_type.get(t, 0) / months / n for t, n in totals.items()}
+
+def apply_policy(plan: PlanState, policy: str, candidates: list, limits: dict, tube_crossings: dict) -> None:
+    """
+    Achète sur plan les candidats que la politique retient (mêmes règles que 6.4 ;
+    tube_crossings : croisements des TUBE candidats, voir sweep_crossings).
+    """
+    reserve = policy_reserve(policy, plan.resources)
+    counts = defaultdict(int)
+    bought = 0
+    pod_tubes = set()
+    for c in policy_order(policy, candidates):
+        index = c["index"]
+        ctype = c["type"]
+        if bought >= config.max_actions:
+            break
+        if index in plan.used or counts[ctype] >= limits[ctype] or c["cost"] > plan.resources - reserve:
+            continue
+        b1, b2 = c["buildings"]
+        key = (min(b1, b2), max(b1, b2))
+        if ctype == "TUBE":
+            if key in plan.tubes or plan.degree.get(b1, 0) >= MAX_TUBES_PER_BUILDING \
+                    or plan.degree.get(b2, 0) >= MAX_TUBES_PER_BUILDING:
                 continue
-            bfs_dist = dist.get(mod, 10**9)
-            
-            if bfs_dist >= 3:  # seulement si vraiment loin
-                eucl_dist = math.hypot(
-                    building_positions[landing][0] - building_positions[mod][0],
-                    building_positions[landing][1] - building_positions[mod][1]
-                )
-                
-                # Score : gain de distance × astronautes potentiels
-                mtype = module_type.get(mod)
-                astro_count = landing_astronaut_types.get(landing, []).count(mtype) if mtype else 0
-                score = (bfs_dist - 1) * astro_count * 50 - TELEPORT_COST * 0.01
-                
-                if score > 0:
-                    candidates.append({
-                        "type": "TELEPORT",
-                        "action": f"TELEPORT {landing} {mod}",
-                        "score": score,
-                        "cost": TELEPORT_COST,
-                        "buildings": (landing, mod)
-                    })
+            # Hors du lot validé par balayage (6.4) : ignoré par l'anticipation
+            if key not in tube_crossings or not tube_crossings[key].isdisjoint(plan.tubes):
+                continue
+            plan.tubes[key] = 1
+            plan.degree[b1] = plan.degree.get(b1, 0) + 1
+            plan.degree[b2] = plan.degree.get(b2, 0) + 1
+        elif ctype == "UPGRADE":
+            if key not in plan.tubes:
+                continue
+            plan.tubes[key] += 1
+        elif ctype == "POD":
+            route = c["route"]
+            legs = {(min(a, b), max(a, b)) for a, b in zip(route, route[1:])}
+            if c.get("tube") in pod_tubes or any(leg not in plan.tubes for leg in legs):
+                continue
+            plan.pods.append(route)
+            pod_tubes |= legs
+        elif ctype == "TELEPORT":
+            ends = set(plan.teleports) | set(plan.teleports.values())
+            if b1 in ends or b2 in ends:
+                continue
+            plan.teleports[b1] = b2
+        plan.used.add(index)
+        plan.resources -= c["cost"]
+        counts[ctype] += 1
+        bought += 1
+
+def simulate_month_value(plan: PlanState, demands: list, modules_by_type: dict, growth: dict, months_ahead: int) -> float:
+    """
+    Simulateur de flux compact : chaque (aire, type) suit le plus court chemin
+    (en tubes desservis par un pod, téléporteurs gratuits) vers un module du
+    type, dans la limite du débit restant des pods sur chaque tube.
+    """
+    supply, _ = pod_supply_per_tube(dict(enumerate(plan.pods)))
+    residual = {key: min(s, plan.tubes.get(key, 0) * SHUTTLE_THROUGHPUT) for key, s in supply.items()}
+    graph = defaultdict(list)
+    for (a, b), s in residual.items():
+        if s > 0:
+            graph[a].append((b, 1))
+            graph[b].append((a, 1))
+    for e, x in plan.teleports.items():
+        graph[e].append((x, 0))
+
+    value = 0.0
+    by_landing = defaultdict(list)
+    for landing, atype, count in demands:
+        by_landing[landing].append((atype, count))
+    for landing, wanted in by_landing.items():
+        if landing not in graph:
+            continue
+        dist = {landing: 0}
+        parent = {landing: None}
+        q = deque([landing])
+        while q:
+            u = q.popleft()
+            for v, w in graph[u]:
+                if dist[u] + w < dist.get(v, 10**9):
+                    dist[v] = dist[u] + w
+                    parent[v] = u
+                    if w == 0:
+                        q.appendleft(v)
+                    else:
+                        q.append(v)
+        for atype, count in wanted:
+            targets = [m for m in modules_by_type.get(atype, []) if m in dist]
+            if not targets:
+                continue
+            target = min(targets, key=lambda m: dist[m])
+            legs = []
+            node = target
+            while parent[node] is not None:
+                prev = parent[node]
+                if plan.teleports.get(prev) != node:
+                    legs.append((min(prev, node), max(prev, node)))
+                node = prev
+            served = count * (1 + growth.get(atype, 0) * months_ahead)
+            for leg in legs:
+                served = min(served, residual[leg])
+            for leg in legs:
+                residual[leg] -= served
+            value += served * (max(0, 50 - dist[target] * DAYS_PER_HOP) + BALANCE_POINTS)
+    return value
+
+def lookahead_root(routes: list, degree: dict, existing_pod_routes: dict, resources: int) -> tuple:
+    """Renvoie (réseau actuel en PlanState, demandes [(aire, type, nb)], modules par type)."""
+    tubes, teleports = {}, {}
+    for b1, b2, cap in routes:
+        if cap > 0:
+            tubes[(min(b1, b2), max(b1, b2))] = cap
+        else:
+            teleports[b1] = b2
+    root = PlanState(resources, tubes, dict(degree), teleports, list(existing_pod_routes.values()), set(), 0.0, None)
+    demands = []
+    for landing_id, astro_types in city.landing_astronaut_types.items():
+        counts = defaultdict(int)
+        for t in astro_types:
+            counts[t] += 1
+        demands.extend((landing_id, t, n) for t, n in counts.items())
+    return root, demands, get_modules_by_type()
+
+def plan_lookahead(candidates: list, routes: list, degree: dict, existing_pod_routes: dict,
+                   resources: int, limits: dict, tube_crossings: dict) -> str:
+    """Renvoie la politique à appliquer ce mois-ci ("greedy" si rien de mieux)."""
+    deadline = time.perf_counter() + config.beam_budget * effort("6.4 sélection")
+    for index, c in enumerate(candidates):
+        c["index"] = index
+    root, demands, modules_by_type = lookahead_root(routes, degree, existing_pod_routes, resources)
+    growth = forecast_demand_growth()
+
+    beam = [root]
+    for months_ahead in range(config.beam_depth):
+        children = []
+        for node in beam:
+            for policy in BEAM_POLICIES:
+                if time.perf_counter() > deadline:
+                    break
+                child = node.copy()
+                apply_policy(child, policy, candidates, limits, tube_crossings)
+                child.value += simulate_month_value(child, demands, modules_by_type, growth, months_ahead)
+                child.resources = int(child.resources * (1 + INTEREST_RATE)) + city.income_estimate
+                child.first = node.first or policy
+                children.append(child)
+        if len(children) < len(beam) * len(BEAM_POLICIES):
+            break  # budget épuisé : on garde le dernier mois complet
+        # Tri stable : à valeur égale, la politique gloutonne (première) l'emporte
+        beam = sorted(children, key=lambda p: p.value, reverse=True)[:config.beam_width]
+    return beam[0].first or "greedy"
+
+# ====================================================================================
+# 5.f Conception du réseau : arbres de Steiner par type de module
+# ====================================================================================
+#
+# Relier chaque aire directement à un module paie plusieurs fois les mêmes
+# kilomètres. Pour chaque type, on part de l'arbre déjà en place (ses modules et
+# tout ce que le réseau y relie, à coût nul) et on y rattache une à une l'aire
+# demandeuse la plus proche par un plus court chemin (heuristique de
+# Takahashi-Matsuyama) : tubes existants et arêtes déjà retenues à coût nul,
+# arêtes candidates à leur coût de construction. Une arête retenue bloque celles
+# qui la croisent ; le plafond de MAX_TUBES_PER_BUILDING est respecté, y compris
+# pour un bâtiment traversé, qui reçoit deux tubes neufs du même chemin : l'état
+# de la recherche retient si l'on est arrivé au bâtiment par une arête neuve.
+#
+# Arêtes candidates (city.steiner_edges) : chaque bâtiment vers ses
+# STEINER_NEIGHBOURS plus proches voisins, sans croisement avec le réseau ni
+# bâtiment sur le trajet. Comme le pool de 5, elles sont tenues à jour tour
+# après tour, avec leurs croisements mutuels.
+#
+# Le résultat est une liste de constructions, chemin par chemin et du côté de
+# l'arbre vers l'aire : un chemin construit en partie faute de budget reste
+# rattaché à l'arbre, le tour suivant le prolonge.
+
+STEINER_NEIGHBOURS = 6
+STEINER_MAX_PATHS = 12     # chemins retenus par tour, tous types confondus
+
+def drop_steiner_edge(key: tuple[int, int]) -> None:
+    del city.steiner_edges[key]
+    for other in city.steiner_crossings.pop(key, ()):
+        city.steiner_crossings[other].discard(key)
+
+def refresh_steiner_edges(existing_tubes: list, new_buildings: list, reopened: list = (), blocked: set = ()) -> None:
+    """Met à jour city.steiner_edges et city.steiner_crossings (même principe que refresh_tube_pool)."""
+    edges = city.steiner_edges
+    tube_keys = {(min(a, b), max(a, b)) for a, b in existing_tubes}
+    new_tubes = [key for key in tube_keys if key not in city.steiner_tubes]
+    city.steiner_tubes = tube_keys
+    
+    if new_tubes and edges:
+        for key in [key for key in edges if key in tube_keys]:
+            drop_steiner_edge(key)
+        crossings = sweep_crossings(list(edges), new_tubes, among_segments=False)
+        for key in [key for key in edges if crossings.get(key)]:
+            drop_steiner_edge(key)
+    
+    for key in blocked:
+        if key in edges:
+            drop_steiner_edge(key)
+    
+    arrived = [b for b in new_buildings if b in city.building_positions]
+    
+    # Nouvelles arêtes : plus proches voisins des bâtiments arrivés ou rouverts
+    open_buildings = [b for b in city.building_positions if b not in city.saturated]
+    added = set()
+    for b in dict.fromkeys(arrived + list(reopened)):
+        if b in city.saturated:
+            continue
+        bx, by = city.building_positions[b]
+        nearest = heapq.nsmallest(STEINER_NEIGHBOURS, (
+            ((city.building_positions[o][0] - bx) ** 2 + (city.building_positions[o][1] - by) ** 2, o)
+            for o in open_buildings if o != b))
+        for _, o in nearest:
+            key = (min(b, o), max(b, o))
+            if key not in edges and key not in tube_keys:
+                added.add(key)
+    if not added:
+        return
+    added = sorted(added)
+    crossings = sweep_crossings(added, existing_tubes, among_segments=False)
+    legal = [key for key in added if not crossings.get(key) and not segment_hits_building(*key)]
+    for key, others in sweep_crossings(legal, list(edges)).items():
+        city.steiner_crossings.setdefault(key, set()).update(others)
+    for key in legal:
+        edges[key] = tube_construction_cost(*key)
+
+def design_steiner_network(routes: list) -> list:
+    """
+    Renvoie la liste de constructions [(chemin de clés, coûts, astronautes
+    servis, coût total)], dans l'ordre où les chemins ont été trouvés.
+    """
+    degree = dict(city.tube_degree)
+    links = defaultdict(list)  # bâtiment -> [(voisin, coût, clé)] ; clé None = lien existant
+    for key, cost in list(city.steiner_edges.items()):
+        if key[0] in city.saturated or key[1] in city.saturated:
+            drop_steiner_edge(key)
+            continue
+        links[key[0]].append((key[1], cost, key))
+        links[key[1]].append((key[0], cost, key))
+    for b1, b2, cap in routes:
+        # On remonte le sens des astronautes : un téléporteur se prend de la sortie vers l'entrée
+        links[b2].append((b1, 0, None))
+        if cap > 0:
+            links[b1].append((b2, 0, None))
     
+    demand_by_type = defaultdict(dict)
+    for landing_id, astro_types in city.landing_astronaut_types.items():
+        for t in astro_types:
+            demand_by_type[t][landing_id] = demand_by_type[t].get(landing_id, 0) + 1
+    
+    chosen = set()
+    blocked = set()
+    builds = []
+    for mtype, modules in sorted(get_modules_by_type().items(),
+                                 key=lambda item: (-sum(demand_by_type.get(item[0], {}).values()), item[0])):
+        terminals = dict(demand_by_type.get(mtype, {}))
+        tree = set(modules)
+        while terminals and len(builds) < scaled(STEINER_MAX_PATHS, "6.3 candidats"):
+            # État : (bâtiment, atteint par une arête neuve) ; une arête neuve de
+            # plus au départ de u lui en fait deux sur ce chemin
+            dist = {(b, False): 0 for b in tree}
+            parent = {}
+            heap = [(0, b, False) for b in tree]
+            heapq.heapify(heap)
+            reached = None
+            while heap:
+                d, u, via_new = heapq.heappop(heap)
+                if d > dist[(u, via_new)]:
+                    continue
+                if u in terminals:
+                    if d > 0:
+                        reached = (u, via_new)
+                        break
+                    del terminals[u]    # déjà reliée par le réseau ou les chemins retenus
+                used = degree.get(u, 0) + via_new
+                for v, cost, key in links.get(u, ()):
+                    new = key is not None and key not in chosen
+                    if new:
+                        if key in blocked or used >= MAX_TUBES_PER_BUILDING \
+                                or degree.get(v, 0) >= MAX_TUBES_PER_BUILDING:
+                            continue
+                        cost += config.steiner_hop_cost
+                    else:
+                        cost = 0
+                    if d + cost < dist.get((v, new), math.inf):
+                        dist[(v, new)] = d + cost
+                        parent[(v, new)] = ((u, via_new), key if new else None)
+                        heapq.heappush(heap, (d + cost, v, new))
+            if reached is None:
+                break
+            count = terminals.pop(reached[0])
+            
+            # Chemin de l'arbre vers l'aire : seules les arêtes nouvelles sont à construire
+            path = []
+            state = reached
+            while state[0] not in tree:
+                prev, key = parent[state]
+                if key is not None:
+                    path.append(key)
+                tree.add(state[0])
+                state = prev
+            path.reverse()
+            for key in path:
+                chosen.add(key)
+                blocked |= city.steiner_crossings.get(key, set())
+                for b in key:
+                    degree[b] = degree.get(b, 0) + 1
+            costs = [city.steiner_edges[key] for key in path]
+            builds.append((path, costs, count, sum(costs)))
+    return builds
+
+def generate_steiner_candidates(remaining_resources: int, routes: list) -> list:
+    """
+    Liste de constructions TUBE des arbres de Steiner (5.f), chemin par chemin,
+    tant que le budget suit. Sans score : la boucle du tour la consomme après
+    les candidats scorés, avec ce qu'il reste de budget et de quota.
+    """
+    candidates = []
+    for path, costs, count, total_cost in design_steiner_network(routes):
+        spent = 0
+        for key, cost in zip(path, costs):
+            spent += cost
+            if spent > remaining_resources:
+                break
+            candidates.append({
+                "type": "TUBE",
+                "action": f"TUBE {key[0]} {key[1]}",
+                "cost": cost,
+                "buildings": key
+            })
     return candidates
 
 # ====================================================================================
-# 6. Boucle de jeu principale
+# 5.g Calendrier de dépense : intérêts contre gain de débit
+# ====================================================================================
+#
+# Les ressources non dépensées rapportent INTEREST_RATE par mois. Un TELEPORT
+# dépasse souvent le budget du mois : la sélection gloutonne (6.4) dépense tout
+# en actions moins chères et le téléporteur n'est jamais acheté. On compare ici,
+# en points par mois (simulateur de 5.e), le meilleur téléporteur aux achats du
+# mois :
+# - abordable : on l'achète d'abord si téléporteur + reste rapporte plus que
+#   tout dépenser autrement ;
+# - sinon, m = mois d'épargne pour l'atteindre (intérêts et revenu compris) ;
+#   on épargne tout le budget de 6.4 si le téléporteur, sur le reste de
+#   config.spend_horizon mois, rapporte plus que les achats des m mois qu'il
+#   remplace (chacun estimé comme ceux de ce mois, ses tubes neufs comptés avec
+#   une navette). L'épargne vaut pour tout le reste du tour : connexions des
+#   nouveaux bâtiments (6.5), pods de secours (6.6), et recyclage (6.3) du
+#   tour suivant, qui passe avant ce calcul.
+
+def schedule_spending(candidates: list, routes: list, degree: dict, existing_pod_routes: dict,
+                      resources: int, limits: dict, tube_crossings: dict) -> tuple[str, int]:
+    """Renvoie (politique de 6.4, réserve) : "teleport" pour l'acheter d'abord, ou l'épargne pour lui."""
+    teleport = next((c for c in candidates if c["type"] == "TELEPORT"), None)
+    if teleport is None or limits["TELEPORT"] <= 0:
+        return "greedy", 0
+    for index, c in enumerate(candidates):
+        c["index"] = index
+    root, demands, modules_by_type = lookahead_root(routes, degree, existing_pod_routes, resources)
+    base = simulate_month_value(root, demands, modules_by_type, {}, 0)
+    spent = root.copy()
+    apply_policy(spent, "greedy", candidates, limits, tube_crossings)
+    # Un tube acheté sans pod sera équipé (6.6, mois suivant) : compté avec sa navette
+    served = {(min(a, b), max(a, b)) for route in spent.pods for a, b in zip(route, route[1:])}
+    spent.pods.extend([a, b, a] for a, b in spent.tubes.keys() - root.tubes.keys() - served)
+    greedy_gain = simulate_month_value(spent, demands, modules_by_type, {}, 0) - base
+    
+    if teleport["cost"] <= resources:
+        first = root.copy()
+        apply_policy(first, "teleport", candidates, limits, tube_crossings)
+        if simulate_month_value(first, demands, modules_by_type, {}, 0) - base > greedy_gain:
+            return "teleport", 0
+        return "greedy", 0
+    
+    months, saved = 0, resources
+    while saved < teleport["cost"]:
+        saved = int(saved * (1 + INTEREST_RATE)) + city.income_estimate
+        months += 1
+        if months >= config.spend_horizon:
+            return "greedy", 0
+    alone = root.copy()
+    entrance, exit_id = teleport["buildings"]
+    alone.teleports[entrance] = exit_id
+    teleport_gain = simulate_month_value(alone, demands, modules_by_type, {}, 0) - base
+    # Sans épargne, les achats du mois k rapportent pendant horizon - k mois ;
+    # en épargnant, ceux des m premiers mois sont remplacés par le téléporteur
+    horizon = config.spend_horizon
+    forgone = greedy_gain * sum(horizon - k for k in range(months))
+    if teleport_gain * (horizon - months) > forgone:
+        return "greedy", resources
+    return "greedy", 0
+
+# ====================================================================================
+# 6. Tour de jeu (step) et boucle principale
 # ====================================================================================
 
 MAX_TUBES_PER_BUILDING = 5
 POD_COST = 1000
 TELEPORT_COST = 5000
+TUBE_SWEEP_BATCH = 48              # TUBE candidats validés ensemble en 6.4
+FALLBACK_SWEEP_NEIGHBOURS = 8      # voisins validés ensemble par bâtiment en 6.5
 
-while True:
-    turn_number += 1
+def step(turn_input: list[str]) -> list[str]:
+    """Joue un tour à partir de ses lignes d'entrée ; renvoie les actions (vide = WAIT)."""
+    read = iter(turn_input).__next__
+    
+    city.turn_number += 1
+    city.phase_start = time.perf_counter()
+    if memory_profile is not None:
+        memory_profile.begin()
     
     # --------------------------------------------------------------------------
     # 6.1. Lecture des entrées
     # --------------------------------------------------------------------------
-    resources = int(input())
+    resources = int(read())
     
-    num_travel_routes = int(input())
+    num_travel_routes = int(read())
     routes = []
     existing_tubes = []
-    degree = {}
     
     for _ in range(num_travel_routes):
-        b1, b2, capacity = [int(j) for j in input().split()]
+        b1, b2, capacity = [int(j) for j in read().split()]
         routes.append((b1, b2, capacity))
         if capacity > 0:
             existing_tubes.append((b1, b2))
-        all_buildings.add(b1)
-        all_buildings.add(b2)
-        degree[b1] = degree.get(b1, 0) + 1
-        degree[b2] = degree.get(b2, 0) + 1
+        city.all_buildings.add(b1)
+        city.all_buildings.add(b2)
     
-    num_pods = int(input())
+    num_pods = int(read())
     existing_pod_ids = set()
     existing_pod_routes = {}
     
     for _ in range(num_pods):
-        parts = input().split()
+        parts = read().split()
         if len(parts) < 3:
             continue
         pod_id = int(parts[0])
@@ -405,11 +2241,11 @@ while True:
     while pod_id_counter in existing_pod_ids:
         pod_id_counter += 1
     
-    num_new_buildings = int(input())
+    num_new_buildings = int(read())
     new_buildings = []
     
     for _ in range(num_new_buildings):
-        parts = input().split()
+        parts = read().split()
         ints = [int(t) for t in parts if t.lstrip('-').isdigit()]
         if not ints:
             continue
@@ -420,28 +2256,58 @@ while True:
             x, y = ints[2], ints[3]
             num_astronauts = ints[4]
             astro_types = ints[5:5 + num_astronauts]
-            building_positions[building_id] = (x, y)
-            building_type[building_id] = "landing"
-            landing_astronaut_types[building_id] = astro_types
+            city.building_positions[building_id] = (x, y)
+            city.building_type[building_id] = "landing"
+            city.landing_astronaut_types[building_id] = astro_types
+            if city.turn_number > 1:
+                for t in astro_types:
+                    city.new_astronauts_by_type[t] = city.new_astronauts_by_type.get(t, 0) + 1
         elif first > 0 and len(ints) >= 4:
             mtype = ints[0]
             building_id = ints[1]
             x, y = ints[2], ints[3]
-            building_positions[building_id] = (x, y)
-            building_type[building_id] = "module"
-            module_type[building_id] = mtype
+            city.building_positions[building_id] = (x, y)
+            city.building_type[building_id] = "module"
+            city.module_type[building_id] = mtype
         else:
             continue
         
         new_buildings.append(building_id)
-        all_buildings.add(building_id)
+        city.all_buildings.add(building_id)
+        open_building(building_id)
+    
+    # Tables des paires : tout au tour 1, ensuite les bâtiments arrivés seulement (2.d)
+    newly_blocked = index_buildings(new_buildings)
+    
+    # Degrés (tubes seulement, les téléporteurs ne comptent pas) : seuls les écarts sont traités
+    reopened = sync_tube_degrees(existing_tubes)
+    degree = city.tube_degree
+    
+    # Revenu mensuel observé : ressources reçues au-delà des intérêts sur le reste
+    if city.last_remaining is not None:
+        observed = resources - int(city.last_remaining * (1 + INTEREST_RATE))
+        city.income_estimate = max(0, (city.income_estimate + observed) // 2 if city.turn_number > 2 else observed)
+    
+    end_phase("6.1 lecture")
     
     # --------------------------------------------------------------------------
     # 6.2. Analyse du réseau
     # --------------------------------------------------------------------------
     adj = build_adjacency(routes)
-    tube_flow = estimate_astronaut_flow(adj, routes)
-    bottlenecks = find_bottleneck_tubes(routes, tube_flow)
+    update_routing_network(routes)
+    refresh_tube_pool(existing_tubes, new_buildings, reopened, newly_blocked)
+    refresh_steiner_edges(existing_tubes, new_buildings, reopened, newly_blocked)
+    tube_load = update_edge_betweenness(routes)
+    # Coupe minimale seulement si l'analyse tient dans son budget (1.d)
+    lost = find_min_cut_tubes(routes) if effort("6.2 analyse") >= 0.5 else {}
+    bottlenecks = find_bottleneck_tubes(routes, tube_load, existing_pod_routes, lost)
+    capacity_plan = plan_capacity(bottlenecks, existing_pod_routes)
+    
+    # Charge estimée de chaque pod et demande qu'ils ne couvrent pas
+    pod_loads, unserved_demands = allocate_demand_to_pods(collect_demand_paths(adj), existing_pod_routes)
+    update_pod_utilization(pod_loads, existing_pod_routes)
+    
+    end_phase("6.2 analyse")
     
     # --------------------------------------------------------------------------
     # 6.3. Génération et scoring des candidats
@@ -450,28 +2316,87 @@ while True:
     actions = []
     used_buildings = set()  # pour éviter les conflits
     
+    # Recyclage des pods inactifs ou doublons vers les tournées saturées. L'épargne
+    # de ce tour (5.g) n'est fixée qu'en 6.4 : on tient celle du tour précédent
+    for pid, route in plan_fleet_rebalancing(existing_pod_routes, pod_loads, unserved_demands,
+                                             remaining_resources - city.savings):
+        actions.append(f"DESTROY {pid}")
+        city.recycled_routes[route_legs(existing_pod_routes[pid])] = city.turn_number
+        actions.append(f"POD {pod_id_counter} {' '.join(map(str, route))}")
+        del existing_pod_routes[pid]
+        existing_pod_routes[pod_id_counter] = route
+        pod_id_counter += 1
+        while pod_id_counter in existing_pod_ids:
+            pod_id_counter += 1
+        remaining_resources -= POD_COST - DESTROY_REFUND
+    if actions:
+        pod_loads, unserved_demands = allocate_demand_to_pods(collect_demand_paths(adj), existing_pod_routes)
+    
     # Générer tous les candidats
     all_candidates = []
-    all_candidates.extend(generate_tube_candidates(remaining_resources, degree, existing_tubes, adj))
-    all_candidates.extend(generate_upgrade_candidates(remaining_resources, routes, bottlenecks))
-    all_candidates.extend(generate_pod_candidates(remaining_resources, routes, existing_pod_routes, adj))
+    all_candidates.extend(generate_tube_candidates(remaining_resources, existing_tubes, adj))
+    all_candidates.extend(generate_upgrade_candidates(remaining_resources, routes, capacity_plan))
+    all_candidates.extend(generate_pod_candidates(remaining_resources, routes, existing_pod_routes, adj, unserved_demands))
     
-    # Téléporteurs seulement après le tour 8 et si beaucoup de ressources
-    if turn_number > 8 and remaining_resources > TELEPORT_COST * 2:
+    # Téléporteurs à partir de config.teleport_min_turn, même trop chers ce mois-ci (épargne, 5.g)
+    if city.turn_number >= config.teleport_min_turn and effort("6.3 candidats") >= 0.5:
         all_candidates.extend(generate_teleport_candidates(remaining_resources, routes, adj))
     
-    # Trier par score décroissant
+    # Trier par score décroissant, puis la liste de constructions des arbres de Steiner
     all_candidates.sort(key=lambda c: c["score"], reverse=True)
+    all_candidates.extend(generate_steiner_candidates(remaining_resources, routes))
+    
+    # Un même tube peut venir du pool (5) et d'un arbre de Steiner (5.f) : on garde le premier
+    proposed_tubes = set()
+    unique_candidates = []
+    for candidate in all_candidates:
+        if candidate["type"] == "TUBE":
+            b1, b2 = candidate["buildings"]
+            key = (min(b1, b2), max(b1, b2))
+            if key in proposed_tubes:
+                continue
+            proposed_tubes.add(key)
+        unique_candidates.append(candidate)
+    all_candidates = unique_candidates
+    
+    end_phase("6.3 candidats")
     
     # --------------------------------------------------------------------------
     # 6.4. Sélection des meilleures actions
     # --------------------------------------------------------------------------
-    MAX_ACTIONS = 15
     actions_count = {"TUBE": 0, "UPGRADE": 0, "POD": 0, "TELEPORT": 0}
-    MAX_PER_TYPE = {"TUBE": 8, "UPGRADE": 2, "POD": 6, "TELEPORT": 1}
+    new_pod_routes = []  # itinéraires des pods créés ce tour
+    new_pod_tubes = set()
+    MAX_PER_TYPE = {"TUBE": config.max_tubes, "UPGRADE": config.max_upgrades,
+                    "POD": config.max_pods, "TELEPORT": config.max_teleports}
     
-    for candidate in all_candidates:
-        if len(actions) >= MAX_ACTIONS:
+    # Croisements entre les TUBE_SWEEP_BATCH meilleurs TUBE candidats, calculés en une
+    # passe (balayage, section 2) : un candidat du lot est rejeté s'il croise un tube
+    # déjà choisi ce tour. Le générateur les a déjà validés contre les tubes existants
+    # et les bâtiments ; au-delà du lot, on revient à la vérification complète.
+    tube_batch = [c["buildings"] for c in all_candidates if c["type"] == "TUBE"][:TUBE_SWEEP_BATCH]
+    tube_crossings = sweep_crossings(tube_batch)
+    for b1, b2 in tube_batch:
+        tube_crossings.setdefault((min(b1, b2), max(b1, b2)), set())
+    blocking_tubes = {(min(a, b), max(a, b)) for a, b in existing_tubes}
+    
+    # Politique de dépense choisie en anticipant les mois suivants (5.e)
+    policy = "greedy"
+    if config.beam_width > 0 and all_candidates:
+        policy = plan_lookahead(all_candidates, routes, degree, existing_pod_routes,
+                                remaining_resources, MAX_PER_TYPE, tube_crossings)
+    reserve = policy_reserve(policy, remaining_resources)
+    # Épargne pour un téléporteur (5.g) : tenue aussi par les connexions (6.5), les
+    # pods de secours (6.6) et le recyclage du tour suivant (6.3)
+    savings = 0
+    if policy == "greedy" and all_candidates:
+        policy, savings = schedule_spending(all_candidates, routes, degree, existing_pod_routes,
+                                            remaining_resources, MAX_PER_TYPE, tube_crossings)
+        reserve = savings
+    city.savings = savings
+    
+    for candidate in policy_order(policy, all_candidates):
+        if len(actions) >= config.max_actions:
             break
         
         ctype = candidate["type"]
@@ -481,18 +2406,30 @@ while True:
         if actions_count[ctype] >= MAX_PER_TYPE[ctype]:
             continue
         
-        # Vérifier le budget
-        if cost > remaining_resources:
+        # Vérifier le budget (hors réserve de la politique)
+        if cost > remaining_resources - reserve:
             continue
         
         # Vérifier les conflits de bâtiments (pour TUBE et TELEPORT)
         if ctype in ("TUBE", "TELEPORT"):
             b1, b2 = candidate["buildings"]
-            # Pour les tubes, re-vérifier la validité géométrique
+            # Pour les tubes : degré et croisements avec l'existant et les choix du tour
             if ctype == "TUBE":
-                if not tube_is_geometrically_valid(b1, b2, existing_tubes, degree):
+                crossing = tube_crossings.get((min(b1, b2), max(b1, b2)))
+                if crossing is None:
+                    if not tube_is_geometrically_valid(b1, b2, existing_tubes, degree):
+                        continue
+                elif degree.get(b1, 0) >= MAX_TUBES_PER_BUILDING or degree.get(b2, 0) >= MAX_TUBES_PER_BUILDING \
+                        or not crossing.isdisjoint(blocking_tubes):
                     continue
         
+        # Navette du plan de capacité : inutile si un pod de ce tour couvre déjà le tube
+        if ctype == "POD" and candidate.get("tube") in new_pod_tubes:
+            continue
+        # Pas de pod identique à un pod recyclé récemment (5.c)
+        if ctype == "POD" and recently_recycled(candidate["route"]):
+            continue
+        
         # Ajouter l'action
         action_str = candidate["action"]
         if ctype == "POD":
@@ -509,20 +2446,47 @@ while True:
         if ctype == "TUBE":
             b1, b2 = candidate["buildings"]
             existing_tubes.append((b1, b2))
-            degree[b1] = degree.get(b1, 0) + 1
-            degree[b2] = degree.get(b2, 0) + 1
+            blocking_tubes.add((min(b1, b2), max(b1, b2)))
+            register_tube(b1, b2)
+        elif ctype == "POD":
+            route = candidate["route"]
+            new_pod_routes.append(route)
+            new_pod_tubes.update((min(a, b), max(a, b)) for a, b in zip(route, route[1:]))
+    
+    end_phase("6.4 sélection")
     
     # --------------------------------------------------------------------------
     # 6.5. Actions de fallback : connecter les nouveaux bâtiments
     # --------------------------------------------------------------------------
     existing_set = set((a, b) for a, b in existing_tubes) | set((b, a) for a, b in existing_tubes)
     
+    # Voisins de chaque nouveau bâtiment isolé, du plus proche au plus lointain (à
+    # distance égale, ordre de city.all_buildings). Les FALLBACK_SWEEP_NEIGHBOURS
+    # premiers sont validés en une passe contre les tubes existants (balayage) ;
+    # les tubes posés ici sont testés directement, les voisins suivants aussi.
+    connected = {x for tube in existing_tubes for x in tube}
+    neighbours = {}
+    options = []
+    for b in new_buildings:
+        if b not in city.building_positions or b in connected:
+            continue
+        bx, by = city.building_positions[b]
+        ranked = sorted(((city.building_positions[o][0] - bx) ** 2 + (city.building_positions[o][1] - by) ** 2, k, o)
+                        for k, o in enumerate(city.all_buildings)
+                        if o != b and o not in city.saturated and o in city.building_positions
+                        and (b, o) not in existing_set)
+        neighbours[b] = ranked
+        options.extend((b, o) for _, _, o in ranked[:FALLBACK_SWEEP_NEIGHBOURS])
+    option_crossings = sweep_crossings(options, existing_tubes, among_segments=False)
+    swept = {(min(u, v), max(u, v)) for u, v in options}
+    fallback_tubes = []
+    
     for b in new_buildings:
         if actions_count["TUBE"] >= MAX_PER_TYPE["TUBE"]:
             break
-        if remaining_resources < 50:
+        if remaining_resources - savings < 50:
             break
-        if b not in building_positions:
+        if b not in city.building_positions:
             continue
         
         # Vérifier si déjà connecté
@@ -530,44 +2494,52 @@ while True:
         if already_connected:
             continue
         
-        # Trouver le meilleur voisin
+        # Le plus proche voisin valide
         best_neighbor = None
         best_cost = 0
-        best_dist2 = 10**18
-        bx, by = building_positions[b]
+        pb = city.building_positions[b]
         
-        for other in all_buildings:
-            if other == b or other not in building_positions:
-                continue
+        for _, _, other in neighbours.get(b, ()):
             if (b, other) in existing_set:
                 continue
-            if not tube_is_geometrically_valid(b, other, existing_tubes, degree):
-                continue
             cost = tube_construction_cost(b, other)
-            if cost > remaining_resources:
+            if cost > remaining_resources - savings:
                 continue
-            ox, oy = building_positions[other]
-            dist2 = (ox - bx)**2 + (oy - by)**2
-            if dist2 < best_dist2:
-                best_neighbor = other
-                best_cost = cost
-                best_dist2 = dist2
+            if (min(b, other), max(b, other)) in swept:
+                if degree.get(b, 0) >= MAX_TUBES_PER_BUILDING or degree.get(other, 0) >= MAX_TUBES_PER_BUILDING:
+                    continue
+                if option_crossings.get((min(b, other), max(b, other))):
+                    continue
+                po = city.building_positions[other]
+                if any(len({b, other, c, d}) == 4
+                       and segments_intersect(pb, po, city.building_positions[c], city.building_positions[d])
+                       for c, d in fallback_tubes):
+                    continue
+                if segment_hits_building(b, other):
+                    continue
+            elif not tube_is_geometrically_valid(b, other, existing_tubes, degree):
+                continue
+            best_neighbor = other
+            best_cost = cost
+            break
         
         if best_neighbor is not None:
             actions.append(f"TUBE {b} {best_neighbor}")
             existing_tubes.append((b, best_neighbor))
+            fallback_tubes.append((b, best_neighbor))
             existing_set.add((b, best_neighbor))
             existing_set.add((best_neighbor, b))
-            degree[b] = degree.get(b, 0) + 1
-            degree[best_neighbor] = degree.get(best_neighbor, 0) + 1
+            register_tube(b, best_neighbor)
             remaining_resources -= best_cost
             actions_count["TUBE"] += 1
     
+    end_phase("6.5 connexions")
+    
     # --------------------------------------------------------------------------
     # 6.6. Fallback : créer des PODs sur tubes non couverts
     # --------------------------------------------------------------------------
     covered_tubes = set()
-    for pid, route in existing_pod_routes.items():
+    for route in list(existing_pod_routes.values()) + new_pod_routes:
         for i in range(len(route) - 1):
             a, b = route[i], route[i+1]
             covered_tubes.add((min(a, b), max(a, b)))
@@ -576,20 +2548,15 @@ while True:
     for b1, b2, cap in routes:
         if cap > 0:
             key = (min(b1, b2), max(b1, b2))
-            if key not in covered_tubes:
-                priority = 0
-                if building_type.get(b1) == "landing":
-                    priority += 100
-                if building_type.get(b2) == "landing":
-                    priority += 100
-                tubes_needing_pods.append((priority, b1, b2))
+            if key not in covered_tubes and not recently_recycled([b1, b2]):
+                tubes_needing_pods.append((tube_load.get(key, 0.0), b1, b2))
     
     tubes_needing_pods.sort(reverse=True)
     
-    for priority, b1, b2 in tubes_needing_pods:
+    for load, b1, b2 in tubes_needing_pods:
         if actions_count["POD"] >= MAX_PER_TYPE["POD"]:
             break
-        if remaining_resources < POD_COST:
+        if remaining_resources - savings < POD_COST:
             break
         
         route_str = f"{b1} {b2} {b1} {b2} {b1} {b2} {b1} {b2}"
@@ -601,10 +2568,44 @@ while True:
         actions_count["POD"] += 1
         covered_tubes.add((min(b1, b2), max(b1, b2)))
     
+    end_phase("6.6 pods de secours")
+    
     # --------------------------------------------------------------------------
-    # 6.7. Sortie
+    # 6.7. Sortie (affichée par main())
     # --------------------------------------------------------------------------
-    if not actions:
-        print("WAIT")
-    else:
-        print(";".join(actions))
+    city.last_remaining = remaining_resources
+    update_throttle()
+    if memory_profile is not None:
+        memory_profile.report(city.turn_number)
+    return actions
+
+def read_turn_input(read=input) -> list[str]:
+    """Lit exactement les lignes d'un tour : ressources, routes, pods, nouveaux bâtiments."""
+    lines = [read()]
+    for _ in range(3):
+        count = read()
+        lines.append(count)
+        lines.extend(read() for _ in range(int(count)))
+    return lines
+
+def open_recorder():
+    """Journal des tours si SELENIA_RECORD est défini (chemin de fichier, ou "-" pour stderr)."""
+    target = os.environ.get("SELENIA_RECORD")
+    if not target:
+        return None
+    return sys.stderr if target == "-" else open(target, "w")
+
+def main() -> None:
+    # Enregistrement : lignes lues du tour puis "> actions" (voir tools/turnlog.py)
+    record = open_recorder()
+    while True:
+        turn_input = read_turn_input()
+        actions = step(turn_input)
+        output = ";".join(actions) if actions else "WAIT"
+        if record:
+            record.write("\n".join(turn_input) + "\n> " + output + "\n")
+            record.flush()
+        print(output)
+
+if __name__ == "__main__":
+    main()
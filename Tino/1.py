@@ -1,12 +1,32 @@
+import os
 import sys
 import math
 from collections import deque
 
-building_positions = {}      
-building_type = {}           
-module_type = {}             
-landing_astronaut_types = {} 
-all_buildings = set()
+class CityState:
+    """État persistant de la partie (remplace les anciennes variables globales)."""
+    __slots__ = (
+        "building_positions",
+        "building_type",
+        "module_type",
+        "landing_astronaut_types",
+        "all_buildings",
+        "blocked_pairs",
+    )
+
+    def __init__(self):
+        self.building_positions = {}
+        self.building_type = {}
+        self.module_type = {}
+        self.landing_astronaut_types = {}
+        self.all_buildings = set()
+        self.blocked_pairs = set()  # (min, max) : un bâtiment sur le segment
+
+city = CityState()
+
+def reset():
+    global city
+    city = CityState()
 
 def orientation(ax, ay, bx, by, cx, cy):
     val = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
@@ -38,27 +58,45 @@ def segments_intersect(a, b, c, d):
     return False
 
 def tube_is_valid(u, v, existing_tubes, degree, max_degree=5):
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return False
     if degree.get(u,0) >= max_degree or degree.get(v,0) >= max_degree:
         return False
-    pu, pv = building_positions[u], building_positions[v]
+    pu, pv = city.building_positions[u], city.building_positions[v]
     for a,b in existing_tubes:
         if a in (u,v) or b in (u,v): continue
-        pa, pb = building_positions.get(a), building_positions.get(b)
+        pa, pb = city.building_positions.get(a), city.building_positions.get(b)
         if pa is None or pb is None: continue
         if segments_intersect(pu,pv,pa,pb): return False
-    for w in all_buildings:
-        if w in (u,v): continue
-        pw = building_positions.get(w)
-        if pw is None: continue
-        if point_on_segment(pw[0], pw[1], pu[0], pu[1], pv[0], pv[1]): return False
+    if (min(u,v), max(u,v)) in city.blocked_pairs: return False
     return True
 
+def block_pairs_through(w):
+    """Bâtiment arrivé : ajoute à city.blocked_pairs les paires dont le segment passe par un bâtiment.
+    Les bâtiments alignés avec w partagent sa direction réduite (pgcd) : O(B) attendu."""
+    wx, wy = city.building_positions[w]
+    rays = {}
+    for o, (ox, oy) in city.building_positions.items():
+        dx, dy = ox - wx, oy - wy
+        g = math.gcd(dx, dy)
+        if g == 0:
+            continue
+        rays.setdefault((dx // g, dy // g), []).append((g, o))
+    for (dx, dy), ray in rays.items():
+        ray.sort()
+        # Sur une même demi-droite, seul le plus proche est visible depuis w
+        for _, o in ray[1:]:
+            city.blocked_pairs.add((min(w, o), max(w, o)))
+        # w est entre deux bâtiments de demi-droites opposées
+        if (dx, dy) > (0, 0):
+            for _, u in ray:
+                for _, v in rays.get((-dx, -dy), ()):
+                    city.blocked_pairs.add((min(u, v), max(u, v)))
+
 def tube_cost(u, v):
-    if u not in building_positions or v not in building_positions: return 10**9
-    x1,y1 = building_positions[u]
-    x2,y2 = building_positions[v]
+    if u not in city.building_positions or v not in city.building_positions: return 10**9
+    x1,y1 = city.building_positions[u]
+    x2,y2 = city.building_positions[v]
     return int(math.hypot(x2-x1, y2-y1)*10)  # 0.1 km -> 1 ressource
 
 # ============================================
@@ -85,29 +123,31 @@ MAX_NEW_TUBES_PER_TURN = 6
 MAX_NEW_PODS_PER_TURN = 2
 POD_COST = 1000
 
-while True:
-    resources = int(input())
-    num_travel_routes = int(input())
+def step(turn_input):
+    """Joue un tour à partir de ses lignes d'entrée, renvoie la liste des actions."""
+    read = iter(turn_input).__next__
+    resources = int(read())
+    num_travel_routes = int(read())
     routes = []
     existing_tubes = []
     degree = {}
     graph = {}
     for _ in range(num_travel_routes):
-        b1,b2,_ = map(int,input().split())
+        b1,b2,_ = map(int,read().split())
         routes.append((b1,b2))
         existing_tubes.append((b1,b2))
         degree[b1] = degree.get(b1,0)+1
         degree[b2] = degree.get(b2,0)+1
         graph.setdefault(b1, []).append(b2)
         graph.setdefault(b2, []).append(b1)
-        all_buildings.add(b1)
-        all_buildings.add(b2)
+        city.all_buildings.add(b1)
+        city.all_buildings.add(b2)
 
-    num_pods = int(input())
+    num_pods = int(read())
     pods_serving = set()
     existing_pod_ids = set()
     for _ in range(num_pods):
-        parts = input().split()
+        parts = read().split()
         if len(parts)<2: continue
         try: pod_id = int(parts[0]); existing_pod_ids.add(pod_id)
         except: pod_id=None
@@ -117,28 +157,29 @@ while True:
     pod_id_counter = 0
     while pod_id_counter in existing_pod_ids: pod_id_counter+=1
 
-    num_new_buildings = int(input())
+    num_new_buildings = int(read())
     new_buildings=[]
     for _ in range(num_new_buildings):
-        parts = input().split()
+        parts = read().split()
         ints = [int(x) for x in parts if x.isdigit() or (x[0]=="-" and x[1:].isdigit())]
         if not ints: continue
         first = ints[0]
         if first==0 and len(ints)>=5: # landing
             building_id=ints[1]; x=ints[2]; y=ints[3]
             astro_types = ints[5:5+ints[4]]
-            building_positions[building_id]=(x,y)
-            building_type[building_id]="landing"
-            landing_astronaut_types[building_id]=astro_types
+            city.building_positions[building_id]=(x,y)
+            city.building_type[building_id]="landing"
+            city.landing_astronaut_types[building_id]=astro_types
         elif first>0 and len(ints)>=4: # module
             mtype=ints[0]; building_id=ints[1]; x=ints[2]; y=ints[3]
-            building_positions[building_id]=(x,y)
-            building_type[building_id]="module"
-            module_type[building_id]=mtype
+            city.building_positions[building_id]=(x,y)
+            city.building_type[building_id]="module"
+            city.module_type[building_id]=mtype
         else:
             continue
         new_buildings.append(building_id)
-        all_buildings.add(building_id)
+        city.all_buildings.add(building_id)
+        block_pairs_through(building_id)
 
     actions=[]
     new_tubes_this_turn=0
@@ -147,13 +188,13 @@ while True:
     for b in new_buildings:
         if new_tubes_this_turn>=MAX_NEW_TUBES_PER_TURN or remaining_resources<=0: break
         candidates=[]
-        if building_type[b]=="landing":
-            types_needed = landing_astronaut_types.get(b,[])
-            candidates = [m for m,t in module_type.items() if t in types_needed]
-        elif building_type[b]=="module":
-            mtype=module_type.get(b)
-            candidates=[l for l,types in landing_astronaut_types.items() if mtype in types]
-        if not candidates: candidates = list(all_buildings)
+        if city.building_type[b]=="landing":
+            types_needed = city.landing_astronaut_types.get(b,[])
+            candidates = [m for m,t in city.module_type.items() if t in types_needed]
+        elif city.building_type[b]=="module":
+            mtype=city.module_type.get(b)
+            candidates=[l for l,types in city.landing_astronaut_types.items() if mtype in types]
+        if not candidates: candidates = list(city.all_buildings)
         best_neighbor=None; best_cost=10**9
         for c in candidates:
             if c==b: continue
@@ -173,8 +214,8 @@ while True:
             new_tubes_this_turn+=1
 
     pods_created=0
-    for landing_id in [b for b in all_buildings if building_type.get(b)=="landing"]:
-        targets=[b for b in all_buildings if building_type.get(b)=="module" and b not in pods_serving]
+    for landing_id in [b for b in city.all_buildings if city.building_type.get(b)=="landing"]:
+        targets=[b for b in city.all_buildings if city.building_type.get(b)=="module" and b not in pods_serving]
         if not targets: continue
         path=bfs_shortest_route(landing_id,graph,targets)
         if not path or len(path)<2: continue
@@ -186,5 +227,35 @@ while True:
             remaining_resources-=POD_COST
             pods_created+=1
 
-    if not actions: print("WAIT")
-    else: print(";".join(actions))
+    return actions
+
+def read_turn_input(read=input):
+    """Lit les lignes d'un tour : ressources, routes, pods, nouveaux bâtiments."""
+    lines = [read()]
+    for _ in range(3):
+        count = read()
+        lines.append(count)
+        lines.extend(read() for _ in range(int(count)))
+    return lines
+
+def open_recorder():
+    """Journal des tours si SELENIA_RECORD est défini (chemin de fichier, ou "-" pour stderr)."""
+    target = os.environ.get("SELENIA_RECORD")
+    if not target:
+        return None
+    return sys.stderr if target == "-" else open(target, "w")
+
+def main():
+    # Enregistrement : lignes lues du tour puis "> actions" (voir tools/turnlog.py)
+    record = open_recorder()
+    while True:
+        turn_input = read_turn_input()
+        actions = step(turn_input)
+        output = ";".join(actions) if actions else "WAIT"
+        if record:
+            record.write("\n".join(turn_input) + "\n> " + output + "\n")
+            record.flush()
+        print(output)
+
+if __name__ == "__main__":
+    main()
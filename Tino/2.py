@@ -1,3 +1,4 @@
+import os
 import sys
 import math
 from collections import deque, defaultdict
@@ -5,14 +6,37 @@ from collections import deque, defaultdict
 # ============================================
 # STRUCTURES PERSISTANTES
 # ============================================
-building_positions = {}      # building_id -> (x, y)
-building_type = {}           # building_id -> "landing"/"module"
-module_type = {}             # building_id -> module_type (int)
-landing_astronaut_types = {} # landing_id -> [list of astronaut types]
-all_buildings = set()
-turn_number = 0
-month_population = defaultdict(int)  # module_id -> population ce mois
-existing_pod_routes = set()  # (start, end) pour éviter doublons
+class CityState:
+    """État persistant de la partie, conservé d'un tour à l'autre"""
+    __slots__ = (
+        "building_positions",
+        "building_type",
+        "module_type",
+        "landing_astronaut_types",
+        "all_buildings",
+        "blocked_pairs",
+        "turn_number",
+        "month_population",
+        "existing_pod_routes",
+    )
+    
+    def __init__(self):
+        self.building_positions = {}      # building_id -> (x, y)
+        self.building_type = {}           # building_id -> "landing"/"module"
+        self.module_type = {}             # building_id -> module_type (int)
+        self.landing_astronaut_types = {} # landing_id -> [list of astronaut types]
+        self.all_buildings = set()
+        self.blocked_pairs = set()        # (min, max) : un bâtiment sur le segment
+        self.turn_number = 0
+        self.month_population = defaultdict(int)  # module_id -> population ce mois
+        self.existing_pod_routes = set()  # (start, end) pour éviter doublons
+
+city = CityState()
+
+def reset():
+    """Nouvelle partie : repart d'un état vierge"""
+    global city
+    city = CityState()
 
 # ============================================
 # GÉOMÉTRIE
@@ -59,46 +83,64 @@ def segments_intersect(a, b, c, d):
 
 def tube_is_valid(u, v, existing_tubes, degree, max_deg=5):
     """Vérifie qu'un tube peut être construit entre u et v"""
-    if u not in building_positions or v not in building_positions:
+    if u not in city.building_positions or v not in city.building_positions:
         return False
     
     # Vérifier le degré maximal
     if degree.get(u, 0) >= max_deg or degree.get(v, 0) >= max_deg:
         return False
     
-    pu = building_positions[u]
-    pv = building_positions[v]
+    pu = city.building_positions[u]
+    pv = city.building_positions[v]
     
     # Vérifier croisement avec tubes existants
     for a, b in existing_tubes:
         if a in (u, v) or b in (u, v):
             continue
-        pa = building_positions[a]
-        pb = building_positions[b]
+        pa = city.building_positions[a]
+        pb = city.building_positions[b]
         if segments_intersect(pu, pv, pa, pb):
             return False
     
     # Vérifier qu'aucun bâtiment n'est sur le trajet
-    for w in all_buildings:
-        if w in (u, v):
-            continue
-        pw = building_positions[w]
-        if point_on_segment(pw[0], pw[1], pu[0], pu[1], pv[0], pv[1]):
-            return False
+    if (min(u, v), max(u, v)) in city.blocked_pairs:
+        return False
     
     return True
 
+def block_pairs_through(w):
+    """Bâtiment arrivé : ajoute à city.blocked_pairs les paires dont le segment passe par un bâtiment.
+    Les bâtiments alignés avec w partagent sa direction réduite (pgcd) : O(B) attendu."""
+    wx, wy = city.building_positions[w]
+    rays = {}
+    for o, (ox, oy) in city.building_positions.items():
+        dx, dy = ox - wx, oy - wy
+        g = math.gcd(dx, dy)
+        if g == 0:
+            continue
+        rays.setdefault((dx // g, dy // g), []).append((g, o))
+    for (dx, dy), ray in rays.items():
+        ray.sort()
+        # Sur une même demi-droite, seul le plus proche est visible depuis w
+        for _, o in ray[1:]:
+            city.blocked_pairs.add((min(w, o), max(w, o)))
+        # w est entre deux bâtiments de demi-droites opposées
+        if (dx, dy) > (0, 0):
+            for _, u in ray:
+                for _, v in rays.get((-dx, -dy), ()):
+                    city.blocked_pairs.add((min(u, v), max(u, v)))
+
 def tube_cost(u, v):
     """Calcule le coût d'un tube entre u et v"""
-    x1, y1 = building_positions[u]
-    x2, y2 = building_positions[v]
+    x1, y1 = city.building_positions[u]
+    x2, y2 = city.building_positions[v]
     distance = math.hypot(x2 - x1, y2 - y1)
     return int(distance * 10)
 
 def distance_between(u, v):
     """Distance euclidienne entre deux bâtiments"""
-    x1, y1 = building_positions[u]
-    x2, y2 = building_positions[v]
+    x1, y1 = city.building_positions[u]
+    x2, y2 = city.building_positions[v]
     return math.hypot(x2 - x1, y2 - y1)
 
 # ============================================
@@ -130,8 +172,8 @@ def bfs_shortest_path(start, graph, targets):
 
 def find_all_reachable_modules(landing_id, graph, target_type):
     """Trouve tous les modules d'un type donné accessibles depuis un landing"""
-    targets = [m for m in all_buildings 
-               if building_type.get(m) == "module" and module_type.get(m) == target_type]
+    targets = [m for m in city.all_buildings 
+               if city.building_type.get(m) == "module" and city.module_type.get(m) == target_type]
     
     reachable = []
     for target in targets:
@@ -154,7 +196,7 @@ def create_pod_route(start, end, via_points=None):
 
 def pod_route_exists(start, end):
     """Vérifie si un POD dessert déjà cette route"""
-    return (start, end) in existing_pod_routes or (end, start) in existing_pod_routes
+    return (start, end) in city.existing_pod_routes or (end, start) in city.existing_pod_routes
 
 # ============================================
 # STRATÉGIE DE CONSTRUCTION
@@ -171,23 +213,23 @@ def build_essential_tubes(new_buildings, existing_tubes, degree, graph, remainin
         # Trouver les meilleurs candidats à connecter
         candidates = []
         
-        if building_type.get(building_id) == "landing":
+        if city.building_type.get(building_id) == "landing":
             # Landing -> connecter aux modules de ses types d'astronautes
-            astro_types = set(landing_astronaut_types.get(building_id, []))
-            candidates = [m for m in all_buildings 
-                         if building_type.get(m) == "module" 
-                         and module_type.get(m) in astro_types]
+            astro_types = set(city.landing_astronaut_types.get(building_id, []))
+            candidates = [m for m in city.all_buildings 
+                         if city.building_type.get(m) == "module" 
+                         and city.module_type.get(m) in astro_types]
         
-        elif building_type.get(building_id) == "module":
+        elif city.building_type.get(building_id) == "module":
             # Module -> connecter aux landings qui ont besoin de ce type
-            mtype = module_type.get(building_id)
-            candidates = [l for l in all_buildings 
-                         if building_type.get(l) == "landing" 
-                         and mtype in landing_astronaut_types.get(l, [])]
+            mtype = city.module_type.get(building_id)
+            candidates = [l for l in city.all_buildings 
+                         if city.building_type.get(l) == "landing" 
+                         and mtype in city.landing_astronaut_types.get(l, [])]
         
         # Si pas de candidats évidents, connecter aux bâtiments proches
         if not candidates:
-            candidates = list(all_buildings - {building_id})
+            candidates = list(city.all_buildings - {building_id})
         
         # Trier par distance et essayer de construire
         candidates_with_cost = []
@@ -230,12 +272,12 @@ def create_pods_for_landings(graph, remaining_resources, pod_id_counter, max_pod
     pods_created = 0
     
     # Pour chaque landing
-    for landing_id in [b for b in all_buildings if building_type.get(b) == "landing"]:
+    for landing_id in [b for b in city.all_buildings if city.building_type.get(b) == "landing"]:
         if pods_created >= max_pods or remaining_resources < 1000:
             break
         
         # Types d'astronautes de ce landing
-        astro_types = set(landing_astronaut_types.get(landing_id, []))
+        astro_types = set(city.landing_astronaut_types.get(landing_id, []))
         
         # Pour chaque type d'astronaute
         for astro_type in astro_types:
@@ -249,7 +291,7 @@ def create_pods_for_landings(graph, remaining_resources, pod_id_counter, max_pod
                 continue
             
             # Trier par population (moins peuplé d'abord) puis par distance
-            reachable.sort(key=lambda x: (month_population.get(x[0], 0), x[1]))
+            reachable.sort(key=lambda x: (city.month_population.get(x[0], 0), x[1]))
             
             # Créer des PODs vers les 2-3 modules les moins chargés
             pods_for_this_type = 0
@@ -266,10 +308,10 @@ def create_pods_for_landings(graph, remaining_resources, pod_id_counter, max_pod
                 route_str = " ".join(map(str, route))
                 
                 actions.append(f"POD {pod_id_counter} {route_str}")
-                existing_pod_routes.add((landing_id, module_id))
+                city.existing_pod_routes.add((landing_id, module_id))
                 
                 # Mettre à jour la population estimée
-                month_population[module_id] += 1
+                city.month_population[module_id] += 1
                 
                 pod_id_counter += 1
                 remaining_resources -= 1000
@@ -291,11 +333,11 @@ def create_teleporters(graph, remaining_resources, max_teleports=3):
     # Trouver les paires landing-module avec grande distance
     candidates = []
     
-    for landing_id in [b for b in all_buildings if building_type.get(b) == "landing"]:
-        astro_types = set(landing_astronaut_types.get(landing_id, []))
+    for landing_id in [b for b in city.all_buildings if city.building_type.get(b) == "landing"]:
+        astro_types = set(city.landing_astronaut_types.get(landing_id, []))
         
-        for module_id in [m for m in all_buildings if building_type.get(m) == "module"]:
-            if module_type.get(module_id) not in astro_types:
+        for module_id in [m for m in city.all_buildings if city.building_type.get(m) == "module"]:
+            if city.module_type.get(module_id) not in astro_types:
                 continue
             
             dist = distance_between(landing_id, module_id)
@@ -322,17 +364,20 @@ def create_teleporters(graph, remaining_resources, max_teleports=3):
     return actions, remaining_resources
 
 # ============================================
-# BOUCLE PRINCIPALE
+# TOUR DE JEU
 # ============================================
-while True:
-    turn_number += 1
-    resources = int(input())
+def step(turn_input):
+    """Joue un tour à partir des lignes d'entrée du tour, renvoie les actions"""
+    read = iter(turn_input).__next__
+    
+    city.turn_number += 1
+    resources = int(read())
     
     # Reset population mensuelle
-    month_population.clear()
+    city.month_population.clear()
     
     # ----- LECTURE DES ROUTES EXISTANTES -----
-    num_routes = int(input())
+    num_routes = int(read())
     routes = []
     existing_tubes = []
     existing_teleports = []
@@ -340,7 +385,7 @@ while True:
     graph = {}
     
     for _ in range(num_routes):
-        b1, b2, cap = map(int, input().split())
+        b1, b2, cap = map(int, read().split())
         
         if cap > 0:  # Tube magnétique
             existing_tubes.append((b1, b2))
@@ -353,15 +398,15 @@ while True:
             graph.setdefault(b1, []).append(b2)
         
         routes.append((b1, b2, cap))
-        all_buildings.add(b1)
-        all_buildings.add(b2)
+        city.all_buildings.add(b1)
+        city.all_buildings.add(b2)
     
     # ----- LECTURE DES PODS EXISTANTS -----
-    num_pods = int(input())
+    num_pods = int(read())
     existing_pod_ids = set()
     
     for _ in range(num_pods):
-        parts = list(map(int, input().split()))
+        parts = list(map(int, read().split()))
         if len(parts) < 3:
             continue
         
@@ -373,7 +418,7 @@ while True:
         
         # Marquer les routes servies
         if len(stops) >= 2:
-            existing_pod_routes.add((stops[0], stops[-1]))
+            city.existing_pod_routes.add((stops[0], stops[-1]))
     
     # Trouver un pod_id disponible
     pod_id_counter = 1
@@ -381,11 +426,11 @@ while True:
         pod_id_counter += 1
     
     # ----- LECTURE DES NOUVEAUX BÂTIMENTS -----
-    num_new_buildings = int(input())
+    num_new_buildings = int(read())
     new_buildings = []
     
     for _ in range(num_new_buildings):
-        line = input().split()
+        line = read().split()
         parts = [int(x) for x in line if x.lstrip('-').isdigit()]
         
         if not parts:
@@ -399,22 +444,24 @@ while True:
             num_astronauts = parts[4]
             astro_types = parts[5:5 + num_astronauts]
             
-            building_positions[b_id] = (x, y)
-            building_type[b_id] = "landing"
-            landing_astronaut_types[b_id] = astro_types
+            city.building_positions[b_id] = (x, y)
+            city.building_type[b_id] = "landing"
+            city.landing_astronaut_types[b_id] = astro_types
             new_buildings.append(b_id)
+            city.all_buildings.add(b_id)
+            block_pairs_through(b_id)
         
         elif first > 0 and len(parts) >= 4:  # Module lunaire
             mtype = parts[0]
             b_id = parts[1]
             x, y = parts[2], parts[3]
             
-            building_positions[b_id] = (x, y)
-            building_type[b_id] = "module"
-            module_type[b_id] = mtype
+            city.building_positions[b_id] = (x, y)
+            city.building_type[b_id] = "module"
+            city.module_type[b_id] = mtype
             new_buildings.append(b_id)
-        
-        all_buildings.add(b_id)
+            city.all_buildings.add(b_id)
+            block_pairs_through(b_id)
     
     # ============================================
     # STRATÉGIE DE CONSTRUCTION
@@ -435,16 +482,44 @@ while True:
     actions.extend(pod_actions)
     
     # 3. INVESTIR SURPLUS EN TÉLÉPORTEURS (late game)
-    if turn_number > 10 and remaining_resources >= 10000:
+    if city.turn_number > 10 and remaining_resources >= 10000:
         teleport_actions, remaining_resources = create_teleporters(
             graph, remaining_resources
         )
         actions.extend(teleport_actions)
     
-    # ============================================
-    # SORTIE
-    # ============================================
-    if actions:
-        print(";".join(actions), file=sys.stdout, flush=True)
-    else:
-        print("WAIT", file=sys.stdout, flush=True)
+    return actions
+
+def read_turn_input(read=input):
+    """Lit exactement les lignes d'un tour (ressources, routes, pods, bâtiments)"""
+    lines = [read()]
+    for _ in range(3):
+        count = read()
+        lines.append(count)
+        lines.extend(read() for _ in range(int(count)))
+    return lines
+
+# ============================================
+# SORTIE
+# ============================================
+def open_recorder():
+    """Journal des tours si SELENIA_RECORD est défini (chemin de fichier, ou "-" pour stderr)."""
+    target = os.environ.get("SELENIA_RECORD")
+    if not target:
+        return None
+    return sys.stderr if target == "-" else open(target, "w")
+
+def main():
+    # Enregistrement : lignes lues du tour puis "> actions" (voir tools/turnlog.py)
+    record = open_recorder()
+    while True:
+        turn_input = read_turn_input()
+        actions = step(turn_input)
+        output = ";".join(actions) if actions else "WAIT"
+        if record:
+            record.write("\n".join(turn_input) + "\n> " + output + "\n")
+            record.flush()
+        print(output, file=sys.stdout, flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Vérifications de Mandimby/v3.py contre des versions naïves, sur des cartes
+aléatoires (graines fixes) :
+- balayage des croisements (2) contre le test de toutes les paires ;
+- flot maximum de Dinic (4.c) contre le flot de coût minimum (4) ;
+- centralité des tubes (4.d), incrémentale et complète, contre l'énumération
+  de tous les plus courts chemins ;
+- plafond de tubes par bâtiment des chemins de Steiner (5.f).
+
+    python -m pytest tests
+"""
+
+import importlib.util
+import itertools
+import math
+import os
+import random
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_v3():
+    spec = importlib.util.spec_from_file_location("v3", os.path.join(HERE, "..", "Mandimby", "v3.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+v3 = load_v3()
+
+def key(pair):
+    return (min(pair), max(pair))
+
+# ====================================================================================
+# Balayage des croisements
+# ====================================================================================
+
+def brute_crossing(a, b):
+    """Même règle que sweep_crossings : deux tubes partageant un bâtiment ne se croisent pas."""
+    if len({*a, *b}) < 4:
+        return False
+    p = v3.city.building_positions
+    return v3.segments_intersect(p[a[0]], p[a[1]], p[b[0]], p[b[1]])
+
+def test_sweep_crossings_matches_all_pairs():
+    for trial in range(400):
+        rng = random.Random(trial)
+        v3.reset()
+        n = rng.randint(4, 25)
+        points = set()
+        while len(points) < n:
+            points.add((rng.randint(0, 10), rng.randint(0, 10)))
+        for b, point in enumerate(points):
+            v3.city.building_positions[b] = point
+        pairs = list(itertools.combinations(range(n), 2))
+        segments = [s if rng.random() < 0.5 else s[::-1] for s in rng.sample(pairs, min(len(pairs), rng.randint(1, 15)))]
+        fixed = rng.sample(pairs, min(len(pairs), rng.randint(0, 15)))
+        # Un segment identique à un fixe partagerait sa clé : cas exclu
+        if {key(s) for s in segments} & {key(f) for f in fixed}:
+            continue
+
+        crossings = v3.sweep_crossings(segments, fixed)
+        for s in segments:
+            expected = {key(f) for f in fixed if brute_crossing(s, f)}
+            expected |= {key(o) for o in segments if key(o) != key(s) and brute_crossing(s, o)}
+            assert crossings.get(key(s), set()) == expected, (trial, s)
+
+        blocked = v3.sweep_crossings(segments, fixed, among_segments=False)
+        for s in segments:
+            assert bool(blocked.get(key(s))) == any(brute_crossing(s, f) for f in fixed), (trial, s)
+
+# ====================================================================================
+# Dinic contre flot de coût minimum
+# ====================================================================================
+
+def test_dinic_max_flow_matches_min_cost_flow():
+    rng = random.Random(2)
+    for trial in range(300):
+        v3.reset()
+        n = rng.randint(4, 16)
+        for b in range(n):
+            v3.city.building_positions[b] = (rng.randint(0, 100), rng.randint(0, 100))
+        routes, seen = [], set()
+        for _ in range(rng.randint(n, 3 * n)):
+            a, b = rng.sample(range(n), 2)
+            if key((a, b)) not in seen:
+                seen.add(key((a, b)))
+                routes.append((a, b, rng.choice([0, 1, 1, 2])))
+        modules = rng.sample(range(n), rng.randint(1, 2))
+        landings = [b for b in range(n) if b not in modules]
+        supply = {l: rng.randint(1, 6) for l in rng.sample(landings, min(len(landings), 3))}
+
+        routed = sum(v3.push_type_flow(supply, modules, v3.build_flow_network(routes)).values())
+
+        _, head, capacity, _ = v3.build_flow_network(routes)
+        out_arcs = defaultdict(list)
+        for e in range(len(head)):
+            out_arcs[head[e ^ 1]].append(e)
+        head, residual = list(head), list(capacity)
+        virtual = [(v3.SOURCE, l, count) for l, count in supply.items()] + [(m, v3.SINK, math.inf) for m in modules]
+        for u, w, cap in virtual:
+            out_arcs[u].append(len(head))
+            head.append(w)
+            residual.append(cap)
+            out_arcs[w].append(len(head))
+            head.append(u)
+            residual.append(0)
+        assert v3.dinic_max_flow(out_arcs, head, residual, v3.SOURCE, v3.SINK) == routed, trial
+
+# ====================================================================================
+# Centralité des tubes
+# ====================================================================================
+
+def brute_betweenness(routes):
+    """
+    Énumère tous les chemins simples : chaque astronaute se répartit également
+    entre les modules les plus proches de son type, puis entre les plus courts
+    chemins vers chacun (un tube compte 1, un téléporteur 0).
+    """
+    city = v3.city
+    adj = defaultdict(list)
+    for a, b, cap in routes:
+        if cap > 0:
+            adj[a].append((b, 1))
+            adj[b].append((a, 1))
+        else:
+            adj[a].append((b, 0))
+    modules_by_type = defaultdict(list)
+    for m, t in city.module_type.items():
+        modules_by_type[t].append(m)
+
+    load = defaultdict(float)
+    for landing, types in city.landing_astronaut_types.items():
+        paths = []
+
+        def walk(u, seen, cost, edges):
+            paths.append((u, cost, list(edges)))
+            for v, w in adj[u]:
+                if v not in seen:
+                    seen.add(v)
+                    edges.append((u, v, w))
+                    walk(v, seen, cost + w, edges)
+                    edges.pop()
+                    seen.remove(v)
+
+        walk(landing, {landing}, 0, [])
+        for t in set(types):
+            count = types.count(t)
+            reached = [(cost, u, edges) for u, cost, edges in paths if u in modules_by_type[t]]
+            if not reached:
+                continue
+            best = min(cost for cost, _, _ in reached)
+            targets = {u for cost, u, _ in reached if cost == best}
+            for m in targets:
+                shortest = [edges for cost, u, edges in reached if cost == best and u == m]
+                for edges in shortest:
+                    for a, b, w in edges:
+                        if w:
+                            load[key((a, b))] += count / len(targets) / len(shortest)
+    return load
+
+def random_city(rng):
+    v3.reset()
+    city = v3.city
+    n = rng.randint(4, 9)
+    for b in range(n):
+        city.building_positions[b] = (b, 0)
+        if rng.random() < 0.4:
+            city.building_type[b] = "landing"
+            city.landing_astronaut_types[b] = [rng.randint(1, 2) for _ in range(rng.randint(1, 4))]
+        else:
+            city.building_type[b] = "module"
+            city.module_type[b] = rng.randint(1, 2)
+    v3.index_buildings(list(range(n)))
+    return n
+
+def assert_same_load(got, expected, trial):
+    for k in set(got) | set(expected):
+        assert abs(got.get(k, 0) - expected.get(k, 0)) < 1e-6, (trial, k)
+
+def test_edge_betweenness_incremental_matches_brute_force():
+    for trial in range(200):
+        rng = random.Random(trial)
+        n = random_city(rng)
+        pairs = list(itertools.combinations(range(n), 2))
+        rng.shuffle(pairs)
+        routes, teleported = [], set()
+        for batch in range(4):
+            for a, b in pairs[batch * 3:(batch + 1) * 3]:
+                if rng.random() < 0.15 and a not in teleported and b not in teleported:
+                    routes.append((a, b, 0))
+                    teleported |= {a, b}
+                else:
+                    routes.append((a, b, 1))
+            # Mise à jour incrémentale après chaque lot de constructions
+            got = dict(v3.update_edge_betweenness(list(routes)))
+            assert_same_load(got, brute_betweenness(routes), trial)
+
+        # Recalcul complet sur un état neuf : même résultat que l'incrémental
+        saved = v3.city
+        v3.city = type(saved)()
+        for field in ("building_positions", "building_type", "module_type", "landing_astronaut_types"):
+            setattr(v3.city, field, getattr(saved, field))
+        v3.index_buildings(list(range(n)))
+        assert_same_load(dict(v3.update_edge_betweenness(list(routes))), got, trial)
+
+# ====================================================================================
+# Chemins de Steiner et plafond de tubes
+# ====================================================================================
+
+def test_steiner_paths_respect_tube_cap():
+    for trial in range(200):
+        rng = random.Random(trial)
+        v3.reset()
+        city = v3.city
+        n = rng.randint(6, 20)
+        points = set()
+        while len(points) < n:
+            points.add((rng.randint(0, 40), rng.randint(0, 40)))
+        for b, point in enumerate(points):
+            city.building_positions[b] = point
+            if rng.random() < 0.4:
+                city.building_type[b] = "landing"
+                city.landing_astronaut_types[b] = [rng.randint(1, 2) for _ in range(rng.randint(1, 4))]
+            else:
+                city.building_type[b] = "module"
+                city.module_type[b] = rng.randint(1, 2)
+        v3.index_buildings(list(range(n)))
+        # Bâtiments presque saturés : un seul tube neuf possible
+        for b in range(n):
+            city.tube_degree[b] = rng.choice([0, 0, v3.MAX_TUBES_PER_BUILDING - 1])
+        v3.refresh_steiner_edges([], list(range(n)))
+
+        degree = dict(city.tube_degree)
+        for path, _, _, _ in v3.design_steiner_network([]):
+            for key in path:
+                for b in key:
+                    degree[b] += 1
+        assert max(degree.values()) <= v3.MAX_TUBES_PER_BUILDING, trial
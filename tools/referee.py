@@ -0,0 +1,554 @@
+"""
+Arbitre local Selenia City
+==========================
+
+Génère une carte à partir d'une graine et d'une classe de carte, envoie à un
+bot les entrées de chaque mois (même protocole que le jeu), applique ses
+actions et simule le mois jour par jour. Les règles sont une approximation de
+l'énoncé, suffisante pour comparer des bots entre eux :
+
+- TUBE : 1 ressource par 0.1 km, pas de croisement, aucun bâtiment sur le
+  trajet, 5 tubes maximum par bâtiment ; UPGRADE : coût initial × nouvelle
+  capacité ; TELEPORT : 5000, un seul téléporteur par bâtiment ; POD : 1000,
+  arrêts consécutifs reliés par un tube ; DESTROY : rembourse 750.
+  Une action invalide est ignorée (et comptée).
+- Chaque mois, chaque aire d'atterrissage reçoit sa liste d'astronautes. Un
+  astronaute va vers le module de son type le plus proche (en tubes, les
+  téléporteurs comptant 0), monte dans un pod qui part vers le bâtiment
+  suivant de son chemin, 10 par pod. Un tube de capacité c laisse passer
+  c pods par jour. Les pods parcourent leur itinéraire en boucle (ou en
+  aller-retour s'il n'est pas fermé), un tube par jour, pendant 20 jours.
+- Un astronaute arrivé au jour d rapporte max(0, 50 - d) points de rapidité
+  et max(0, 50 - k) points d'équilibre, k étant le nombre d'astronautes déjà
+  arrivés dans ce module ce mois-ci.
+- Ressources : 10 % d'intérêts puis un revenu fixe au début de chaque mois.
+
+La régulation du temps de calcul de v3 (turn_budget, section 1.d) est coupée
+par défaut (SELENIA_CONFIG) : une partie ne dépend que de sa graine, pas de la
+charge de la machine. --throttle la rétablit pour mesurer les temps réels.
+
+    python tools/referee.py Mandimby/v3.py --seed 3 --map medium
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import selectors
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+MAP_WIDTH = 160
+MAP_HEIGHT = 90
+DAYS_PER_MONTH = 20
+POD_CAPACITY = 10
+POD_COST = 1000
+DESTROY_REFUND = 750
+TELEPORT_COST = 5000
+MAX_TUBES_PER_BUILDING = 5
+MAX_POD_ID = 500
+INTEREST_RATE = 0.1
+
+# Classes de cartes : nb de bâtiments, de mois, de types, ressources initiales, revenu mensuel
+MAP_CLASSES = {
+    "small": {"buildings": 30, "months": 12, "types": 4, "resources": 4000, "income": 1500},
+    "medium": {"buildings": 80, "months": 16, "types": 8, "resources": 6000, "income": 2500},
+    "large": {"buildings": 150, "months": 20, "types": 12, "resources": 8000, "income": 4000},
+}
+
+# Limites de temps de réponse (secondes), comme sur CodinGame : premier tour plus long
+FIRST_TURN_TIMEOUT = 1.0
+TURN_TIMEOUT = 0.5
+
+
+# ------------------------------------------------------------------------------
+# Géométrie (mêmes règles que les bots)
+# ------------------------------------------------------------------------------
+
+def orientation(a, b, c) -> int:
+    value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return 1 if value > 0 else (-1 if value < 0 else 0)
+
+
+def point_on_segment(p, a, b) -> bool:
+    if orientation(a, b, p) != 0:
+        return False
+    return min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= p[1] <= max(a[1], b[1])
+
+
+def segments_intersect(a, b, c, d) -> bool:
+    o1, o2 = orientation(a, b, c), orientation(a, b, d)
+    o3, o4 = orientation(c, d, a), orientation(c, d, b)
+    if o1 and o2 and o3 and o4 and o1 != o2 and o3 != o4:
+        return True
+    return ((o1 == 0 and point_on_segment(c, a, b)) or (o2 == 0 and point_on_segment(d, a, b))
+            or (o3 == 0 and point_on_segment(a, c, d)) or (o4 == 0 and point_on_segment(b, c, d)))
+
+
+def tube_cost(p, q) -> int:
+    return int(math.hypot(q[0] - p[0], q[1] - p[1]) * 10)
+
+
+# ------------------------------------------------------------------------------
+# Génération de carte
+# ------------------------------------------------------------------------------
+
+def generate_map(seed: int, map_class: str) -> dict:
+    """
+    Renvoie {"months", "resources", "income", "buildings"} où chaque bâtiment
+    est un dict (id, month, x, y, type, astronauts) ; type 0 = aire d'atterrissage.
+    Déterministe pour une graine et une classe données.
+    """
+    params = MAP_CLASSES[map_class]
+    rng = random.Random(f"{map_class}:{seed}")
+    n, months, n_types = params["buildings"], params["months"], params["types"]
+    types = list(range(1, n_types + 1))
+
+    used = set()
+    buildings = []
+    n_landings = max(2, n // 4)
+    for bid in range(n):
+        while True:
+            pos = (rng.randint(0, MAP_WIDTH), rng.randint(0, MAP_HEIGHT))
+            if pos not in used:
+                break
+        used.add(pos)
+        # Un tiers des bâtiments est là dès le premier mois, le reste arrive ensuite
+        month = 1 if bid < max(4, n // 3) else rng.randint(2, max(2, months - 2))
+        buildings.append({"id": bid, "month": month, "x": pos[0], "y": pos[1],
+                          "type": None, "astronauts": []})
+
+    rng.shuffle(buildings)
+    for k, b in enumerate(buildings):
+        if k < n_landings:
+            b["type"] = 0
+        else:
+            # Chaque type a au moins un module
+            b["type"] = types[(k - n_landings) % n_types] if k - n_landings < n_types else rng.choice(types)
+    for b in buildings:
+        if b["type"] == 0:
+            wanted = rng.sample(types, k=min(len(types), rng.randint(1, 3)))
+            b["astronauts"] = [rng.choice(wanted) for _ in range(rng.randint(10, 60))]
+    buildings.sort(key=lambda b: b["id"])
+    return {"months": months, "resources": params["resources"], "income": params["income"],
+            "buildings": buildings}
+
+
+# ------------------------------------------------------------------------------
+# Partie
+# ------------------------------------------------------------------------------
+
+class Game:
+    """État d'une partie côté arbitre."""
+
+    def __init__(self, game_map: dict) -> None:
+        self.map = game_map
+        self.month = 0
+        self.resources = game_map["resources"]
+        self.positions: dict[int, tuple[int, int]] = {}
+        self.kind: dict[int, int] = {}                     # 0 = landing, sinon type de module
+        self.astronauts: dict[int, list[int]] = {}
+        self.tubes: dict[tuple[int, int], int] = {}        # (min, max) -> capacité
+        self.tube_base_cost: dict[tuple[int, int], int] = {}
+        self.teleports: dict[int, int] = {}                # entrée -> sortie
+        self.pods: dict[int, list[int]] = {}
+        self.score = 0
+        self.invalid_actions = 0
+        self.new_buildings: list[dict] = []
+
+    @classmethod
+    def from_turn(cls, known: dict, turn_input: list[str]) -> "Game":
+        """
+        Reconstruit l'état du mois à partir des entrées d'un tour, pour simuler
+        ce mois-ci depuis un bot (Mandimby/portfolio.py). known : id -> dict
+        (x, y, type, astronauts) des bâtiments déjà vus, complété ici avec les
+        nouveaux bâtiments du tour.
+        """
+        lines = iter(turn_input)
+        game = cls({"months": 1, "resources": int(next(lines)), "income": 0, "buildings": []})
+        routes = [tuple(int(t) for t in next(lines).split()) for _ in range(int(next(lines)))]
+        for _ in range(int(next(lines))):
+            values = [int(t) for t in next(lines).split()]
+            game.pods[values[0]] = values[2:2 + values[1]]
+        for _ in range(int(next(lines))):
+            values = [int(t) for t in next(lines).split()]
+            astronauts = values[5:5 + values[4]] if values[0] == 0 else []
+            known[values[1]] = {"x": values[2], "y": values[3], "type": values[0], "astronauts": astronauts}
+        for bid, b in known.items():
+            game.positions[bid] = (b["x"], b["y"])
+            game.kind[bid] = b["type"]
+            if b["type"] == 0:
+                game.astronauts[bid] = b["astronauts"]
+        for a, b, cap in routes:
+            if cap == 0:
+                game.teleports[a] = b
+            else:
+                key = (min(a, b), max(a, b))
+                game.tubes[key] = cap
+                game.tube_base_cost[key] = tube_cost(game.positions[a], game.positions[b])
+        game.month = 1
+        return game
+
+    # ----- Entrées du bot ---------------------------------------------------
+    def start_month(self) -> None:
+        self.month += 1
+        if self.month > 1:
+            self.resources = int(self.resources * (1 + INTEREST_RATE)) + self.map["income"]
+        self.new_buildings = [b for b in self.map["buildings"] if b["month"] == self.month]
+        for b in self.new_buildings:
+            self.positions[b["id"]] = (b["x"], b["y"])
+            self.kind[b["id"]] = b["type"]
+            if b["type"] == 0:
+                self.astronauts[b["id"]] = b["astronauts"]
+
+    def turn_input(self) -> list[str]:
+        lines = [str(self.resources), str(len(self.tubes) + len(self.teleports))]
+        lines += [f"{a} {b} {cap}" for (a, b), cap in self.tubes.items()]
+        lines += [f"{a} {b} 0" for a, b in self.teleports.items()]
+        lines.append(str(len(self.pods)))
+        lines += [f"{pid} {len(route)} " + " ".join(map(str, route)) for pid, route in self.pods.items()]
+        lines.append(str(len(self.new_buildings)))
+        for b in self.new_buildings:
+            if b["type"] == 0:
+                lines.append(f"0 {b['id']} {b['x']} {b['y']} {len(b['astronauts'])} "
+                             + " ".join(map(str, b["astronauts"])))
+            else:
+                lines.append(f"{b['type']} {b['id']} {b['x']} {b['y']}")
+        return lines
+
+    # ----- Actions -----------------------------------------------------------
+    def degree(self, b: int) -> int:
+        return sum(1 for key in self.tubes if b in key)
+
+    def apply_actions(self, line: str) -> None:
+        for action in line.split(";"):
+            parts = action.split()
+            if not parts or parts[0] == "WAIT" or parts[0] == "MESSAGE":
+                continue
+            try:
+                ok = self.apply_action(parts[0], [int(t) for t in parts[1:]])
+            except (ValueError, IndexError, KeyError):
+                ok = False
+            if not ok:
+                self.invalid_actions += 1
+
+    def apply_action(self, name: str, args: list[int]) -> bool:
+        if name == "TUBE":
+            a, b = args[0], args[1]
+            key = (min(a, b), max(a, b))
+            if a == b or a not in self.positions or b not in self.positions or key in self.tubes:
+                return False
+            pa, pb = self.positions[a], self.positions[b]
+            cost = tube_cost(pa, pb)
+            if cost > self.resources or self.degree(a) >= MAX_TUBES_PER_BUILDING or self.degree(b) >= MAX_TUBES_PER_BUILDING:
+                return False
+            if any(point_on_segment(p, pa, pb) for w, p in self.positions.items() if w not in (a, b)):
+                return False
+            for c, d in self.tubes:
+                if len({a, b, c, d}) == 4 and segments_intersect(pa, pb, self.positions[c], self.positions[d]):
+                    return False
+            self.tubes[key] = 1
+            self.tube_base_cost[key] = cost
+            self.resources -= cost
+            return True
+        if name == "UPGRADE":
+            key = (min(args[0], args[1]), max(args[0], args[1]))
+            if key not in self.tubes:
+                return False
+            cost = self.tube_base_cost[key] * (self.tubes[key] + 1)
+            if cost > self.resources:
+                return False
+            self.tubes[key] += 1
+            self.resources -= cost
+            return True
+        if name == "TELEPORT":
+            a, b = args[0], args[1]
+            used = set(self.teleports) | set(self.teleports.values())
+            if a == b or a not in self.positions or b not in self.positions or a in used or b in used:
+                return False
+            if self.resources < TELEPORT_COST:
+                return False
+            self.teleports[a] = b
+            self.resources -= TELEPORT_COST
+            return True
+        if name == "POD":
+            pid, route = args[0], args[1:]
+            if pid in self.pods or not 0 <= pid <= MAX_POD_ID or len(route) < 2:
+                return False
+            if self.resources < POD_COST:
+                return False
+            if any((min(x, y), max(x, y)) not in self.tubes for x, y in zip(route, route[1:])):
+                return False
+            self.pods[pid] = route
+            self.resources -= POD_COST
+            return True
+        if name == "DESTROY":
+            if args[0] not in self.pods:
+                return False
+            del self.pods[args[0]]
+            self.resources += DESTROY_REFUND
+            return True
+        return False
+
+    # ----- Simulation du mois -----------------------------------------------
+    def distances_to_type(self) -> dict[int, dict[int, int]]:
+        """dist[t][b] = nb de tubes de b au module de type t le plus proche (BFS 0-1 inversé)."""
+        reverse = defaultdict(list)
+        for a, b in self.tubes:
+            reverse[a].append((b, 1))
+            reverse[b].append((a, 1))
+        for a, b in self.teleports.items():
+            reverse[b].append((a, 0))
+        result = {}
+        for mtype in {t for t in self.kind.values() if t > 0}:
+            dist = {b: 0 for b, t in self.kind.items() if t == mtype}
+            q = deque(dist)
+            while q:
+                u = q.popleft()
+                for v, w in reverse.get(u, []):
+                    if dist[u] + w < dist.get(v, 10**9):
+                        dist[v] = dist[u] + w
+                        if w == 0:
+                            q.appendleft(v)
+                        else:
+                            q.append(v)
+            result[mtype] = dist
+        return result
+
+    def simulate_month(self) -> int:
+        """Simule 20 jours et renvoie les points gagnés ce mois-ci."""
+        dist = self.distances_to_type()
+        neighbours = defaultdict(list)
+        for a, b in self.tubes:
+            neighbours[a].append(b)
+            neighbours[b].append(a)
+
+        def next_hop(b: int, mtype: int):
+            d = dist.get(mtype, {})
+            here = d.get(b, 10**9)
+            # Téléporteur gratuit : sur un plus court chemin, sa sortie est à la même distance
+            if b in self.teleports and d.get(self.teleports[b], 10**9) <= here < 10**9:
+                return self.teleports[b]
+            best = None
+            for n in neighbours[b]:
+                if d.get(n, 10**9) < here and (best is None or d[n] < d[best]):
+                    best = n
+            return best
+
+        waiting = defaultdict(list)          # bâtiment -> [type]
+        for landing, types in self.astronauts.items():
+            waiting[landing].extend(types)
+        arrivals = defaultdict(int)
+        points = 0
+
+        # Position de chaque pod : indice dans sa route et sens de parcours
+        state = {pid: [0, 1] for pid in self.pods}
+        passengers = {pid: [] for pid in self.pods}
+
+        def settle(b: int, mtype: int, day: int) -> None:
+            """Un astronaute se trouve en b : arrivé, téléporté ou en attente."""
+            nonlocal points
+            seen = 0
+            while True:
+                if self.kind.get(b) == mtype:
+                    points += max(0, 50 - day) + max(0, 50 - arrivals[b])
+                    arrivals[b] += 1
+                    return
+                if b in self.teleports and next_hop(b, mtype) == self.teleports[b] and seen < 10:
+                    b = self.teleports[b]
+                    seen += 1
+                    continue
+                waiting[b].append(mtype)
+                return
+
+        for b in list(waiting):
+            types, waiting[b] = waiting[b], []
+            for t in types:
+                settle(b, t, 0)
+
+        for day in range(1, DAYS_PER_MONTH + 1):
+            moves_on_tube = defaultdict(int)
+            for pid in sorted(self.pods):
+                route = self.pods[pid]
+                idx, direction = state[pid]
+                here = route[idx]
+                closed = route[0] == route[-1]
+                if closed:
+                    nxt_idx = idx + 1 if idx + 1 < len(route) else 1
+                else:
+                    if not 0 <= idx + direction < len(route):
+                        direction = -direction
+                    nxt_idx = idx + direction
+                nxt = route[nxt_idx]
+                # Embarquement des astronautes dont le prochain arrêt est nxt
+                queue = waiting[here]
+                keep = []
+                for t in queue:
+                    if len(passengers[pid]) < POD_CAPACITY and next_hop(here, t) == nxt:
+                        passengers[pid].append(t)
+                    else:
+                        keep.append(t)
+                waiting[here] = keep
+                key = (min(here, nxt), max(here, nxt))
+                if moves_on_tube[key] >= self.tubes.get(key, 0):
+                    continue  # tube saturé : le pod attend
+                moves_on_tube[key] += 1
+                state[pid] = [nxt_idx, direction]
+                riders, passengers[pid] = passengers[pid], []
+                for t in riders:
+                    settle(nxt, t, day)
+        return points
+
+    def end_month(self) -> int:
+        gained = self.simulate_month()
+        self.score += gained
+        return gained
+
+
+# ------------------------------------------------------------------------------
+# Pilotage d'un bot en sous-processus
+# ------------------------------------------------------------------------------
+
+STDERR_TAIL_LINES = 10     # lignes de stderr citées quand un bot plante
+
+
+class BotProcess:
+    """
+    Bot lancé en sous-processus ; lecture des réponses avec délai maximal.
+    stderr est gardé dans un fichier temporaire : si le bot plante (fin de
+    stdout, tube fermé), crash_report() en cite la fin avec le code de sortie.
+    """
+
+    def __init__(self, path: str, env: dict | None = None) -> None:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"bot introuvable : {path} (depuis {os.getcwd()})")
+        env = dict(os.environ, PYTHONHASHSEED="0", **(env or {}))
+        env.pop("SELENIA_RECORD", None)
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen([sys.executable, path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=self.stderr, env=env)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.proc.stdout, selectors.EVENT_READ)
+        self.buffer = b""
+        self.crashed = False
+
+    def ask(self, lines: list[str], timeout: float) -> tuple[str | None, float]:
+        """
+        Envoie un tour, renvoie (ligne de réponse, latence). None si délai
+        dépassé ou si le bot a planté (self.crashed).
+        """
+        start = time.perf_counter()
+        try:
+            self.proc.stdin.write(("\n".join(lines) + "\n").encode())
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            self.crashed = True
+            return None, 0.0
+        deadline = start + timeout
+        while b"\n" not in self.buffer:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self.selector.select(remaining):
+                return None, time.perf_counter() - start
+            chunk = os.read(self.proc.stdout.fileno(), 65536)
+            if not chunk:
+                self.crashed = True
+                return None, time.perf_counter() - start
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode().strip(), time.perf_counter() - start
+
+    def crash_report(self) -> str:
+        """Code de sortie et fin de stderr du bot planté."""
+        try:
+            code = self.proc.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            code = None
+        self.stderr.seek(0)
+        tail = self.stderr.read().decode(errors="replace").strip().splitlines()[-STDERR_TAIL_LINES:]
+        return f"code de sortie {code}" + "".join("\n    " + line for line in tail)
+
+    def close(self) -> None:
+        self.selector.close()
+        self.proc.kill()
+        self.proc.wait()
+        self.stderr.close()
+
+
+def bot_env(env: dict | None, throttle: bool) -> dict:
+    """
+    Variables ajoutées à l'environnement du bot. Sans throttle, turn_budget = 0
+    est ajouté à SELENIA_CONFIG (objet JSON ou fichier, celui de env ou de
+    l'environnement courant), sauf s'il y figure déjà.
+    """
+    env = dict(env or {})
+    if throttle:
+        return env
+    text = env.get("SELENIA_CONFIG", os.environ.get("SELENIA_CONFIG", "")).strip()
+    if text and not text.startswith("{"):
+        with open(text) as f:
+            text = f.read()
+    config = json.loads(text) if text else {}
+    config.setdefault("turn_budget", 0.0)
+    env["SELENIA_CONFIG"] = json.dumps(config)
+    return env
+
+
+def play_game(bot_path: str, seed: int, map_class: str,
+              first_timeout: float = FIRST_TURN_TIMEOUT, timeout: float = TURN_TIMEOUT,
+              env: dict | None = None, throttle: bool = False) -> dict:
+    """
+    Joue une partie complète ; renvoie score, latences par tour, délai dépassé,
+    plantage (None, ou code de sortie et fin de stderr), actions invalides.
+    env : variables ajoutées à l'environnement du bot ; throttle : garder la
+    régulation du temps de calcul de v3 (voir bot_env).
+    """
+    game = Game(generate_map(seed, map_class))
+    bot = BotProcess(bot_path, bot_env(env, throttle))
+    latencies = []
+    timed_out = False
+    crash = None
+    try:
+        for month in range(1, game.map["months"] + 1):
+            game.start_month()
+            answer, latency = bot.ask(game.turn_input(), first_timeout if month == 1 else timeout)
+            latencies.append(latency)
+            if answer is None:
+                if bot.crashed:
+                    crash = f"tour {month}, " + bot.crash_report()
+                else:
+                    timed_out = True
+                break
+            game.apply_actions(answer)
+            game.end_month()
+    finally:
+        bot.close()
+    return {"bot": bot_path, "seed": seed, "map": map_class, "score": game.score,
+            "latencies": latencies, "timeout": timed_out, "crash": crash, "invalid": game.invalid_actions}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Joue une partie locale contre l'arbitre.")
+    parser.add_argument("bot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--map", choices=sorted(MAP_CLASSES), default="medium")
+    parser.add_argument("--throttle", action="store_true",
+                        help="garder la régulation du temps de calcul de v3 (parties non reproductibles)")
+    args = parser.parse_args()
+    if not os.path.isfile(args.bot):
+        parser.error(f"bot introuvable : {args.bot} (depuis {os.getcwd()})")
+    result = play_game(args.bot, args.seed, args.map, throttle=args.throttle)
+    print(f"score {result['score']}, {len(result['latencies'])} tours, "
+          f"max {max(result['latencies'], default=0) * 1000:.1f} ms, "
+          f"délai dépassé : {'oui' if result['timeout'] else 'non'}, actions invalides : {result['invalid']}")
+    if result["crash"]:
+        print(f"plantage : {result['crash']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Rejoue une partie enregistrée sur un bot et compare ses actions
+================================================================
+
+    SELENIA_RECORD=partie.log python Mandimby/v3.py      # pendant une vraie partie
+    python tools/replay.py partie.log Mandimby/v3.py     # en local
+
+Le bot est importé dans le processus (step() de chaque bot) : on mesure le
+temps de chaque tour sans le coût d'un sous-processus. Options :
+
+    --turn N      détail du tour N (entrée, actions attendues / obtenues)
+    --repeat K    rejoue K fois le tour N à partir du même état pour le chronométrer
+    --quiet       n'affiche que le résumé
+
+Code de sortie 1 si au moins un tour diffère de l'enregistrement.
+"""
+
+import argparse
+import copy
+import importlib.util
+import os
+import sys
+import time
+
+from turnlog import read_log
+
+
+def load_bot(path: str):
+    """Importe un bot (fichier .py exposant step() et reset()) comme module."""
+    name = "bot_" + os.path.splitext(os.path.basename(path))[0] + f"_{abs(hash(os.path.abspath(path)))}"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def replay(bot, turns, focus_turn=None, repeat=1, quiet=False):
+    """Rejoue les tours ; renvoie (durées en s, numéros des tours différents)."""
+    bot.reset()
+    durations = []
+    mismatches = []
+    for number, (turn_input, expected) in enumerate(turns, start=1):
+        snapshot = copy.deepcopy(bot.city) if number == focus_turn and repeat > 1 else None
+        start = time.perf_counter()
+        actions = bot.step(list(turn_input))
+        elapsed = time.perf_counter() - start
+        output = ";".join(actions) if actions else "WAIT"
+
+        if snapshot is not None:
+            timings = [elapsed]
+            for _ in range(repeat - 1):
+                bot.city = copy.deepcopy(snapshot)
+                start = time.perf_counter()
+                bot.step(list(turn_input))
+                timings.append(time.perf_counter() - start)
+            elapsed = min(timings)
+            print(f"tour {number} : min {elapsed * 1000:.2f} ms, médiane "
+                  f"{percentile(timings, 50) * 1000:.2f} ms sur {repeat} exécutions")
+
+        durations.append(elapsed)
+        differs = expected is not None and output != expected
+        if differs:
+            mismatches.append(number)
+        if number == focus_turn:
+            print(f"--- entrée du tour {number}")
+            print("\n".join(turn_input))
+            print(f"--- attendu : {expected}")
+            print(f"--- obtenu  : {output}")
+        elif not quiet and differs:
+            print(f"tour {number} différent ({elapsed * 1000:.2f} ms)")
+            print(f"  attendu : {expected}")
+            print(f"  obtenu  : {output}")
+    return durations, mismatches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rejoue une partie enregistrée sur un bot.")
+    parser.add_argument("log", help="journal écrit avec SELENIA_RECORD (texte) ou converti en .slb")
+    parser.add_argument("bot", help="fichier du bot (Tino/*.py, Mandimby/*.py)")
+    parser.add_argument("--turn", type=int, help="tour à détailler")
+    parser.add_argument("--repeat", type=int, default=1, help="répétitions du tour --turn")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    turns = read_log(args.log)
+    bot = load_bot(args.bot)
+    durations, mismatches = replay(bot, turns, args.turn, args.repeat, args.quiet)
+
+    slowest = max(range(len(durations)), key=durations.__getitem__) + 1 if durations else 0
+    print(f"{len(turns)} tours, total {sum(durations) * 1000:.1f} ms, "
+          f"p50 {percentile(durations, 50) * 1000:.2f} ms, p95 {percentile(durations, 95) * 1000:.2f} ms, "
+          f"max {max(durations, default=0) * 1000:.2f} ms (tour {slowest})")
+    print(f"{len(mismatches)} tour(s) différent(s) de l'enregistrement")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Tournoi local : chaque bot joue chaque carte (graine × classe) contre l'arbitre
+================================================================================
+
+    python tools/tournament.py --seeds 0-19
+    python tools/tournament.py Mandimby/v3.py Tino/2.py --seeds 1,4,7 --maps small,large -j 4
+
+Les parties sont réparties sur un pool de processus (un processus arbitre par
+partie, qui pilote le bot en sous-processus). Le résultat ne dépend que de la
+liste des graines : les cartes sont générées par graine et les résultats sont
+triés avant agrégation, quel que soit l'ordre de fin des parties. Pour cela,
+la régulation du temps de calcul de v3 est coupée (voir referee.bot_env) ;
+--throttle la rétablit, au prix de parties qui dépendent de la charge.
+
+Le tableau donne, par bot et par classe de carte : score moyen, latence par
+tour (premier tour à part, car il inclut le démarrage du bot ; puis p50,
+p95 et max des tours suivants), parties terminées sur délai dépassé ou sur
+plantage du bot, et actions invalides. Le premier plantage de chaque bot est
+détaillé sous le tableau (code de sortie et fin de stderr).
+"""
+
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+
+from referee import FIRST_TURN_TIMEOUT, MAP_CLASSES, TURN_TIMEOUT, play_game
+from replay import percentile
+
+DEFAULT_BOTS = ["Mandimby/v1.py", "Mandimby/v2.py", "Mandimby/v3.py", "Tino/1.py", "Tino/2.py"]
+
+
+def parse_seeds(text: str) -> list[int]:
+    """"0-9,20,25-27" -> [0, 1, ..., 9, 20, 25, 26, 27]"""
+    seeds = []
+    for part in text.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            seeds.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            seeds.append(int(part))
+    return seeds
+
+
+def run_job(job: tuple) -> dict:
+    bot, seed, map_class, first_timeout, timeout, throttle = job
+    return play_game(bot, seed, map_class, first_timeout, timeout, throttle=throttle)
+
+
+def run_tournament(bots: list[str], seeds: list[int], map_classes: list[str], jobs: int | None = None,
+                   first_timeout: float = FIRST_TURN_TIMEOUT, timeout: float = TURN_TIMEOUT,
+                   throttle: bool = False) -> list[dict]:
+    """Joue toutes les parties ; renvoie les résultats triés par (bot, classe, graine)."""
+    tasks = [(bot, seed, m, first_timeout, timeout, throttle) for bot in bots for m in map_classes for seed in seeds]
+    with Pool(processes=jobs or os.cpu_count()) as pool:
+        results = list(pool.imap_unordered(run_job, tasks))
+    order = {(bot, m): k for k, (bot, m) in enumerate((b, m) for b in bots for m in map_classes)}
+    results.sort(key=lambda r: (order[(r["bot"], r["map"])], r["seed"]))
+    return results
+
+
+def aggregate(results: list[dict]) -> list[dict]:
+    """Une ligne par (bot, classe de carte), plus une ligne "tout" par bot."""
+    groups: dict[tuple[str, str], list[dict]] = {}
+    for r in results:
+        groups.setdefault((r["bot"], r["map"]), []).append(r)
+    for r in results:
+        groups.setdefault((r["bot"], "tout"), []).append(r)
+    rows = []
+    for (bot, map_class), games in sorted(groups.items(), key=lambda item: item[0][1] == "tout"):
+        # Le premier tour inclut le démarrage de l'interpréteur : colonne à part
+        first = [g["latencies"][0] for g in games if g["latencies"]]
+        latencies = [t for g in games for t in g["latencies"][1:]]
+        rows.append({
+            "bot": bot, "map": map_class, "games": len(games),
+            "score": sum(g["score"] for g in games) / len(games),
+            "first": max(first, default=0.0),
+            "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+            "max": max(latencies, default=0.0),
+            "timeouts": sum(g["timeout"] for g in games),
+            "crashes": sum(g["crash"] is not None for g in games),
+            "invalid": sum(g["invalid"] for g in games),
+        })
+    order = {bot: k for k, bot in enumerate(dict.fromkeys(r["bot"] for r in results))}
+    rows.sort(key=lambda row: order[row["bot"]])
+    return rows
+
+
+def format_table(rows: list[dict]) -> str:
+    width = max([16] + [len(r["bot"]) for r in rows])
+    header = f"{'bot':<{width}} {'carte':<7} {'parties':>7} {'score moyen':>12} " \
+             f"{'1er ms':>7} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'délais':>6} {'plantages':>9} {'invalides':>9}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(f"{r['bot']:<{width}} {r['map']:<7} {r['games']:>7} {r['score']:>12.0f} "
+                     f"{r['first'] * 1000:>7.1f} {r['p50'] * 1000:>7.1f} {r['p95'] * 1000:>7.1f} {r['max'] * 1000:>7.1f} "
+                     f"{r['timeouts']:>6} {r['crashes']:>9} {r['invalid']:>9}")
+    return "\n".join(lines)
+
+
+def format_crashes(results: list[dict]) -> str:
+    """Premier plantage de chaque bot, avec sa carte."""
+    lines = []
+    for bot in dict.fromkeys(r["bot"] for r in results):
+        crashed = [r for r in results if r["bot"] == bot and r["crash"]]
+        if crashed:
+            r = crashed[0]
+            lines.append(f"{bot} : {len(crashed)} plantage(s), ex. {r['map']} graine {r['seed']}, {r['crash']}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tournoi local entre bots sur des cartes générées.")
+    parser.add_argument("bots", nargs="*", default=DEFAULT_BOTS)
+    parser.add_argument("--seeds", default="0-9", help="liste de graines, ex. 0-19 ou 1,4,7")
+    parser.add_argument("--maps", default=",".join(MAP_CLASSES), help="classes de cartes séparées par des virgules")
+    parser.add_argument("-j", "--jobs", type=int, help="nb de processus (défaut : nb de cœurs)")
+    parser.add_argument("--timeout", type=float, default=TURN_TIMEOUT, help="délai par tour (s)")
+    parser.add_argument("--first-timeout", type=float, default=FIRST_TURN_TIMEOUT, help="délai du premier tour (s)")
+    parser.add_argument("--throttle", action="store_true",
+                        help="garder la régulation du temps de calcul de v3 (parties non reproductibles)")
+    args = parser.parse_args()
+
+    map_classes = [m for m in args.maps.split(",") if m]
+    unknown = [m for m in map_classes if m not in MAP_CLASSES]
+    if unknown:
+        parser.error(f"classe(s) de carte inconnue(s) : {', '.join(unknown)}")
+    missing = [bot for bot in args.bots if not os.path.isfile(bot)]
+    if missing:
+        parser.error(f"bot(s) introuvable(s) depuis {os.getcwd()} : {', '.join(missing)} "
+                     f"(chemins relatifs au dossier courant ; lancer depuis la racine du dépôt)")
+    results = run_tournament(args.bots, parse_seeds(args.seeds), map_classes, args.jobs,
+                             args.first_timeout, args.timeout, args.throttle)
+    print(format_table(aggregate(results)))
+    crashes = format_crashes(results)
+    if crashes:
+        print(crashes, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Réglage des paramètres de Mandimby/v3.py (Config, section 1.b)
+===============================================================
+
+Recherche par entropie croisée : à chaque génération on tire des configs
+autour d'une moyenne (loi normale par paramètre, bornée), on les évalue
+toutes sur les mêmes cartes (graines × classes) avec l'arbitre local, puis
+moyenne et écart-type sont recalculés sur les meilleures (élite). La config
+par défaut fait partie de la première génération : le résultat n'est jamais
+moins bon qu'elle sur ces cartes.
+
+Chaque config est transmise au bot par SELENIA_CONFIG ; les parties sont
+réparties sur un pool de processus. Pour une même graine de recherche et
+une même liste de cartes, le déroulement est déterministe : la régulation du
+temps de calcul de v3 est coupée (voir referee.bot_env), sauf avec --throttle.
+
+    python tools/tune.py --seeds 0-7 --generations 6 --population 12 --out best.json
+    SELENIA_CONFIG=best.json python Mandimby/v3.py
+"""
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import sys
+from multiprocessing import Pool
+
+from referee import FIRST_TURN_TIMEOUT, MAP_CLASSES, TURN_TIMEOUT, play_game
+from replay import percentile
+from tournament import parse_seeds
+
+# Paramètre -> (min, max) ; entier si la valeur par défaut est entière
+SEARCH_SPACE = {
+    "max_actions": (5, 25),
+    "max_tubes": (2, 15),
+    "max_upgrades": (0, 6),
+    "max_pods": (1, 12),
+    "max_teleports": (0, 2),
+    "tube_demand_weight": (100.0, 5000.0),
+    "tube_cost_weight": (0.0, 1.0),
+    "upgrade_score_weight": (1000.0, 50000.0),
+    "pod_score_weight": (1.0, 100.0),
+    "teleport_score_weight": (1000.0, 50000.0),
+    "teleport_min_turn": (1, 15),
+    "spend_horizon": (2, 20),
+    "beam_width": (0, 6),
+    "beam_depth": (1, 3),
+    "wait_penalty": (0.0, 2.0),
+    "bottleneck_ratio": (0.3, 2.0),
+    "route_pod_penalty": (0.0, 50.0),
+    "idle_utilization": (0.0, 0.5),
+    "max_recycled_per_turn": (0, 6),
+    "steiner_hop_cost": (0.0, 5000.0),
+}
+
+
+def load_defaults(bot_path: str) -> dict:
+    """Config.DEFAULTS du bot, sans exécuter sa boucle principale."""
+    spec = importlib.util.spec_from_file_location("tuned_bot", bot_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return dict(module.Config.DEFAULTS)
+
+
+def sample(rng: random.Random, mean: dict, std: dict, defaults: dict) -> dict:
+    config = {}
+    for name, (lo, hi) in SEARCH_SPACE.items():
+        value = min(hi, max(lo, rng.gauss(mean[name], std[name])))
+        config[name] = round(value) if isinstance(defaults[name], int) else round(value, 4)
+    return config
+
+
+def run_job(job: tuple) -> tuple[int, dict]:
+    index, bot, config, seed, map_class, first_timeout, timeout, throttle = job
+    env = {"SELENIA_CONFIG": json.dumps(config)}
+    return index, play_game(bot, seed, map_class, first_timeout, timeout, env, throttle)
+
+
+def evaluate(pool: Pool, bot: str, configs: list[dict], seeds: list[int], map_classes: list[str],
+             first_timeout: float, timeout: float, throttle: bool = False) -> list[dict]:
+    """Joue toutes les cartes pour chaque config ; renvoie un bilan par config (même ordre)."""
+    tasks = [(i, bot, c, seed, m, first_timeout, timeout, throttle)
+             for i, c in enumerate(configs) for m in map_classes for seed in seeds]
+    games: list[list[dict]] = [[] for _ in configs]
+    for index, result in pool.imap_unordered(run_job, tasks):
+        games[index].append(result)
+    summaries = []
+    for config, results in zip(configs, games):
+        results.sort(key=lambda r: (r["map"], r["seed"]))
+        latencies = [t for r in results for t in r["latencies"][1:]]
+        summaries.append({
+            "config": config,
+            "score": sum(r["score"] for r in results) / len(results),
+            "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+            "max": max(latencies, default=0.0),
+            "timeouts": sum(r["timeout"] for r in results),
+            "crashes": sum(r["crash"] is not None for r in results),
+            "invalid": sum(r["invalid"] for r in results),
+        })
+    return summaries
+
+
+def describe(summary: dict) -> str:
+    return (f"score {summary['score']:.0f}, p50 {summary['p50'] * 1000:.1f} ms, "
+            f"p95 {summary['p95'] * 1000:.1f} ms, max {summary['max'] * 1000:.1f} ms, "
+            f"délais {summary['timeouts']}, plantages {summary['crashes']}, invalides {summary['invalid']}")
+
+
+def tune(bot: str, seeds: list[int], map_classes: list[str], generations: int, population: int,
+         elite_fraction: float, search_seed: int, jobs: int | None = None,
+         first_timeout: float = FIRST_TURN_TIMEOUT, timeout: float = TURN_TIMEOUT,
+         throttle: bool = False) -> dict:
+    """Renvoie le bilan de la meilleure config trouvée (un délai dépassé ou un plantage la disqualifie)."""
+    defaults = load_defaults(bot)
+    rng = random.Random(search_seed)
+    mean = {name: float(defaults[name]) for name in SEARCH_SPACE}
+    std = {name: (hi - lo) / 4 for name, (lo, hi) in SEARCH_SPACE.items()}
+    n_elite = max(1, math.ceil(population * elite_fraction))
+    best = None
+
+    with Pool(processes=jobs or os.cpu_count()) as pool:
+        for generation in range(generations):
+            configs = [sample(rng, mean, std, defaults) for _ in range(population)]
+            if generation == 0:
+                configs[0] = {name: defaults[name] for name in SEARCH_SPACE}
+            summaries = evaluate(pool, bot, configs, seeds, map_classes, first_timeout, timeout, throttle)
+            ranked = sorted(summaries, key=lambda s: (s["timeouts"] + s["crashes"] > 0, -s["score"]))
+            if best is None or (ranked[0]["timeouts"] + ranked[0]["crashes"], -ranked[0]["score"]) \
+                    < (best["timeouts"] + best["crashes"], -best["score"]):
+                best = ranked[0]
+            print(f"génération {generation + 1}/{generations} : meilleure {describe(ranked[0])}", file=sys.stderr)
+
+            elite = [s["config"] for s in ranked[:n_elite]]
+            for name, (lo, hi) in SEARCH_SPACE.items():
+                values = [c[name] for c in elite]
+                mean[name] = sum(values) / len(values)
+                spread = math.sqrt(sum((v - mean[name]) ** 2 for v in values) / len(values))
+                # Écart-type minimal pour ne pas figer un paramètre trop tôt
+                std[name] = max(spread, (hi - lo) / 50)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recherche des paramètres de v3 sur l'arbitre local.")
+    parser.add_argument("--bot", default="Mandimby/v3.py")
+    parser.add_argument("--seeds", default="0-5", help="graines des cartes, ex. 0-9 ou 1,4,7")
+    parser.add_argument("--maps", default=",".join(MAP_CLASSES))
+    parser.add_argument("--generations", type=int, default=5)
+    parser.add_argument("--population", type=int, default=12)
+    parser.add_argument("--elite", type=float, default=0.25, help="fraction gardée à chaque génération")
+    parser.add_argument("--search-seed", type=int, default=0)
+    parser.add_argument("-j", "--jobs", type=int)
+    parser.add_argument("--timeout", type=float, default=TURN_TIMEOUT)
+    parser.add_argument("--first-timeout", type=float, default=FIRST_TURN_TIMEOUT)
+    parser.add_argument("--throttle", action="store_true",
+                        help="garder la régulation du temps de calcul de v3 (classement bruité par la charge)")
+    parser.add_argument("--out", help="fichier JSON où écrire la meilleure config")
+    args = parser.parse_args()
+
+    map_classes = [m for m in args.maps.split(",") if m]
+    unknown = [m for m in map_classes if m not in MAP_CLASSES]
+    if unknown:
+        parser.error(f"classe(s) de carte inconnue(s) : {', '.join(unknown)}")
+    if not os.path.isfile(args.bot):
+        parser.error(f"bot introuvable : {args.bot} (depuis {os.getcwd()})")
+    best = tune(args.bot, parse_seeds(args.seeds), map_classes, args.generations, args.population,
+                args.elite, args.search_seed, args.jobs, args.first_timeout, args.timeout, args.throttle)
+
+    print(json.dumps(best["config"], indent=2, sort_keys=True))
+    print(describe(best))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(best["config"], f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Journaux de parties Selenia City
+================================
+
+Format texte (celui écrit par les bots quand SELENIA_RECORD est défini) :
+chaque tour est recopié exactement comme le bot l'a lu sur stdin, suivi d'une
+ligne "> " + actions émises. En retirant les lignes "> " on retrouve le flux
+d'entrée du bot :
+
+    grep -v '^>' partie.log | python Mandimby/v3.py
+
+Format binaire (.slb), pour rejouer beaucoup de longues parties :
+
+    en-tête   b"SLB1"
+    tours     un enregistrement par tour, entiers en varint (LEB128) :
+              ressources (zigzag), nb routes, [b1 b2 capacité]...,
+              nb pods, [id nb_arrêts arrêts...]..., nb bâtiments,
+              [type id x y (nb_astronautes types...)]..., puis les actions
+              (longueur + 1 en varint, 0 = absentes, suivie de l'UTF-8)
+    index     offset de chaque tour (uint64 little-endian)
+    pied      offset de l'index (uint64), nb de tours (uint32), b"SLBX"
+
+BinaryLog lit le fichier via mmap : l'accès au tour N ne lit que le pied,
+une entrée d'index et l'enregistrement du tour.
+
+Un tour est représenté par un couple (lignes_d_entrée, actions) où actions
+vaut None si le journal ne contient que l'entrée.
+
+    python tools/turnlog.py to-bin partie.log partie.slb
+    python tools/turnlog.py to-text partie.slb partie.log
+    python tools/turnlog.py show partie.slb 42
+"""
+
+import mmap
+import struct
+import sys
+
+ACTION_PREFIX = "> "
+BINARY_MAGIC = b"SLB1"
+FOOTER_MAGIC = b"SLBX"
+FOOTER = struct.Struct("<QI4s")
+INDEX_ENTRY = struct.Struct("<Q")
+
+
+def split_turn(lines: list[str], start: int) -> tuple[list[str], int]:
+    """
+    Découpe un tour à partir de lines[start] en suivant les compteurs de
+    l'énoncé (ressources, routes, pods, nouveaux bâtiments).
+    Renvoie (lignes du tour, indice de la ligne suivante).
+    """
+    i = start
+    turn = [lines[i]]
+    i += 1
+    for _ in range(3):
+        count = int(lines[i])
+        turn.extend(lines[i:i + 1 + count])
+        i += 1 + count
+    if i > len(lines):
+        raise ValueError(f"tour tronqué à partir de la ligne {start + 1}")
+    return turn, i
+
+
+def parse_text_log(text: str) -> list[tuple[list[str], str | None]]:
+    """Analyse un journal texte (avec ou sans lignes "> actions")."""
+    lines = [line.rstrip("\r") for line in text.split("\n")]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    turns = []
+    i = 0
+    while i < len(lines):
+        turn, i = split_turn(lines, i)
+        actions = None
+        if i < len(lines) and lines[i].startswith(ACTION_PREFIX.rstrip()):
+            actions = lines[i][1:].strip()
+            i += 1
+        turns.append((turn, actions))
+    return turns
+
+
+def read_text_log(path: str) -> list[tuple[list[str], str | None]]:
+    with open(path) as f:
+        return parse_text_log(f.read())
+
+
+def format_text_log(turns: list[tuple[list[str], str | None]]) -> str:
+    out = []
+    for turn, actions in turns:
+        out.extend(turn)
+        if actions is not None:
+            out.append(ACTION_PREFIX + actions)
+    return "\n".join(out) + "\n" if out else ""
+
+
+def write_text_log(path: str, turns: list[tuple[list[str], str | None]]) -> None:
+    with open(path, "w") as f:
+        f.write(format_text_log(turns))
+
+
+def read_log(path: str) -> list[tuple[list[str], str | None]]:
+    """Lit un journal texte ou binaire (détecté par son en-tête)."""
+    with open(path, "rb") as f:
+        magic = f.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        with BinaryLog(path) as log:
+            return list(log)
+    return read_text_log(path)
+
+
+# ------------------------------------------------------------------------------
+# Format binaire
+# ------------------------------------------------------------------------------
+
+def _put_varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError(f"entier négatif non encodable en varint : {value}")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(buf, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if value % 2 == 0 else -(value >> 1) - 1
+
+
+def encode_turn(turn_input: list[str], actions: str | None) -> bytes:
+    """Encode un tour (lignes du protocole texte + actions) en binaire."""
+    out = bytearray()
+    i = 0
+    _put_varint(out, _zigzag(int(turn_input[i])))
+    i += 1
+    for _section in range(3):
+        count = int(turn_input[i])
+        i += 1
+        _put_varint(out, count)
+        for line in turn_input[i:i + count]:
+            values = [int(t) for t in line.split()]
+            if _section == 0:      # b1 b2 capacité
+                for v in values[:3]:
+                    _put_varint(out, v)
+            elif _section == 1:    # id nb_arrêts arrêts...
+                _put_varint(out, values[0])
+                stops = values[2:2 + values[1]]
+                _put_varint(out, len(stops))
+                for v in stops:
+                    _put_varint(out, v)
+            else:                  # type id x y [nb types...]
+                for v in values[:4]:
+                    _put_varint(out, v)
+                if values[0] == 0:
+                    astronauts = values[5:5 + values[4]]
+                    _put_varint(out, len(astronauts))
+                    for v in astronauts:
+                        _put_varint(out, v)
+        i += count
+    if actions is None:
+        _put_varint(out, 0)
+    else:
+        data = actions.encode("utf-8")
+        _put_varint(out, len(data) + 1)
+        out += data
+    return bytes(out)
+
+
+def decode_turn(buf, pos: int = 0) -> tuple[list[str], str | None]:
+    """Décode un tour à partir de buf[pos] et le renvoie au format texte."""
+    value, pos = _get_varint(buf, pos)
+    lines = [str(_unzigzag(value))]
+    for section in range(3):
+        count, pos = _get_varint(buf, pos)
+        lines.append(str(count))
+        for _ in range(count):
+            if section == 0:
+                values = []
+                for _ in range(3):
+                    v, pos = _get_varint(buf, pos)
+                    values.append(v)
+            elif section == 1:
+                pod_id, pos = _get_varint(buf, pos)
+                nb_stops, pos = _get_varint(buf, pos)
+                values = [pod_id, nb_stops]
+                for _ in range(nb_stops):
+                    v, pos = _get_varint(buf, pos)
+                    values.append(v)
+            else:
+                values = []
+                for _ in range(4):
+                    v, pos = _get_varint(buf, pos)
+                    values.append(v)
+                if values[0] == 0:
+                    nb, pos = _get_varint(buf, pos)
+                    values.append(nb)
+                    for _ in range(nb):
+                        v, pos = _get_varint(buf, pos)
+                        values.append(v)
+            lines.append(" ".join(map(str, values)))
+    size, pos = _get_varint(buf, pos)
+    actions = None if size == 0 else bytes(buf[pos:pos + size - 1]).decode("utf-8")
+    return lines, actions
+
+
+def write_binary_log(path: str, turns: list[tuple[list[str], str | None]]) -> None:
+    with open(path, "wb") as f:
+        f.write(BINARY_MAGIC)
+        offsets = []
+        for turn_input, actions in turns:
+            offsets.append(f.tell())
+            f.write(encode_turn(turn_input, actions))
+        index_offset = f.tell()
+        for offset in offsets:
+            f.write(INDEX_ENTRY.pack(offset))
+        f.write(FOOTER.pack(index_offset, len(offsets), FOOTER_MAGIC))
+
+
+class BinaryLog:
+    """Lecture à accès direct d'un journal binaire projeté en mémoire (mmap)."""
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            self.close()
+            raise ValueError(f"{path} n'est pas un journal binaire")
+        self._index_offset, self._count, magic = FOOTER.unpack_from(self._map, len(self._map) - FOOTER.size)
+        if magic != FOOTER_MAGIC:
+            self.close()
+            raise ValueError(f"{path} : pied de fichier invalide")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def offset(self, number: int) -> int:
+        """Position dans le fichier du tour d'indice number (0 = premier tour)."""
+        if not 0 <= number < self._count:
+            raise IndexError(number)
+        return INDEX_ENTRY.unpack_from(self._map, self._index_offset + number * INDEX_ENTRY.size)[0]
+
+    def __getitem__(self, number: int) -> tuple[list[str], str | None]:
+        if number < 0:
+            number += self._count
+        return decode_turn(self._map, self.offset(number))
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self[number]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) == 3 and argv[0] == "to-bin":
+        write_binary_log(argv[2], read_text_log(argv[1]))
+    elif len(argv) == 3 and argv[0] == "to-text":
+        write_text_log(argv[2], read_log(argv[1]))
+    elif len(argv) == 3 and argv[0] == "show":
+        with BinaryLog(argv[1]) as log:
+            turn_input, actions = log[int(argv[2]) - 1]
+        print(format_text_log([(turn_input, actions)]), end="")
+    else:
+        print("\n".join(__doc__.strip().splitlines()[-3:]), file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))